@@ -0,0 +1,110 @@
+"""
+Utilitários dos benchmarks: sobe a API num processo uvicorn separado e dispara
+requisições com concorrência fixa, medindo vazão e latência.
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator, Sequence
+
+import httpx
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def servidor(env: dict[str, str] | None = None, workers: int = 1, timeout: float = 30.0) -> Iterator[str]:
+    """
+    Sobe `routes.main:app` com as variáveis de ambiente extras e devolve a URL base.
+    """
+    porta = _porta_livre()
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "routes.main:app", "--host", "127.0.0.1", "--port", str(porta),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        env={**os.environ, **(env or {})},
+    )
+    url = f"http://127.0.0.1:{porta}"
+    try:
+        limite = time.monotonic() + timeout
+        while True:
+            try:
+                if httpx.get(f"{url}/openapi.json", timeout=1.0).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if processo.poll() is not None or time.monotonic() > limite:
+                raise RuntimeError("Servidor do benchmark não subiu")
+            time.sleep(0.2)
+        yield url
+    finally:
+        processo.terminate()
+        processo.wait(timeout=10)
+
+
+def percentil(ordenados: Sequence[float], p: float) -> float:
+    if not ordenados:
+        return 0.0
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+async def _medir(url: str, requisicoes: Sequence[tuple[str, str, dict | list | str | None]], concorrencia: int) -> dict:
+    latencias: list[float] = []
+    erros = 0
+    bytes_recebidos = 0
+    proxima = 0
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=60.0) as cliente:
+        async def trabalhador():
+            nonlocal proxima, erros, bytes_recebidos
+            while proxima < len(requisicoes):
+                metodo, caminho, corpo = requisicoes[proxima]
+                proxima += 1
+                inicio = time.perf_counter()
+                # Corpo em texto (NDJSON, CSV) vai como está; o resto, como JSON
+                conteudo = {"content": corpo} if isinstance(corpo, str) else {"json": corpo}
+                try:
+                    resposta = await cliente.request(metodo, caminho, **conteudo)
+                    bytes_recebidos += len(resposta.content)
+                    if resposta.status_code >= 400:
+                        erros += 1
+                except httpx.HTTPError:
+                    erros += 1
+                latencias.append(time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+        duracao = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "requisicoes": len(requisicoes),
+        "concorrencia": concorrencia,
+        "erros": erros,
+        "duracao_s": round(duracao, 3),
+        "vazao_rps": round(len(requisicoes) / duracao, 1),
+        "bytes_medios": round(bytes_recebidos / max(1, len(requisicoes))),
+        "p50_ms": round(percentil(latencias, 50) * 1000, 2),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 2),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 2),
+    }
+
+
+def medir(url: str, requisicoes: Sequence[tuple[str, str, dict | list | str | None]], concorrencia: int) -> dict:
+    """
+    Executa a lista de requisições (metodo, caminho, corpo) com `concorrencia` clientes simultâneos.
+    """
+    return asyncio.run(_medir(url, requisicoes, concorrencia))
+
+
+def requisicoes_get(caminhos: Sequence[str], total: int) -> list[tuple[str, str, None]]:
+    return [("GET", caminhos[i % len(caminhos)], None) for i in range(total)]
@@ -0,0 +1,50 @@
+"""
+Compara tamanho médio da resposta e latência das listagens no formato enxuto (padrão)
+e com todas as relações via `include` (o formato carregado antes de existir o parâmetro).
+
+Uso: python -m benchmarks.inclusao --concorrencia 20 --requisicoes 2000
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.carga import medir, requisicoes_get, servidor
+
+# caminho -> relações incluídas no formato completo
+CASOS = {
+    "/alunos/?limit=100": "carteira,disciplinas",
+    "/disciplinas/?limit=100": "professor_disciplina,departamento,alunos",
+    "/professores/?limit=100": "departamento,disciplinas_ministradas",
+    "/matriculas/?limit=100": "aluno,disciplina",
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concorrencia", type=int, default=20)
+    parser.add_argument("--requisicoes", type=int, default=2_000)
+    parser.add_argument("--saida", help="Arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    resultados = {}
+    with servidor() as url:
+        for caminho, include in CASOS.items():
+            for formato, alvo in (("enxuto", caminho), ("completo", f"{caminho}&include={include}")):
+                requisicoes = requisicoes_get([alvo], args.requisicoes)
+                medir(url, requisicoes[:100], args.concorrencia)  # aquecimento
+                resultados[f"{caminho} {formato}"] = medir(url, requisicoes, args.concorrencia)
+
+    print(f"{'caso':<40} {'bytes':>10} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'erros':>6}")
+    for caso, r in resultados.items():
+        print(f"{caso:<40} {r['bytes_medios']:>10} {r['vazao_rps']:>8} {r['p50_ms']:>8} {r['p99_ms']:>8} {r['erros']:>6}")
+
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            json.dump(resultados, arquivo, indent=2)
+
+    # Medição com requisições que falharam não vale: sai com 1 para o CI (ou quem roda) ver
+    return 1 if any(r["erros"] for r in resultados.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
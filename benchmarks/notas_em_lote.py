@@ -0,0 +1,95 @@
+"""
+Compara o lançamento de notas de uma turma inteira por PATCH /matriculas/{aluno}/{disciplina}
+(uma requisição por aluno) com PATCH /disciplinas/{id}/matriculas (uma requisição, um
+UPDATE ... FROM (VALUES ...)). Cria uma disciplina temporária com os primeiros N alunos do
+banco matriculados e a remove no final; o banco precisa ter ao menos o maior N em alunos
+(ex.: python -m scripts.dados_sinteticos --alunos 10000).
+
+Uso: python -m benchmarks.notas_em_lote --alunos 1000 10000 --concorrencia 20
+"""
+import argparse
+import json
+import random
+import sys
+
+from sqlalchemy import delete, func, insert, literal, select
+
+from benchmarks.carga import medir, servidor
+from models import Aluno, Disciplina, Matricula
+
+
+def _preparar_turma(engine, quantidade: int) -> int:
+    with engine.begin() as connection:
+        disponiveis = connection.execute(select(func.count()).select_from(Aluno)).scalar()
+        if disponiveis < quantidade:
+            raise SystemExit(f"O banco tem {disponiveis} alunos; o benchmark precisa de {quantidade}.")
+        disciplina_id = connection.execute(
+            insert(Disciplina).values(nome=f"Benchmark notas {quantidade}", carga_horaria=64).returning(Disciplina.id)
+        ).scalar_one()
+        connection.execute(insert(Matricula).from_select(
+            ["id_aluno", "disciplina_id", "semestre", "numero_faltas"],
+            select(Aluno.id, literal(disciplina_id), literal("25.2"), literal(0))
+            .order_by(Aluno.id).limit(quantidade),
+        ))
+    return disciplina_id
+
+
+def _remover_turma(engine, disciplina_id: int) -> None:
+    with engine.begin() as connection:
+        connection.execute(delete(Matricula).where(Matricula.disciplina_id == disciplina_id))
+        connection.execute(delete(Disciplina).where(Disciplina.id == disciplina_id))
+
+
+def main() -> int:
+    from database import engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alunos", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--concorrencia", type=int, default=20, help="Clientes simultâneos no modo por aluno")
+    parser.add_argument("--repeticoes", type=int, default=5, help="Chamadas do modo em lote (mediana)")
+    parser.add_argument("--saida", help="Arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    resultados = {}
+    with servidor() as url:
+        for quantidade in args.alunos:
+            disciplina_id = _preparar_turma(engine, quantidade)
+            try:
+                with engine.connect() as connection:
+                    ids = connection.execute(
+                        select(Matricula.id_aluno).where(Matricula.disciplina_id == disciplina_id)
+                    ).scalars().all()
+                notas = [{"id_aluno": id_aluno, "nota_final": round(rng.uniform(0, 10), 1),
+                          "numero_faltas": rng.randrange(0, 20)} for id_aluno in ids]
+
+                por_aluno = medir(url, [
+                    ("PATCH", f"/matriculas/{nota['id_aluno']}/{disciplina_id}",
+                     {"nota_final": nota["nota_final"], "numero_faltas": nota["numero_faltas"]})
+                    for nota in notas
+                ], args.concorrencia)
+                em_lote = medir(url, [("PATCH", f"/disciplinas/{disciplina_id}/matriculas", notas)]
+                                * args.repeticoes, 1)
+            finally:
+                _remover_turma(engine, disciplina_id)
+
+            resultados[f"{quantidade} por_aluno"] = {
+                **por_aluno, "linhas_por_s": round(quantidade / por_aluno["duracao_s"], 1)}
+            resultados[f"{quantidade} em_lote"] = {
+                **em_lote, "linhas_por_s": round(quantidade / (em_lote["p50_ms"] / 1000), 1)}
+
+    print(f"{'caso':<20} {'duração s':>10} {'linhas/s':>12} {'p50 ms':>10} {'erros':>6}")
+    for caso, r in resultados.items():
+        duracao = r["duracao_s"] if caso.endswith("por_aluno") else round(r["p50_ms"] / 1000, 3)
+        print(f"{caso:<20} {duracao:>10} {r['linhas_por_s']:>12} {r['p50_ms']:>10} {r['erros']:>6}")
+
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            json.dump(resultados, arquivo, indent=2)
+
+    # Medição com requisições que falharam não vale: sai com 1 para o CI (ou quem roda) ver
+    return 1 if any(r["erros"] for r in resultados.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,456 @@
+"""
+Suíte de benchmarks da API: para cada tamanho de massa (--alunos), popula um banco com
+scripts.dados_sinteticos (mesma semente, mesmos dados), sobe a API e mede todas as rotas
+de routes/ com concorrência fixa, gravando vazão e latência p50/p95/p99 por caso em JSON.
+Com --comparar, confronta o resultado com uma execução anterior e falha (código 1) se
+algum caso piorar além de --limiar.
+
+Cada tamanho usa o seu banco (--url com {alunos}); um banco já populado com esse tamanho
+é reaproveitado. As escritas criam, alteram e removem só registros próprios (e-mails
+@benchmark.local, nomes "Benchmark ..."), apagados no final: a massa não muda entre
+execuções, e as leituras sorteiam ids com a mesma semente. No Postgres, a busca por nome
+depende das extensões e da f_unaccent criadas pela migration de busca.
+
+Uso:
+  python -m benchmarks.suite --alunos 1000 100000 1000000 --saida base.json
+  python -m benchmarks.suite --alunos 1000 --saida atual.json --comparar base.json --limiar 0.2
+  python -m benchmarks.suite --comparar base.json atual.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterator
+from urllib.parse import quote
+
+from sqlalchemy import delete, func, make_url, or_, select
+
+from benchmarks.carga import medir, servidor
+from models import Aluno, CarteiraEstudantil, Departamento, Disciplina, Matricula, Professor
+from scripts.dados_sinteticos import PRIMEIROS_NOMES, SOBRENOMES, popular
+
+URL_PADRAO = "sqlite:///benchmarks/dados/alunos_{alunos}.db"
+
+# Marcas dos registros criados pelas escritas (ver _limpar)
+DOMINIO = "@benchmark.local"
+PREFIXO_NOME = "Benchmark "
+SEMESTRE = "25.2"
+# Linhas por requisição nas rotas em lote (importação, matrícula e notas)
+LINHAS_POR_LOTE = 50
+
+
+@dataclass
+class Caso:
+    rota: str  # "METODO /caminho/{parametro}", como declarada em routes/
+    requisicoes: list
+    variante: str | None = None
+
+    @property
+    def nome(self) -> str:
+        return f"{self.rota} [{self.variante}]" if self.variante else self.rota
+
+
+@dataclass
+class Massa:
+    engine: object
+    rng: random.Random
+    requisicoes: int
+    escritas: int
+    exportacoes: int
+    # tabela -> (menor id, maior id) da massa semeada
+    faixas: dict[str, tuple[int, int]]
+
+    def ids(self, tabela: str, total: int) -> list[int]:
+        return [self.rng.randint(*self.faixas[tabela]) for _ in range(total)]
+
+    def nomes(self, total: int) -> list[str]:
+        # Nomes completos como os da massa: algumas centenas de homônimos a cada milhão de alunos
+        return [quote(f"{self.rng.choice(PRIMEIROS_NOMES)} {self.rng.choice(SOBRENOMES)} {self.rng.choice(SOBRENOMES)}")
+                for _ in range(total)]
+
+
+def _get(caminhos: list[str]) -> list[tuple[str, str, None]]:
+    return [("GET", caminho, None) for caminho in caminhos]
+
+
+def _consultar(engine, statement) -> list:
+    with engine.connect() as connection:
+        return connection.execute(statement).all()
+
+
+def leituras(m: Massa) -> list[Caso]:
+    n = m.requisicoes
+    alunos, disciplinas = m.ids("aluno", n), m.ids("disciplina", n)
+    departamentos, professores = m.ids("departamento", n), m.ids("professor", n)
+    carteiras = m.ids("carteiraestudantil", n)
+
+    return [
+        Caso("GET /alunos/", _get(["/alunos/?limit=20"] * n)),
+        Caso("GET /alunos/", _get([f"/alunos/?nome={nome}&limit=20" for nome in m.nomes(n)]), "nome"),
+        Caso("GET /alunos/", _get(["/alunos/?limit=20&include=carteira,disciplinas"] * n), "include"),
+        Caso("GET /alunos/{aluno_id}", _get([f"/alunos/{i}" for i in alunos])),
+        Caso("GET /alunos/{aluno_id}/historico", _get([f"/alunos/{i}/historico" for i in alunos])),
+        Caso("GET /alunos/stats/contagem", _get(["/alunos/stats/contagem"] * n)),
+        Caso("GET /alunos/by-disciplina/{disciplina_id}",
+             _get([f"/alunos/by-disciplina/{i}?limit=20" for i in disciplinas])),
+
+        Caso("GET /carteiras/", _get(["/carteiras/?limit=20"] * n)),
+        Caso("GET /carteiras/{carteira_id}", _get([f"/carteiras/{i}" for i in carteiras])),
+        Caso("GET /carteiras/busca/por-aluno", _get([f"/carteiras/busca/por-aluno?nome_aluno={nome}"
+                                                     for nome in m.nomes(n)])),
+
+        Caso("GET /professores/", _get(["/professores/?limit=20"] * n)),
+        Caso("GET /professores/{professor_id}", _get([f"/professores/{i}" for i in professores])),
+
+        Caso("GET /disciplinas/", _get(["/disciplinas/?limit=20"] * n)),
+        Caso("GET /disciplinas/{disciplina_id}", _get([f"/disciplinas/{i}" for i in disciplinas])),
+        Caso("GET /disciplinas/{disciplina_id}/alunos", _get([f"/disciplinas/{i}/alunos?limit=20" for i in disciplinas])),
+        Caso("GET /disciplinas/stats/alunos-por-disciplina", _get(["/disciplinas/stats/alunos-por-disciplina"] * n)),
+
+        Caso("GET /matriculas/", _get(["/matriculas/?limit=20"] * n)),
+        Caso("GET /matriculas/", _get(["/matriculas/?semestre=25.1&limit=20"] * n), "semestre"),
+        Caso("GET /matriculas/stats/media-notas", _get(["/matriculas/stats/media-notas"] * n)),
+
+        Caso("GET /departamentos/", _get(["/departamentos/?limit=20"] * n)),
+        Caso("GET /departamentos/{departamento_id}", _get([f"/departamentos/{i}" for i in departamentos])),
+        Caso("GET /departamentos/{departamento_id}/professores",
+             _get([f"/departamentos/{i}/professores?limit=20" for i in departamentos])),
+        Caso("GET /departamentos/stats/professores", _get(["/departamentos/stats/professores"] * n)),
+
+        # Exportações percorrem a tabela inteira: poucas requisições
+        *(Caso(f"GET /export/{tabela}", _get([f"/export/{tabela}?formato=csv"] * m.exportacoes))
+          for tabela in ("alunos", "carteiras", "matriculas")),
+        *(Caso(f"GET /_internal/{interna}", _get([f"/_internal/{interna}"] * n))
+          for interna in ("pool", "replica", "lazy-load", "cache", "escrita-adiada")),
+    ]
+
+
+def _aluno(cpf: str, i: int) -> dict:
+    return {"nome": f"{PREFIXO_NOME}{cpf}", "cpf": cpf,
+            "data_nascimento": str(date(2000, 1, 1) + timedelta(days=i % 3650)),
+            "numero_matricula": 90_000_000 + i, "email": f"aluno{cpf}{DOMINIO}"}
+
+
+def escritas(m: Massa) -> Iterator[Caso]:
+    """
+    Casos de escrita em sequência: cada um pode usar os registros criados pelos anteriores,
+    por isso são gerados um de cada vez, depois de o anterior rodar.
+    """
+    w, engine = m.escritas, m.engine
+    validade = (datetime.now(timezone.utc) + timedelta(days=365)).isoformat()
+
+    # Departamentos: B#### criados por POST, U#### por upsert (estes são removidos no final)
+    yield Caso("POST /departamentos/", [("POST", "/departamentos/", {
+        "nome": f"{PREFIXO_NOME}B{i}", "codigo_departamento": f"B{i:04d}"}) for i in range(w)])
+    yield Caso("PUT /departamentos/por-codigo", [("PUT", "/departamentos/por-codigo", [{
+        "nome": f"{PREFIXO_NOME}U{i}", "codigo_departamento": f"U{i:04d}"}]) for i in range(w)])
+    yield Caso("PUT /departamentos/por-codigo/{codigo_departamento}", [("PUT", f"/departamentos/por-codigo/B{i:04d}", {
+        "nome": f"{PREFIXO_NOME}B{i} atualizado", "codigo_departamento": f"B{i:04d}"}) for i in range(w)])
+    deps = dict(_consultar(engine, select(Departamento.codigo_departamento, Departamento.id)
+                           .where(Departamento.nome.like(f"{PREFIXO_NOME}%"))))
+    yield Caso("PATCH /departamentos/{departamento_id}", [("PATCH", f"/departamentos/{deps[f'U{i:04d}']}", {
+        "nome": f"{PREFIXO_NOME}U{i} atualizado"}) for i in range(w)])
+
+    # Professores: por POST dão aula nas disciplinas; os do upsert são removidos no final
+    yield Caso("POST /professores/", [("POST", "/professores/", {
+        "nome": f"{PREFIXO_NOME}{i}", "email": f"professor{i}{DOMINIO}", "id_departamento": deps[f"B{i:04d}"]})
+        for i in range(w)])
+    yield Caso("PUT /professores/por-email", [("PUT", "/professores/por-email", [{
+        "nome": f"{PREFIXO_NOME}U{i}", "email": f"upsert{i}{DOMINIO}", "id_departamento": deps[f"B{i:04d}"]}])
+        for i in range(w)])
+    yield Caso("PUT /professores/por-email/{email}", [("PUT", f"/professores/por-email/professor{i}{DOMINIO}", {
+        "nome": f"{PREFIXO_NOME}{i} atualizado", "email": f"professor{i}{DOMINIO}", "id_departamento": deps[f"B{i:04d}"]})
+        for i in range(w)])
+    profs = dict(_consultar(engine, select(Professor.email, Professor.id).where(Professor.email.like(f"%{DOMINIO}"))))
+    yield Caso("PUT /professores/{professor_id}", [("PUT", f"/professores/{profs[f'upsert{i}{DOMINIO}']}", {
+        "nome": f"{PREFIXO_NOME}U{i} atualizado", "email": f"upsert{i}{DOMINIO}", "id_departamento": deps[f"B{i:04d}"]})
+        for i in range(w)])
+
+    def disciplina(i: int, sufixo: str = "") -> dict:
+        return {"nome": f"{PREFIXO_NOME}{i}{sufixo}", "carga_horaria": 64,
+                "id_professor": profs[f"professor{i}{DOMINIO}"], "departamento_disciplina_cod": f"B{i:04d}"}
+
+    yield Caso("POST /disciplinas/", [("POST", "/disciplinas/", disciplina(i)) for i in range(w)])
+    discs = [id_ for (id_,) in _consultar(engine, select(Disciplina.id).where(Disciplina.nome.like(f"{PREFIXO_NOME}%"))
+                                          .order_by(Disciplina.id))]
+    yield Caso("PUT /disciplinas/{disciplina_id}", [("PUT", f"/disciplinas/{id_}", disciplina(i, " atualizada"))
+                                                    for i, id_ in enumerate(discs)])
+
+    # Alunos: CPFs 91... por POST, 92... por upsert e 93... pela importação em lote
+    yield Caso("POST /alunos/", [("POST", "/alunos/", _aluno(f"91{i:09d}", i)) for i in range(w)])
+    yield Caso("PUT /alunos/por-cpf", [("PUT", "/alunos/por-cpf", [_aluno(f"92{i:09d}", i)]) for i in range(w)])
+    yield Caso("PUT /alunos/por-cpf/{cpf}", [("PUT", f"/alunos/por-cpf/91{i:09d}", _aluno(f"91{i:09d}", i + 1))
+                                             for i in range(w)])
+    yield Caso("POST /alunos/bulk", [("POST", "/alunos/bulk?formato=ndjson", "".join(
+        json.dumps(_aluno(f"93{i * LINHAS_POR_LOTE + j:09d}", j)) + "\n" for j in range(LINHAS_POR_LOTE)))
+        for i in range(w)])
+    por_cpf = dict(_consultar(engine, select(Aluno.cpf, Aluno.id).where(Aluno.email.like(f"%{DOMINIO}"))))
+    yield Caso("PUT /alunos/{aluno_id}", [("PUT", f"/alunos/{por_cpf[f'92{i:09d}']}", _aluno(f"92{i:09d}", i + 1))
+                                          for i in range(w)])
+
+    # Carteiras: BP... por POST (alunos 91...), BU... por upsert (alunos 92...)
+    yield Caso("POST /carteiras/", [("POST", f"/carteiras/?id_aluno={por_cpf[f'91{i:09d}']}", {
+        "validade": validade, "numero_de_registro": f"BP{i:08d}"}) for i in range(w)])
+    yield Caso("PUT /carteiras/por-registro", [("PUT", "/carteiras/por-registro", [{
+        "validade": validade, "numero_de_registro": f"BU{i:08d}", "id_aluno": por_cpf[f"92{i:09d}"]}])
+        for i in range(w)])
+    yield Caso("PUT /carteiras/por-registro/{numero_de_registro}", [("PUT", f"/carteiras/por-registro/BP{i:08d}", {
+        "validade": validade, "numero_de_registro": f"BP{i:08d}", "id_aluno": por_cpf[f"91{i:09d}"]})
+        for i in range(w)])
+    carteiras = dict(_consultar(engine, select(CarteiraEstudantil.numero_de_registro, CarteiraEstudantil.id)
+                                .where(CarteiraEstudantil.numero_de_registro.like("BP%"))))
+    yield Caso("PATCH /carteiras/{carteira_id}", [("PATCH", f"/carteiras/{carteiras[f'BP{i:08d}']}?status_novo=false", None)
+                                                  for i in range(w)])
+
+    # Matrículas só na primeira metade das disciplinas: a rota de remoção não apaga uma
+    # disciplina com matrículas. Alunos 91... um a um; os da importação em turmas
+    com_turma, sem_turma = discs[:max(1, w // 2)], discs[max(1, w // 2):]
+    pares = [(por_cpf[f"91{i:09d}"], com_turma[i % len(com_turma)]) for i in range(w)]
+    turmas = [(com_turma[i % len(com_turma)],
+               [por_cpf[f"93{i * LINHAS_POR_LOTE + j:09d}"] for j in range(LINHAS_POR_LOTE)])
+              for i in range(w)]
+    yield Caso("POST /matriculas/", [("POST", "/matriculas/", {
+        "id_aluno": aluno, "disciplina_id": disc, "semestre": SEMESTRE}) for aluno, disc in pares])
+    yield Caso("POST /disciplinas/{disciplina_id}/matriculas/bulk", [
+        ("POST", f"/disciplinas/{disc}/matriculas/bulk", {"ids_alunos": ids, "semestre": SEMESTRE})
+        for disc, ids in turmas])
+    yield Caso("PATCH /disciplinas/{disciplina_id}/matriculas", [
+        ("PATCH", f"/disciplinas/{disc}/matriculas", [
+            {"id_aluno": aluno, "nota_final": round(m.rng.uniform(0, 10), 1), "numero_faltas": m.rng.randrange(0, 20)}
+            for aluno in ids])
+        for disc, ids in turmas])
+    yield Caso("POST /matriculas/faltas", [("POST", "/matriculas/faltas", [
+        {"id_aluno": aluno, "disciplina_id": disc, "delta": 1}]) for aluno, disc in pares])
+    yield Caso("PATCH /matriculas/{id_aluno}/{disciplina_id}", [("PATCH", f"/matriculas/{aluno}/{disc}", {
+        "nota_final": round(m.rng.uniform(0, 10), 1)}) for aluno, disc in pares])
+
+    # Remoções, das folhas para as raízes
+    yield Caso("DELETE /matriculas/{id_aluno}/{disciplina_id}", [("DELETE", f"/matriculas/{aluno}/{disc}", None)
+                                                                 for aluno, disc in pares])
+    yield Caso("DELETE /carteiras/{carteira_id}", [("DELETE", f"/carteiras/{id_}", None) for id_ in carteiras.values()])
+    yield Caso("DELETE /alunos/{aluno_id}", [("DELETE", f"/alunos/{por_cpf[f'91{i:09d}']}", None) for i in range(w)])
+    yield Caso("DELETE /disciplinas/{disciplina_id}", [("DELETE", f"/disciplinas/{id_}", None) for id_ in sem_turma])
+    yield Caso("DELETE /professores/{professor_id}", [("DELETE", f"/professores/{profs[f'upsert{i}{DOMINIO}']}", None)
+                                                      for i in range(w)])
+    yield Caso("DELETE /departamentos/{departamento_id}", [("DELETE", f"/departamentos/{deps[f'U{i:04d}']}", None)
+                                                           for i in range(w)])
+
+
+def _limpar(engine) -> None:
+    # Apaga o que as escritas criaram (inclusive de uma execução interrompida)
+    alunos = select(Aluno.id).where(Aluno.email.like(f"%{DOMINIO}"))
+    disciplinas = select(Disciplina.id).where(Disciplina.nome.like(f"{PREFIXO_NOME}%"))
+    with engine.begin() as connection:
+        connection.execute(delete(Matricula).where(or_(Matricula.id_aluno.in_(alunos),
+                                                       Matricula.disciplina_id.in_(disciplinas))))
+        connection.execute(delete(CarteiraEstudantil).where(or_(CarteiraEstudantil.id_aluno.in_(alunos),
+                                                                CarteiraEstudantil.numero_de_registro.like("B%"))))
+        connection.execute(delete(Aluno).where(Aluno.email.like(f"%{DOMINIO}")))
+        connection.execute(delete(Disciplina).where(Disciplina.nome.like(f"{PREFIXO_NOME}%")))
+        connection.execute(delete(Professor).where(Professor.email.like(f"%{DOMINIO}")))
+        connection.execute(delete(Departamento).where(Departamento.nome.like(f"{PREFIXO_NOME}%")))
+
+
+def preparar_banco(url: str, alunos: int, matriculas_por_aluno: int, semente: int):
+    """
+    Cria as tabelas e popula o banco de `url` com `alunos` alunos, ou reaproveita um
+    banco já populado com o mesmo tamanho. Devolve o engine.
+    """
+    from sqlmodel import SQLModel, create_engine
+
+    destino = make_url(url)
+    if destino.get_backend_name() == "sqlite" and destino.database:
+        os.makedirs(os.path.dirname(destino.database) or ".", exist_ok=True)
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    _limpar(engine)
+
+    with engine.connect() as connection:
+        existentes = connection.execute(select(func.count()).select_from(Aluno)).scalar()
+    if existentes == 0:
+        print(f"Populando {url} com {alunos} alunos...", flush=True)
+        with engine.begin() as connection:
+            popular(connection, alunos, matriculas_por_aluno, semente)
+        with engine.begin() as connection:
+            connection.exec_driver_sql("ANALYZE")
+    elif existentes != alunos:
+        raise SystemExit(f"{url} tem {existentes} alunos, não {alunos}: use um banco vazio ou do mesmo tamanho.")
+    return engine
+
+
+def _faixas(engine) -> dict[str, tuple[int, int]]:
+    faixas = {}
+    for modelo in (Aluno, CarteiraEstudantil, Departamento, Disciplina, Professor):
+        (menor, maior), = _consultar(engine, select(func.min(modelo.id), func.max(modelo.id)))
+        faixas[modelo.__tablename__] = (menor, maior)
+    return faixas
+
+
+def executar(url: str, m: Massa, concorrencia: int, filtro: str | None) -> dict[str, dict]:
+    resultados = {}
+
+    def rodar(caso: Caso, aquecer: bool = False) -> None:
+        print(f"  {caso.nome}", flush=True)
+        if aquecer:
+            medir(url, caso.requisicoes[:max(1, len(caso.requisicoes) // 10)], concorrencia)
+        resultados[caso.nome] = {"rota": caso.rota, **medir(url, caso.requisicoes, concorrencia)}
+
+    for caso in leituras(m):
+        if filtro is None or filtro in caso.nome:
+            rodar(caso, aquecer=True)
+    # As escritas dependem umas das outras: rodam todas, mesmo com --rotas, e só as
+    # filtradas entram no resultado. Um caso com erros interrompe as seguintes
+    for caso in escritas(m):
+        rodar(caso)
+        erros = resultados[caso.nome]["erros"]
+        if filtro is not None and filtro not in caso.nome:
+            del resultados[caso.nome]
+        if erros:
+            print(f"  {caso.nome}: {erros} erro(s); as escritas seguintes dependem dele e não rodam", flush=True)
+            break
+    return resultados
+
+
+def rotas_sem_caso(app, resultados: dict[str, dict[str, dict]]) -> list[str]:
+    from fastapi.routing import APIRoute
+
+    medidas = {r["rota"] for por_caso in resultados.values() for r in por_caso.values()}
+    return sorted(f"{metodo} {rota.path}" for rota in app.routes if isinstance(rota, APIRoute)
+                  for metodo in rota.methods if f"{metodo} {rota.path}" not in medidas)
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(base: dict, atual: dict, limiar: float, metrica: str, tolerancia_ms: float) -> list[str]:
+    """
+    Casos do `atual` que pioraram em relação ao `base`: `metrica` acima de (1 + limiar)
+    vezes a anterior (e mais que `tolerancia_ms`), vazão abaixo de (1 - limiar) vezes a
+    anterior ou mais erros. Imprime a tabela comparativa.
+    """
+    regressoes = []
+    print(f"{'alunos':>8} {'caso':<58} {'base ' + metrica:>14} {'atual':>10} {'var %':>8} {'req/s %':>8}")
+    for tamanho, casos in atual["resultados"].items():
+        anteriores = base["resultados"].get(tamanho, {})
+        for caso, r in casos.items():
+            anterior = anteriores.get(caso)
+            if anterior is None:
+                print(f"{tamanho:>8} {caso:<58} {'-':>14} {r[metrica]:>10} {'novo':>8}")
+                continue
+            variacao = (r[metrica] / anterior[metrica] - 1) if anterior[metrica] else 0.0
+            variacao_vazao = (r["vazao_rps"] / anterior["vazao_rps"] - 1) if anterior["vazao_rps"] else 0.0
+            motivos = []
+            if variacao > limiar and r[metrica] - anterior[metrica] > tolerancia_ms:
+                motivos.append(f"{metrica} +{variacao:.0%}")
+            if variacao_vazao < -limiar:
+                motivos.append(f"vazão {variacao_vazao:.0%}")
+            if r["erros"] > anterior["erros"]:
+                motivos.append(f"erros {anterior['erros']} -> {r['erros']}")
+            if motivos:
+                regressoes.append(f"{tamanho} alunos, {caso}: {', '.join(motivos)}")
+            print(f"{tamanho:>8} {caso:<58} {anterior[metrica]:>14} {r[metrica]:>10} {variacao:>8.1%} "
+                  f"{variacao_vazao:>8.1%}{'  REGRESSÃO' if motivos else ''}")
+    return regressoes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alunos", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--url", default=URL_PADRAO, help="URL do banco de cada tamanho, com {alunos} (padrão: %(default)s)")
+    parser.add_argument("--matriculas-por-aluno", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--concorrencia", type=int, default=20)
+    parser.add_argument("--requisicoes", type=int, default=500, help="Requisições por caso de leitura")
+    parser.add_argument("--escritas", type=int, default=100, help="Requisições por caso de escrita")
+    parser.add_argument("--exportacoes", type=int, default=3, help="Requisições por exportação")
+    parser.add_argument("--rotas", help="Só os casos cujo nome contém este texto (ex.: /alunos)")
+    parser.add_argument("--env", action="append", default=[], metavar="VAR=VALOR",
+                        help="Variável de ambiente da API (ex.: DATABASE_ASYNC=1); pode repetir")
+    parser.add_argument("--saida", help="Arquivo JSON com os resultados")
+    parser.add_argument("--comparar", nargs="+", metavar="JSON",
+                        help="Resultado anterior; com dois arquivos, só compara o segundo com o primeiro")
+    parser.add_argument("--limiar", type=float, default=0.1, help="Piora relativa tolerada (padrão: 10%%)")
+    parser.add_argument("--metrica", choices=["p50_ms", "p95_ms", "p99_ms"], default="p95_ms")
+    parser.add_argument("--tolerancia-ms", type=float, default=1.0,
+                        help="Diferença absoluta de latência abaixo da qual não há regressão")
+    args = parser.parse_args()
+
+    if args.comparar and len(args.comparar) > 2:
+        parser.error("--comparar aceita no máximo dois arquivos")
+    falhas = 0
+    if args.comparar and len(args.comparar) == 2:
+        with open(args.comparar[0]) as arquivo_base, open(args.comparar[1]) as arquivo_atual:
+            base, atual = json.load(arquivo_base), json.load(arquivo_atual)
+    else:
+        env = dict(variavel.split("=", 1) for variavel in args.env)
+        # database.py (importado por routes.main) precisa de uma URL e registra os
+        # listeners do metadata usados pelo create_all de cada banco
+        os.environ.setdefault("DATABASE_URL", args.url.format(alunos=args.alunos[0]))
+        from routes.main import app
+
+        atual = {
+            "metadados": {
+                "inicio": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "commit": _commit(),
+                "python": platform.python_version(),
+                "concorrencia": args.concorrencia,
+                "requisicoes": args.requisicoes,
+                "escritas": args.escritas,
+                "exportacoes": args.exportacoes,
+                "matriculas_por_aluno": args.matriculas_por_aluno,
+                "semente": args.semente,
+                "env": env,
+            },
+            "resultados": {},
+        }
+        for alunos in args.alunos:
+            url = args.url.format(alunos=alunos)
+            engine = preparar_banco(url, alunos, args.matriculas_por_aluno, args.semente)
+            atual["metadados"].setdefault("banco", engine.dialect.name)
+            massa = Massa(engine, random.Random(args.semente), args.requisicoes, args.escritas, args.exportacoes,
+                          _faixas(engine))
+            print(f"{alunos} alunos:", flush=True)
+            try:
+                with servidor({**env, "DATABASE_URL": url}) as url_api:
+                    resultados = executar(url_api, massa, args.concorrencia, args.rotas)
+            finally:
+                _limpar(engine)
+                engine.dispose()
+            atual["resultados"][str(alunos)] = resultados
+
+            print(f"{'caso':<58} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erros':>6}")
+            for caso, r in resultados.items():
+                print(f"{caso:<58} {r['vazao_rps']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['erros']:>6}")
+
+        if args.saida:
+            with open(args.saida, "w") as arquivo:
+                json.dump(atual, arquivo, indent=2, ensure_ascii=False)
+
+        if args.rotas is None:
+            for rota in rotas_sem_caso(app, atual["resultados"]):
+                falhas += 1
+                print(f"Rota sem medida nesta execução: {rota}")
+        if not args.comparar:
+            return 1 if falhas else 0
+        with open(args.comparar[0]) as arquivo_base:
+            base = json.load(arquivo_base)
+
+    regressoes = comparar(base, atual, args.limiar, args.metrica, args.tolerancia_ms)
+    for regressao in regressoes:
+        print(f"REGRESSÃO {regressao}")
+    print(f"{len(regressoes)} regressão(ões) acima de {args.limiar:.0%}.")
+    return 1 if regressoes or falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
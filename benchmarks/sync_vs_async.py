@@ -0,0 +1,50 @@
+"""
+Compara vazão e latência p99 da API no modo síncrono (threadpool) e no assíncrono
+(DATABASE_ASYNC=1) com o mesmo banco e a mesma carga.
+
+Uso: python -m benchmarks.sync_vs_async --concorrencia 200 --requisicoes 20000
+"""
+import argparse
+import json
+import sys
+
+from benchmarks.carga import medir, requisicoes_get, servidor
+
+CAMINHOS = [
+    "/alunos/?limit=20",
+    "/alunos/1",
+    "/matriculas/?semestre=25.1&limit=20",
+    "/carteiras/?limit=20",
+    "/disciplinas/?limit=20",
+    "/departamentos/stats/professores",
+]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concorrencia", type=int, default=200)
+    parser.add_argument("--requisicoes", type=int, default=20_000)
+    parser.add_argument("--saida", help="Arquivo JSON com os resultados")
+    args = parser.parse_args()
+
+    requisicoes = requisicoes_get(CAMINHOS, args.requisicoes)
+    resultados = {}
+    for modo, assincrono in (("sync", "0"), ("async", "1")):
+        with servidor({"DATABASE_ASYNC": assincrono}) as url:
+            medir(url, requisicoes[:500], args.concorrencia)  # aquecimento
+            resultados[modo] = medir(url, requisicoes, args.concorrencia)
+
+    print(f"{'modo':<6} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'erros':>7}")
+    for modo, r in resultados.items():
+        print(f"{modo:<6} {r['vazao_rps']:>10} {r['p50_ms']:>10} {r['p99_ms']:>10} {r['erros']:>7}")
+
+    if args.saida:
+        with open(args.saida, "w") as arquivo:
+            json.dump(resultados, arquivo, indent=2)
+
+    # Medição com requisições que falharam não vale: sai com 1 para o CI (ou quem roda) ver
+    return 1 if any(r["erros"] for r in resultados.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
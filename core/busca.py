@@ -0,0 +1,107 @@
+import unicodedata
+
+from sqlalchemy import Float, Integer, func, literal, text
+
+# Tabelas com busca por nome: no Postgres usam índice GIN (pg_trgm) sobre f_unaccent(lower(nome)),
+# no SQLite uma tabela-sombra FTS5 (tokenizer trigram) com o nome já normalizado.
+TABELAS_BUSCA = ("aluno", "professor", "disciplina", "departamento")
+
+# Termos menores que um trigrama não podem usar o índice FTS5 via MATCH
+_TAMANHO_MINIMO_MATCH = 3
+
+
+def normalizar(texto: str | None) -> str | None:
+    """
+    Remove acentos e caixa, equivalente ao f_unaccent(lower(...)) do Postgres.
+    """
+    if texto is None:
+        return None
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def _escapar_like(termo: str) -> str:
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def registrar_funcoes_sqlite(dbapi_connection) -> None:
+    dbapi_connection.create_function("normalizar_busca", 1, normalizar, deterministic=True)
+
+
+def criar_busca_sqlite(connection) -> None:
+    """
+    Cria (se ainda não existirem) as tabelas FTS5 de busca e os triggers que as mantêm,
+    reconstruindo o conteúdo a partir das tabelas de origem.
+    """
+    registrar_funcoes_sqlite(connection.connection.dbapi_connection)
+    for tabela in TABELAS_BUSCA:
+        fts = f"{tabela}_busca"
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(nome, tokenize='trigram')"
+        )
+        connection.exec_driver_sql(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabela} BEGIN
+                INSERT INTO {fts}(rowid, nome) VALUES (new.id, normalizar_busca(new.nome));
+            END""")
+        connection.exec_driver_sql(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabela} BEGIN
+                DELETE FROM {fts} WHERE rowid = old.id;
+            END""")
+        connection.exec_driver_sql(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF nome ON {tabela} BEGIN
+                UPDATE {fts} SET nome = normalizar_busca(new.nome) WHERE rowid = new.id;
+            END""")
+        connection.exec_driver_sql(f"DELETE FROM {fts}")
+        connection.exec_driver_sql(
+            f"INSERT INTO {fts}(rowid, nome) SELECT id, normalizar_busca(nome) FROM {tabela}"
+        )
+
+
+def ao_criar_tabelas(target, connection, **kw) -> None:
+    # Listener de `after_create` do metadata: no SQLite (testes) a busca depende das tabelas FTS5
+    if connection.dialect.name == "sqlite":
+        criar_busca_sqlite(connection)
+
+
+def _dialeto(origem) -> str:
+    # Session (via get_bind) ou Connection/AsyncConnection (usadas pela exportação)
+    return (origem.dialect if hasattr(origem, "dialect") else origem.get_bind().dialect).name
+
+
+def filtrar_por_nome(statement, coluna, termo: str, session, ordenar_por_relevancia: bool = False):
+    """
+    Filtra `coluna` (nome de Aluno, Professor, Disciplina ou Departamento) por substring,
+    ignorando acentos e caixa, usando o índice de busca do banco.
+    Com `ordenar_por_relevancia`, os resultados mais parecidos com o termo vêm primeiro.
+    """
+    modelo = coluna.class_
+    dialeto = _dialeto(session)
+
+    if dialeto == "postgresql":
+        alvo = func.f_unaccent(func.lower(coluna))
+        padrao = func.f_unaccent(func.lower(literal(_escapar_like(termo))))
+        statement = statement.where(alvo.like(literal("%") + padrao + literal("%"), escape="\\"))
+        if ordenar_por_relevancia:
+            statement = statement.order_by(
+                func.word_similarity(func.f_unaccent(func.lower(literal(termo))), alvo).desc()
+            )
+        return statement
+
+    if dialeto == "sqlite":
+        fts = f"{modelo.__tablename__}_busca"
+        normalizado = normalizar(termo)
+        if len(normalizado) >= _TAMANHO_MINIMO_MATCH:
+            frase = '"' + normalizado.replace('"', '""') + '"'
+            consulta = text(f"SELECT rowid AS id, rank AS relevancia FROM {fts} WHERE {fts} MATCH :termo")
+            consulta = consulta.bindparams(termo=frase)
+        else:
+            consulta = text(f"SELECT rowid AS id, 0.0 AS relevancia FROM {fts} WHERE nome LIKE :termo ESCAPE '\\'")
+            consulta = consulta.bindparams(termo=f"%{_escapar_like(normalizado)}%")
+        encontrados = consulta.columns(id=Integer, relevancia=Float).subquery()
+
+        statement = statement.join(encontrados, encontrados.c.id == modelo.id)
+        if ordenar_por_relevancia:
+            statement = statement.order_by(encontrados.c.relevancia)
+        return statement
+
+    return statement.where(coluna.icontains(termo))
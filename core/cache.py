@@ -0,0 +1,311 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Iterable
+
+from fastapi import Request, Response
+from sqlmodel import SQLModel
+
+from core.concorrencia import bloqueante
+from core.condicional import cabecalhos, calcular_versao, condicional, nao_modificado, resposta_304
+from core.replica import leu_da_replica
+
+# Respostas de GET por id, já serializadas, indexadas por "entidade:id". Cada entrada
+# também carrega tags ("aluno:3", "carteira:7", ...) das entidades que aparecem nela;
+# as rotas de escrita invalidam por tag, o que remove a entrada e suas dependentes.
+#
+# Uma falta que carregou o objeto antes de uma escrita não pode gravá-lo depois da
+# invalidação (ficaria velho até o TTL). Cada invalidação dá às suas tags uma nova
+# geração (um contador global crescente); a falta lê a geração atual antes de carregar e
+# só grava se nenhuma tag da entrada (nem a própria chave) foi invalidada desde então.
+#
+# O acesso ao backend (rede do Redis, locks) e a serialização passam por `bloqueante`
+# (core/concorrencia.py): no modo assíncrono não travam o event loop.
+#
+# Configuração: CACHE_BACKEND=memoria (padrão) | redis | desligado, CACHE_URL (redis),
+# CACHE_MAX_ENTRADAS e CACHE_TTL_S.
+
+HEADER_CACHE = "X-Cache"
+
+
+def tag(entidade: str, id_: Any) -> str:
+    return f"{entidade}:{id_}"
+
+
+def _empacotar(etag: str | None, ultima_modificacao: datetime | None, corpo: bytes) -> bytes:
+    # "etag\nlast-modified\ncorpo": o mesmo formato serve para os dois backends
+    data = ultima_modificacao.isoformat() if ultima_modificacao else ""
+    return f"{etag or ''}\n{data}\n".encode() + corpo
+
+
+def _desempacotar(valor: bytes) -> tuple[str | None, datetime | None, bytes]:
+    etag, data, corpo = valor.split(b"\n", 2)
+    return etag.decode() or None, datetime.fromisoformat(data.decode()) if data else None, corpo
+
+
+class BackendMemoria:
+    """
+    LRU limitado por número de entradas, com TTL. Só vale para o processo atual.
+    """
+
+    def __init__(self, max_entradas: int = 10_000, ttl: float = 60.0):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._dados: OrderedDict[str, tuple[float, bytes, tuple[str, ...]]] = OrderedDict()
+        self._por_tag: dict[str, set[str]] = {}
+        # Última geração de cada tag invalidada, limitada a max_entradas tags; as que saem
+        # sobem o piso, a geração assumida para as tags que não estão no dicionário
+        self._geracao = 0
+        self._geracoes: OrderedDict[str, int] = OrderedDict()
+        self._piso = 0
+        self.despejos = 0
+        self.expiracoes = 0
+
+    def _remover(self, chave: str) -> None:
+        _, _, tags = self._dados.pop(chave)
+        for t in tags:
+            chaves = self._por_tag.get(t)
+            if chaves is not None:
+                chaves.discard(chave)
+                if not chaves:
+                    del self._por_tag[t]
+
+    def obter(self, chave: str) -> bytes | None:
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is None:
+                return None
+            if entrada[0] < time.monotonic():
+                self._remover(chave)
+                self.expiracoes += 1
+                return None
+            self._dados.move_to_end(chave)
+            return entrada[1]
+
+    def geracao(self) -> int:
+        with self._lock:
+            return self._geracao
+
+    def gravar(self, chave: str, valor: bytes, tags: Iterable[str], geracao: int | None = None) -> bool:
+        tags = tuple({chave, *tags})
+        with self._lock:
+            if geracao is not None and max(self._geracoes.get(t, self._piso) for t in tags) > geracao:
+                return False
+            if chave in self._dados:
+                self._remover(chave)
+            self._dados[chave] = (time.monotonic() + self.ttl, valor, tags)
+            for t in tags:
+                self._por_tag.setdefault(t, set()).add(chave)
+            while len(self._dados) > self.max_entradas:
+                self._remover(next(iter(self._dados)))
+                self.despejos += 1
+        return True
+
+    def invalidar(self, tags: Iterable[str]) -> int:
+        tags = tuple(tags)
+        with self._lock:
+            self._geracao += 1
+            for t in tags:
+                self._geracoes[t] = self._geracao
+                self._geracoes.move_to_end(t)
+            while len(self._geracoes) > self.max_entradas:
+                _, self._piso = self._geracoes.popitem(last=False)
+            chaves = set().union(*(self._por_tag.get(t, ()) for t in tags))
+            for chave in chaves:
+                self._remover(chave)
+            return len(chaves)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._dados.clear()
+            self._por_tag.clear()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {"backend": "memoria", "entradas": len(self._dados), "max_entradas": self.max_entradas,
+                    "ttl_s": self.ttl, "despejos": self.despejos, "expiracoes": self.expiracoes}
+
+
+class BackendRedis:
+    """
+    Backend compartilhado entre processos/workers. Cada tag é um SET com as chaves que
+    a carregam; o TTL de entradas e tags fica a cargo do Redis. A geração global é um
+    INCR e a de cada tag uma chave com TTL (uma carga não dura tanto).
+    """
+
+    def __init__(self, url: str, ttl: float = 60.0, prefixo: str = "cache:"):
+        try:
+            import redis
+        except ImportError as erro:
+            raise RuntimeError("CACHE_BACKEND=redis requer o pacote 'redis' (extra 'cache').") from erro
+        self._cliente = redis.Redis.from_url(url)
+        self._erro_watch = redis.WatchError
+        self.ttl = int(ttl)
+        self._prefixo = prefixo
+
+    def obter(self, chave: str) -> bytes | None:
+        return self._cliente.get(self._prefixo + chave)
+
+    def geracao(self) -> int:
+        return int(self._cliente.get(f"{self._prefixo}geracao") or 0)
+
+    def gravar(self, chave: str, valor: bytes, tags: Iterable[str], geracao: int | None = None) -> bool:
+        tags = {chave, *tags}
+        chaves_geracao = [f"{self._prefixo}geracao:{t}" for t in tags]
+        with self._cliente.pipeline() as pipe:
+            try:
+                # WATCH: uma invalidação entre a conferência e o EXEC derruba a transação
+                pipe.watch(*chaves_geracao)
+                if geracao is not None and any(int(g) > geracao for g in pipe.mget(chaves_geracao) if g is not None):
+                    return False
+                pipe.multi()
+                pipe.set(self._prefixo + chave, valor, ex=self.ttl)
+                for t in tags:
+                    pipe.sadd(f"{self._prefixo}tag:{t}", chave)
+                    pipe.expire(f"{self._prefixo}tag:{t}", self.ttl)
+                pipe.execute()
+            except self._erro_watch:
+                return False
+        return True
+
+    def invalidar(self, tags: Iterable[str]) -> int:
+        tags = tuple(tags)
+        # A geração sobe antes de apagar: uma gravação concorrente ou é recusada ou é apagada
+        geracao = self._cliente.incr(f"{self._prefixo}geracao")
+        pipe = self._cliente.pipeline()
+        for t in tags:
+            pipe.set(f"{self._prefixo}geracao:{t}", geracao, ex=self.ttl)
+        pipe.execute()
+        chaves_tags = [f"{self._prefixo}tag:{t}" for t in tags]
+        pipe = self._cliente.pipeline()
+        for chave_tag in chaves_tags:
+            pipe.smembers(chave_tag)
+        chaves = set().union(*pipe.execute())
+        if chaves:
+            self._cliente.delete(*(self._prefixo + c.decode() for c in chaves))
+        self._cliente.delete(*chaves_tags)
+        return len(chaves)
+
+    def limpar(self) -> None:
+        for chave in self._cliente.scan_iter(f"{self._prefixo}*"):
+            self._cliente.delete(chave)
+
+    def metricas(self) -> dict:
+        estatisticas = self._cliente.info("stats")
+        return {"backend": "redis", "ttl_s": self.ttl,
+                "despejos": estatisticas.get("evicted_keys"), "expiracoes": estatisticas.get("expired_keys")}
+
+
+class Cache:
+    def __init__(self, backend: BackendMemoria | BackendRedis | None):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.invalidacoes = 0
+        self.descartes = 0
+
+    def _contar(self, contador: str, quantidade: int = 1) -> None:
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + quantidade)
+
+    def _ler(self, chave: str) -> tuple[bytes | None, int | None]:
+        # (entrada, None) num acerto; (None, geração) numa falta
+        entrada = self.backend.obter(chave)
+        if entrada is not None:
+            self._contar("acertos")
+            return entrada, None
+        self._contar("faltas")
+        # Antes de carregar: uma invalidação depois daqui pode ser de uma escrita que a carga não viu
+        return None, self.backend.geracao()
+
+    def _gravar(self, chave: str, valor: bytes, tags: Iterable[str], geracao: int | None) -> None:
+        if not self.backend.gravar(chave, valor, tags, geracao):
+            self._contar("descartes")
+
+    def _invalidar(self, tags: tuple[str, ...]) -> None:
+        self._contar("invalidacoes", self.backend.invalidar(tags))
+
+    def ler_ou_carregar(
+            self,
+            chave: str,
+            modelo: type[SQLModel],
+            carregar: Callable[[], Any],
+            tags: Callable[[Any], Iterable[str]] = lambda _: (),
+            *,
+            request: Request | None = None,
+            versoes: Callable[[Any], Iterable[datetime | None]] | None = None,
+            consultar_versoes: Callable[[], Iterable[datetime | None] | None] | None = None,
+    ) -> Response:
+        """
+        Devolve a resposta JSON de `chave` do cache ou, na falta, executa `carregar()`
+        (que pode levantar HTTPException, e nesse caso nada é gravado), serializa o
+        resultado com `modelo` e grava com as tags de `tags(resultado)`.
+
+        Com `versoes` (os `atualizado_em` do objeto carregado) a resposta leva ETag e
+        Last-Modified e GETs condicionais recebem 304: direto do cache ou, numa falta,
+        só com `consultar_versoes()` (quando informada), sem montar o objeto.
+
+        Numa falta, a gravação é descartada se alguma tag do resultado foi invalidada
+        durante a carga.
+        """
+        geracao = None
+        if self.backend is not None:
+            entrada, geracao = bloqueante(self._ler, chave)
+            if entrada is not None:
+                etag, ultima_modificacao, corpo = _desempacotar(entrada)
+                if request is not None and nao_modificado(request, etag, ultima_modificacao):
+                    return resposta_304(etag, ultima_modificacao)
+                return Response(content=corpo, media_type="application/json",
+                                headers={HEADER_CACHE: "HIT", **cabecalhos(etag, ultima_modificacao)})
+
+        if request is not None and consultar_versoes is not None and condicional(request):
+            atuais = consultar_versoes()
+            if atuais is not None:
+                etag, ultima_modificacao = calcular_versao(chave, atuais)
+                if nao_modificado(request, etag, ultima_modificacao):
+                    return resposta_304(etag, ultima_modificacao)
+
+        objeto = carregar()
+        etag, ultima_modificacao = calcular_versao(chave, versoes(objeto)) if versoes else (None, None)
+        # A validação lê os atributos do objeto ORM e fica aqui; o JSON (só CPU) vai para `bloqueante`
+        corpo = bloqueante(modelo.model_validate(objeto).model_dump_json).encode()
+        # Lido da réplica pode estar atrasado em relação a uma invalidação recente: não fica no cache
+        if self.backend is not None and not leu_da_replica(request):
+            bloqueante(self._gravar, chave, _empacotar(etag, ultima_modificacao, corpo), tuple(tags(objeto)), geracao)
+        if request is not None and nao_modificado(request, etag, ultima_modificacao):
+            return resposta_304(etag, ultima_modificacao)
+        return Response(content=corpo, media_type="application/json",
+                        headers={HEADER_CACHE: "MISS", **cabecalhos(etag, ultima_modificacao)})
+
+    def invalidar(self, *tags: str) -> None:
+        # Chamado depois do commit das rotas de escrita
+        if self.backend is not None and tags:
+            bloqueante(self._invalidar, tags)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            contadores = {"acertos": self.acertos, "faltas": self.faltas, "invalidacoes": self.invalidacoes,
+                          "descartes": self.descartes}
+        total = contadores["acertos"] + contadores["faltas"]
+        return {
+            **contadores,
+            "taxa_acerto": round(contadores["acertos"] / total, 4) if total else None,
+            **(bloqueante(self.backend.metricas) if self.backend is not None else {"backend": "desligado"}),
+        }
+
+
+def _criar_backend() -> BackendMemoria | BackendRedis | None:
+    tipo = os.getenv("CACHE_BACKEND", "memoria").lower()
+    ttl = float(os.getenv("CACHE_TTL_S", "60"))
+    if tipo == "desligado":
+        return None
+    if tipo == "redis":
+        return BackendRedis(os.getenv("CACHE_URL", "redis://localhost:6379/0"), ttl)
+    return BackendMemoria(int(os.getenv("CACHE_MAX_ENTRADAS", "10000")), ttl)
+
+
+cache = Cache(_criar_backend())
@@ -0,0 +1,66 @@
+import logging
+import os
+import threading
+from collections import Counter
+
+from sqlalchemy import exc
+
+logger = logging.getLogger(__name__)
+
+# Carregamento implícito (lazy load) de relacionamentos: cada acesso a um relacionamento
+# que a consulta não carregou vira um SELECT por objeto (o N+1 que aparece na
+# serialização). Com LAZY_LOAD:
+#   permitir -> comportamento padrão do SQLAlchemy, sem verificação
+#   avisar   -> (padrão) o lazy load acontece, mas é contado e logado (uma vez por relacionamento)
+#   proibir  -> levanta LazyLoadProibido; para desenvolvimento e para scripts.verificar_carregamentos
+# Cada rota declara o que carrega (selectinload/joinedload, ou core.inclusao).
+# Só contam os lazy loads que vão ao banco: um many-to-one já presente na sessão sai de
+# graça. O efeito é o de um raiseload("*", sql_only=True) aplicado a todos os níveis,
+# inclusive aos objetos trazidos pelos próprios selectinload/joinedload.
+
+MODOS = ("permitir", "avisar", "proibir")
+
+_lock = threading.Lock()
+# "Modelo.relacionamento" -> lazy loads desde o início do processo
+OCORRENCIAS: Counter[str] = Counter()
+
+
+class LazyLoadProibido(exc.InvalidRequestError):
+    """
+    Acesso a um relacionamento não carregado pela consulta, com LAZY_LOAD=proibir.
+    """
+
+
+def modo_do_ambiente() -> str:
+    modo = os.getenv("LAZY_LOAD", "avisar").lower()
+    if modo not in MODOS:
+        raise ValueError(f"LAZY_LOAD deve ser um de {', '.join(MODOS)} (recebido: {modo!r})")
+    return modo
+
+
+def _relacionamento(estado) -> str:
+    caminho = estado.loader_strategy_path
+    return str(caminho[-1]) if caminho is not None and len(caminho) else estado.lazy_loaded_from.class_.__name__
+
+
+def ouvinte(modo: str):
+    """
+    Listener de `do_orm_execute` da Session para o modo `avisar` ou `proibir`.
+    """
+    def verificar(estado) -> None:
+        if not estado.is_select or estado.lazy_loaded_from is None:
+            return
+        relacionamento = _relacionamento(estado)
+        if modo == "proibir":
+            raise LazyLoadProibido(
+                f"Lazy load de {relacionamento} (LAZY_LOAD=proibir): carregue o relacionamento "
+                f"na consulta com selectinload/joinedload"
+            )
+        with _lock:
+            OCORRENCIAS[relacionamento] += 1
+            primeira = OCORRENCIAS[relacionamento] == 1
+        if primeira:
+            logger.warning("Lazy load de %s: um SELECT por objeto; carregue o relacionamento na consulta",
+                           relacionamento)
+
+    return verificar
@@ -0,0 +1,23 @@
+from typing import Any, Callable, TypeVar
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+# No modo assíncrono (DATABASE_ASYNC=1) as rotas não são `async def` nativas: o corpo
+# síncrono de cada endpoint roda via AsyncSession.run_sync (core/roteador.py), num
+# greenlet dentro do próprio event loop. Só o I/O do banco devolve o controle ao loop;
+# qualquer outra chamada que bloqueie (rede do Redis, espera por um lock, CPU) para o
+# loop inteiro. Essas chamadas passam por `bloqueante`.
+
+T = TypeVar("T")
+
+
+def bloqueante(funcao: Callable[..., T], *args: Any) -> T:
+    """
+    Executa `funcao(*args)`. Dentro do greenlet do run_sync vai para o threadpool e o
+    greenlet espera o resultado sem travar o event loop; fora dele (modo síncrono, que
+    já roda no threadpool, ou threads de fundo) chama direto.
+    """
+    if in_greenlet():
+        return await_only(run_in_threadpool(funcao, *args))
+    return funcao(*args)
@@ -0,0 +1,85 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable
+
+from fastapi import Request, Response, status
+
+# GET condicional: o ETag de uma resposta é derivado das colunas `atualizado_em` de
+# todas as linhas que aparecem nela (a entidade e as que ela embute), então pode ser
+# calculado por uma consulta leve, sem montar o objeto.
+
+
+def _utc(valor: datetime) -> datetime:
+    # SQLite devolve datetimes sem fuso; as colunas são sempre gravadas em UTC
+    return valor.replace(tzinfo=timezone.utc) if valor.tzinfo is None else valor.astimezone(timezone.utc)
+
+
+def calcular_versao(chave: str, versoes: Iterable[datetime | int | None]) -> tuple[str, datetime | None]:
+    """
+    (ETag, Last-Modified) de uma resposta a partir dos `atualizado_em` das linhas que a compõem.
+    Linhas ausentes (None, ex.: aluno sem carteira) e contagens (int) também entram no hash.
+    """
+    versoes = list(versoes)
+    resumo = hashlib.sha1(chave.encode())
+    for versao in versoes:
+        if isinstance(versao, datetime):
+            resumo.update(b"|" + _utc(versao).isoformat().encode())
+        else:
+            resumo.update(b"|" + (str(versao).encode() if versao is not None else b"-"))
+    presentes = [_utc(v) for v in versoes if isinstance(v, datetime)]
+    return f'W/"{resumo.hexdigest()[:20]}"', max(presentes) if presentes else None
+
+
+def cabecalhos(etag: str | None, ultima_modificacao: datetime | None) -> dict[str, str]:
+    resultado = {}
+    if etag:
+        resultado["ETag"] = etag
+    if ultima_modificacao is not None:
+        resultado["Last-Modified"] = format_datetime(ultima_modificacao, usegmt=True)
+    return resultado
+
+
+def nao_modificado(request: Request, etag: str | None, ultima_modificacao: datetime | None) -> bool:
+    """
+    Avalia If-None-Match (comparação fraca) e, na ausência dele, If-Modified-Since.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag is None:
+            return False
+        candidatas = {parte.strip().removeprefix("W/") for parte in if_none_match.split(",")}
+        return "*" in candidatas or etag.removeprefix("W/") in candidatas
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and ultima_modificacao is not None:
+        try:
+            desde = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # Last-Modified tem resolução de segundos
+        return ultima_modificacao.replace(microsecond=0) <= _utc(desde)
+    return False
+
+
+def condicional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def resposta_304(etag: str | None, ultima_modificacao: datetime | None) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabecalhos(etag, ultima_modificacao))
+
+
+def etag_colecao(request: Request, response: Response, versoes: Iterable[datetime | int | None]) -> Response | None:
+    """
+    ETag de uma página de listagem (inclui o próximo cursor e o X-Total-Count). Devolve a
+    resposta 304 quando o cliente já tem esta versão; senão grava os cabeçalhos em `response`.
+    """
+    etag, ultima_modificacao = calcular_versao(
+        f"{request.url.path}?{request.url.query}|{response.headers.get('X-Next-Cursor', '')}"
+        f"|{response.headers.get('X-Total-Count', '')}", versoes
+    )
+    if nao_modificado(request, etag, ultima_modificacao):
+        return resposta_304(etag, ultima_modificacao)
+    response.headers.update(cabecalhos(etag, ultima_modificacao))
+    return None
@@ -0,0 +1,173 @@
+import json
+from typing import Literal
+
+from fastapi import Response
+from sqlalchemy import Integer, column, func, literal, select, table, true, values
+
+# Total das listagens no cabeçalho X-Total-Count, só quando pedido com `count`:
+#   exact    -> count(*) com os mesmos filtros da listagem
+#   estimate -> no Postgres, a estimativa de linhas do planejador (EXPLAIN); se ela for
+#               pequena, a contagem exata sai barata e é usada no lugar
+# Sem filtros o total vem sempre do contador mantido por triggers (contagemtabela), que
+# é exato e custa a leitura de uma linha. X-Total-Count-Type diz qual foi usado.
+# No Postgres os triggers são por comando (um INSERT em massa ajusta o contador uma vez);
+# no SQLite, por linha. TRUNCATE não dispara: use scripts.reconstruir_estatisticas.
+# O contador de cada tabela é dividido em FATIAS linhas e o total é a soma delas: no
+# Postgres cada conexão ajusta a fatia mod(pg_backend_pid(), FATIAS), então escritas
+# concorrentes na mesma tabela não esperam todas pelo lock de uma única linha. Uma fatia
+# pode ficar negativa (apaga numa o que foi contado noutra); só a soma tem significado.
+# O SQLite tem um escritor por vez e usa só a fatia 0.
+
+HEADER_TOTAL = "X-Total-Count"
+HEADER_TIPO_TOTAL = "X-Total-Count-Type"
+DESCRICAO_CONTAGEM = "Inclui o total em X-Total-Count: exact (count) ou estimate (estimativa do planejador)"
+# Abaixo disso a estimativa é trocada pela contagem exata
+LIMITE_ESTIMATIVA = 10_000
+
+ModoContagem = Literal["exact", "estimate"]
+
+# Tabelas com contador mantido
+TABELAS = ("aluno", "carteiraestudantil", "departamento", "disciplina", "matricula", "professor")
+
+# Linhas do contador de cada tabela (fatia 0 a FATIAS - 1)
+FATIAS = 16
+
+_AGORA_SQLITE = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+_FUNCAO_POSTGRES = f"""
+CREATE OR REPLACE FUNCTION contagem_tabela() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE contagemtabela SET total = total + (SELECT count(*) FROM novas), atualizado_em = now()
+        WHERE tabela = TG_TABLE_NAME AND fatia = mod(pg_backend_pid(), {FATIAS});
+    ELSE
+        UPDATE contagemtabela SET total = total - (SELECT count(*) FROM antigas), atualizado_em = now()
+        WHERE tabela = TG_TABLE_NAME AND fatia = mod(pg_backend_pid(), {FATIAS});
+    END IF;
+    RETURN NULL;
+END $$;
+"""
+
+
+def criar_triggers(connection) -> None:
+    """
+    Cria (ou recria) os triggers que mantêm contagemtabela.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(_FUNCAO_POSTGRES)
+        for tabela in TABELAS:
+            for sufixo, definicao in (("ins", "INSERT ON {t} REFERENCING NEW TABLE AS novas"),
+                                      ("del", "DELETE ON {t} REFERENCING OLD TABLE AS antigas")):
+                connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {tabela}_contagem_{sufixo} ON {tabela}")
+                connection.exec_driver_sql(
+                    f"CREATE TRIGGER {tabela}_contagem_{sufixo} AFTER {definicao.format(t=tabela)} "
+                    f"FOR EACH STATEMENT EXECUTE FUNCTION contagem_tabela()"
+                )
+    elif connection.dialect.name == "sqlite":
+        for tabela in TABELAS:
+            for sufixo, evento, sinal in (("ai", "INSERT", "+"), ("ad", "DELETE", "-")):
+                connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {tabela}_contagem_{sufixo}")
+                connection.exec_driver_sql(
+                    f"CREATE TRIGGER {tabela}_contagem_{sufixo} AFTER {evento} ON {tabela} BEGIN "
+                    f"UPDATE contagemtabela SET total = total {sinal} 1, atualizado_em = {_AGORA_SQLITE} "
+                    f"WHERE tabela = '{tabela}' AND fatia = 0; END"
+                )
+
+
+def remover_triggers(connection) -> None:
+    if connection.dialect.name == "postgresql":
+        for tabela in TABELAS:
+            for sufixo in ("ins", "del"):
+                connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {tabela}_contagem_{sufixo} ON {tabela}")
+        connection.exec_driver_sql("DROP FUNCTION IF EXISTS contagem_tabela()")
+    elif connection.dialect.name == "sqlite":
+        for tabela in TABELAS:
+            for sufixo in ("ai", "ad"):
+                connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {tabela}_contagem_{sufixo}")
+
+
+def reconstruir(connection) -> dict[str, int]:
+    """
+    Recalcula os contadores com count(*) (na fatia 0; as demais zeradas) e retorna o
+    total de cada tabela.
+    """
+    from models import ContagemTabela
+
+    agora = func.now() if connection.dialect.name == "postgresql" else func.strftime("%Y-%m-%d %H:%M:%f", "now")
+    connection.execute(ContagemTabela.__table__.delete())
+    for tabela in TABELAS:
+        connection.execute(ContagemTabela.__table__.insert().from_select(
+            ["tabela", "fatia", "total", "atualizado_em"],
+            select(literal(tabela), literal(0), func.count(), agora).select_from(table(tabela)),
+        ))
+    # CTE: o SQLite não aceita `(VALUES ...) AS fatias (fatia)`
+    fatias = values(column("fatia", Integer), name="fatias").data([(fatia,) for fatia in range(1, FATIAS)]).cte("fatias")
+    connection.execute(ContagemTabela.__table__.insert().from_select(
+        ["tabela", "fatia", "total", "atualizado_em"],
+        select(ContagemTabela.tabela, fatias.c.fatia, literal(0), ContagemTabela.atualizado_em).join(fatias, true()),
+    ))
+    return dict(connection.execute(
+        select(ContagemTabela.tabela, func.sum(ContagemTabela.total)).group_by(ContagemTabela.tabela)
+    ).all())
+
+
+def ao_criar_tabelas(target, connection, **kw) -> None:
+    # Listener de `after_create` do metadata (create_all): mesmo efeito da migration
+    criar_triggers(connection)
+    reconstruir(connection)
+
+
+def total_da_tabela(session, modelo) -> tuple[int, object]:
+    """
+    (total, atualizado_em) do contador da tabela (soma das fatias); sem o contador, cai
+    no count(*).
+    """
+    from models import ContagemTabela
+
+    linha = session.exec(
+        select(func.sum(ContagemTabela.total).label("total"), func.max(ContagemTabela.atualizado_em).label("atualizado_em"))
+        .where(ContagemTabela.tabela == modelo.__tablename__)
+    ).one()
+    if linha.total is not None:
+        return int(linha.total), linha.atualizado_em
+    return session.scalar(select(func.count()).select_from(modelo)), None
+
+
+def _estimativa(session, statement) -> int:
+    # Linhas estimadas pelo planejador para a consulta filtrada (sem executá-la)
+    connection = session.connection()
+    compilado = statement.compile(dialect=connection.dialect, compile_kwargs={"render_postcompile": True})
+    parametros = compilado.params
+    if connection.dialect.positional:
+        parametros = tuple(compilado.params[nome] for nome in compilado.positiontup)
+    plano = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compilado.string}", parametros).scalar()
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return int(plano[0]["Plan"]["Plan Rows"])
+
+
+def informar_total(session, response: Response, statement, modelo, modo: ModoContagem | None) -> None:
+    """
+    Preenche X-Total-Count com o total de `statement` (a consulta da listagem com os
+    filtros, antes da paginação). Não faz nada sem `modo`.
+    """
+    if modo is None:
+        return
+
+    tipo = "exact"
+    # Sem WHERE nem JOIN (a busca por nome do SQLite filtra por JOIN) é a tabela inteira
+    if statement.whereclause is None and statement.get_final_froms() == [modelo.__table__]:
+        total, _ = total_da_tabela(session, modelo)
+    else:
+        # Como subconsulta, a ordenação e as opções de carregamento do ORM não entram
+        filtrada = statement.order_by(None).subquery()
+        total = None
+        if modo == "estimate" and session.get_bind().dialect.name == "postgresql":
+            estimativa = _estimativa(session, select(filtrada))
+            if estimativa >= LIMITE_ESTIMATIVA:
+                total, tipo = estimativa, "estimate"
+        if total is None:
+            total = session.scalar(select(func.count()).select_from(filtrada))
+
+    response.headers[HEADER_TOTAL] = str(total)
+    response.headers[HEADER_TIPO_TOTAL] = tipo
@@ -0,0 +1,182 @@
+from typing import Any, Iterable, Sequence
+
+from sqlalchemy import Integer, cast, column, func, insert as insert_generico, literal_column, or_, select, true, update, values
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import SQLModel
+
+from models.comum import agora_utc
+
+
+def insert(session, modelo):
+    """
+    INSERT do dialeto da sessão, que expõe `on_conflict_do_nothing`/`on_conflict_do_update`
+    (Postgres e SQLite); nos demais bancos volta ao INSERT genérico.
+    """
+    dialeto = session.get_bind().dialect.name
+    if dialeto == "postgresql":
+        return postgresql.insert(modelo)
+    if dialeto == "sqlite":
+        return sqlite.insert(modelo)
+    return insert_generico(modelo)
+
+
+def upsert(session, modelo, linhas: list[dict], chave: str, somente_insercao: Iterable[str] = (),
+           anteriores: Sequence[str] = ()) -> list:
+    """
+    INSERT ... ON CONFLICT (chave) DO UPDATE com todas as linhas numa única instrução.
+    Linhas repetidas na entrada ficam com a última ocorrência. Só reescreve as linhas
+    que de fato mudaram (um replay idêntico não altera `atualizado_em` nem o ETag);
+    retorna as linhas inseridas ou alteradas. Colunas de `somente_insercao` (ex.:
+    data de criação) são gravadas só na inserção. Cada coluna de `anteriores` volta
+    também como `anterior_<coluna>`, com o valor de antes da instrução (None nas
+    linhas inseridas): por exemplo, o pai de quem mudou de pai.
+    """
+    linhas = list({linha[chave]: linha for linha in linhas}.values())
+    tabela = modelo.__table__
+    nomes = sorted({coluna for linha in linhas for coluna in linha})
+    colunas = [coluna for coluna in nomes if coluna not in {chave, *somente_insercao}]
+
+    statement = insert(session, modelo)
+    retorno_anterior = []
+    if anteriores:
+        # A origem do INSERT consulta a CTE MATERIALIZED: o SQLite a calcula inteira antes
+        # de gravar a primeira linha (no Postgres, a instrução toda já vê o snapshot anterior)
+        antes = (
+            select(tabela.c[chave], *(tabela.c[coluna] for coluna in anteriores))
+            .where(tabela.c[chave].in_([linha[chave] for linha in linhas]))
+            .cte("anteriores").prefix_with("MATERIALIZED")
+        )
+        v = _valores(tabela, nomes, linhas)
+        origem = select(*v.c).select_from(v.outerjoin(antes, antes.c[chave] == v.c[chave])).where(true())
+        statement = statement.from_select(nomes, origem).add_cte(v, antes)
+        # No RETURNING o SQLAlchemy não qualifica as colunas da tabela: sem o nome da tabela,
+        # `chave = chave` na subconsulta seria ambíguo no SQLite
+        gravada = literal_column(f"{tabela.name}.{chave}")
+        retorno_anterior = [
+            select(antes.c[coluna]).where(antes.c[chave] == gravada).scalar_subquery().label(f"anterior_{coluna}")
+            for coluna in anteriores
+        ]
+    else:
+        statement = statement.values(linhas)
+    statement = statement.on_conflict_do_update(
+        index_elements=[chave],
+        # ON CONFLICT não aplica o `onupdate` das colunas
+        set_={**{coluna: statement.excluded[coluna] for coluna in colunas}, "atualizado_em": agora_utc()},
+        where=or_(*(tabela.c[coluna].is_distinct_from(statement.excluded[coluna]) for coluna in colunas)),
+    ).returning(*tabela.c, *retorno_anterior)
+    return session.execute(statement).all()
+
+
+# Escritas com RETURNING: a resposta é montada com as colunas devolvidas pelo próprio
+# INSERT/UPDATE (defaults, id gerado, `atualizado_em`), sem o SELECT do `session.refresh`
+# depois do commit nem o `session.get` antes de um UPDATE parcial.
+
+
+def inserir(session, objeto: SQLModel, *extras):
+    """
+    INSERT ... RETURNING de `objeto` (uma instância do modelo-tabela); retorna uma nova
+    instância com os valores gravados. Chave primária vazia (None) fica a cargo do banco.
+    Com `extras` (expressões a devolver junto, ex.: uma subconsulta escalar), retorna
+    (instância, *valores dos extras).
+    """
+    modelo = type(objeto)
+    tabela = modelo.__table__
+    valores = {
+        coluna.name: getattr(objeto, coluna.name) for coluna in tabela.columns
+        if not (coluna.primary_key and getattr(objeto, coluna.name) is None)
+    }
+    linha = session.execute(insert_generico(tabela).values(valores).returning(*tabela.c, *extras)).one()
+    instancia = modelo.model_validate(linha._mapping)
+    return (instancia, *linha[len(tabela.c):]) if extras else instancia
+
+
+def atualizar(session, modelo: type[SQLModel], id_: Any, valores: dict) -> SQLModel | None:
+    """
+    UPDATE ... WHERE <pk> = id_ RETURNING numa única instrução: None se a linha não existe.
+    `id_` segue o `session.get` (tupla para chaves compostas). A chave primária nunca é
+    alterada e `atualizado_em` é renovado pelo `onupdate` da coluna.
+    """
+    tabela = modelo.__table__
+    chave = list(tabela.primary_key.columns)
+    condicoes = [coluna == valor for coluna, valor in zip(chave, id_ if isinstance(id_, tuple) else (id_,))]
+    valores = {coluna: valor for coluna, valor in valores.items() if coluna not in {c.name for c in chave}}
+
+    if valores:
+        statement = update(tabela).where(*condicoes).values(valores).returning(*tabela.c)
+    else:
+        # Nada a alterar: só lê a linha (sem renovar `atualizado_em`)
+        statement = select(*tabela.c).where(*condicoes)
+    linha = session.execute(statement).first()
+    return modelo.model_validate(linha._mapping) if linha is not None else None
+
+
+# Linhas por instrução em `atualizar_em_lote` (3 parâmetros por linha: longe dos limites
+# de parâmetros do SQLite e do Postgres)
+LINHAS_POR_UPDATE = 1_000
+
+
+def atualizar_em_lote(session, modelo: type[SQLModel], chave: str, linhas: list[dict], *filtros) -> list:
+    """
+    Aplica `linhas` (cada uma com `chave` e as colunas a alterar) com
+    WITH v(...) AS (VALUES ...) UPDATE ... FROM v WHERE <chave> = v.<chave> AND <filtros>
+    RETURNING <chave>, uma instrução a cada LINHAS_POR_UPDATE linhas. Valor None mantém
+    o atual (como no PATCH de uma linha). Retorna as chaves que existiam e foram alteradas.
+    """
+    tabela = modelo.__table__
+    linhas = list({linha[chave]: linha for linha in linhas}.values())
+    colunas = sorted({coluna for linha in linhas for coluna in linha} - {chave})
+    if not colunas:
+        # Nada a alterar: só confirma quais linhas existem
+        existentes = select(tabela.c[chave]).where(tabela.c[chave].in_([linha[chave] for linha in linhas]), *filtros)
+        return session.execute(existentes).scalars().all() if linhas else []
+
+    alteradas = []
+    for inicio in range(0, len(linhas), LINHAS_POR_UPDATE):
+        v = _valores(tabela, [chave, *colunas], linhas[inicio:inicio + LINHAS_POR_UPDATE])
+        statement = (
+            update(tabela)
+            .where(tabela.c[chave] == v.c[chave], *filtros)
+            # CAST: no Postgres uma coluna só com NULLs no VALUES seria do tipo text
+            .values({nome: func.coalesce(cast(v.c[nome], tabela.c[nome].type), tabela.c[nome]) for nome in colunas})
+            .returning(_retorno(tabela.c[chave]))
+        )
+        alteradas += session.execute(statement).scalars().all()
+    return alteradas
+
+
+def incrementar_em_lote(session, modelo: type[SQLModel], chave: Sequence[str], coluna: str,
+                        incrementos: dict[tuple, int]) -> list[tuple]:
+    """
+    SET <coluna> = <coluna> + v.delta para cada chave (tupla com os valores de `chave`),
+    numa instrução por LINHAS_POR_UPDATE chaves. A soma é feita pelo banco sobre o valor
+    atual da linha: incrementos concorrentes não se perdem. Retorna as chaves alteradas.
+    """
+    tabela = modelo.__table__
+    linhas = [{**dict(zip(chave, valores)), "delta": delta} for valores, delta in incrementos.items()]
+
+    alteradas = []
+    for inicio in range(0, len(linhas), LINHAS_POR_UPDATE):
+        v = _valores(tabela, [*chave, "delta"], linhas[inicio:inicio + LINHAS_POR_UPDATE])
+        statement = (
+            update(tabela)
+            .where(*(tabela.c[nome] == v.c[nome] for nome in chave))
+            .values({coluna: tabela.c[coluna] + cast(v.c.delta, tabela.c[coluna].type)})
+            .returning(*(_retorno(tabela.c[nome]) for nome in chave))
+        )
+        alteradas += [tuple(linha) for linha in session.execute(statement)]
+    return alteradas
+
+
+def _retorno(coluna):
+    # O SQLite 3.40 devolve REAL nas colunas do RETURNING de um UPDATE ... FROM numa tabela
+    # com chave primária composta (26.0 em vez de 26); o CAST mantém o tipo da coluna
+    return cast(coluna, coluna.type).label(coluna.name)
+
+
+def _valores(tabela, nomes: list[str], linhas: list[dict]):
+    # CTE com lista de colunas: o SQLite não aceita `(VALUES ...) AS v (colunas)`.
+    # Colunas que não são da tabela (o delta dos incrementos) são inteiras
+    tipos = [tabela.c[nome].type if nome in tabela.c else Integer() for nome in nomes]
+    return values(*(column(nome, tipo) for nome, tipo in zip(nomes, tipos)), name="v").data(
+        [tuple(linha.get(nome) for nome in nomes) for linha in linhas]
+    ).cte("v")
@@ -0,0 +1,171 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Hashable, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Buffer de escrita adiada (write-behind) para incrementos: as requisições só somam os
+# deltas em memória, por chave, e uma thread aplica tudo de uma vez quando o buffer
+# chega a `max_chaves` ou a cada `intervalo_s`. O que está no buffer se perde se o
+# processo morrer sem o `encerrar` do shutdown; por isso é opcional.
+#
+# Configuração: FALTAS_ESCRITA_ADIADA=1 (padrão desligado), FALTAS_BUFFER_MAX_CHAVES
+# e FALTAS_BUFFER_INTERVALO_S.
+
+# Métricas expostas em /_internal/escrita-adiada
+BUFFERS: dict[str, "BufferIncrementos"] = {}
+
+
+class BufferIncrementos:
+    """
+    Acumula incrementos por chave e os descarrega com `aplicar(incrementos)`, que recebe
+    {chave: soma dos deltas}, grava numa transação e retorna quantas chaves existiam
+    (as demais são descartadas).
+    """
+
+    def __init__(self, nome: str, aplicar: Callable[[dict[Hashable, int]], int],
+                 max_chaves: int = 1_000, intervalo_s: float = 1.0):
+        self.nome = nome
+        self.aplicar = aplicar
+        self.max_chaves = max_chaves
+        self.intervalo_s = intervalo_s
+        self._lock = threading.Lock()
+        # Serializa as descargas (thread de fundo x encerrar)
+        self._descarga = threading.Lock()
+        self._cheio = threading.Event()
+        self._parar = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pendentes: dict[Hashable, int] = {}
+        self._mais_antigo: float | None = None
+
+        self.incrementos_recebidos = 0
+        self.descargas = 0
+        self.chaves_aplicadas = 0
+        self.chaves_descartadas = 0
+        self.erros = 0
+        self.profundidade_maxima = 0
+        self.latencia_total_s = 0.0
+        self.latencia_ultima_s = 0.0
+        self.latencia_maxima_s = 0.0
+        self.atraso_maximo_s = 0.0
+        BUFFERS[nome] = self
+
+    def adicionar(self, incrementos: Iterable[tuple[Hashable, int]]) -> int:
+        """
+        Soma os deltas no buffer e retorna quantas chaves estão pendentes.
+        """
+        with self._lock:
+            for chave, delta in incrementos:
+                self._pendentes[chave] = self._pendentes.get(chave, 0) + delta
+                self.incrementos_recebidos += 1
+            if self._mais_antigo is None and self._pendentes:
+                self._mais_antigo = time.monotonic()
+            profundidade = len(self._pendentes)
+            self.profundidade_maxima = max(self.profundidade_maxima, profundidade)
+        self._iniciar()
+        if profundidade >= self.max_chaves:
+            self._cheio.set()
+        return profundidade
+
+    def _iniciar(self) -> None:
+        # A thread sobe no primeiro uso, não no import
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._executar, name=f"buffer-{self.nome}", daemon=True)
+                    self._thread.start()
+
+    def _executar(self) -> None:
+        while not self._parar.is_set():
+            self._cheio.wait(self.intervalo_s)
+            self._cheio.clear()
+            self.descarregar()
+
+    def descarregar(self) -> int:
+        """
+        Aplica o que está pendente; em caso de erro os deltas voltam ao buffer para a
+        próxima tentativa. Retorna quantas chaves foram aplicadas.
+        """
+        with self._descarga:
+            with self._lock:
+                pendentes, self._pendentes = self._pendentes, {}
+                mais_antigo, self._mais_antigo = self._mais_antigo, None
+            if not pendentes:
+                return 0
+
+            inicio = time.monotonic()
+            try:
+                aplicadas = self.aplicar(pendentes)
+            except Exception:
+                logger.exception("Falha ao descarregar o buffer %s; %d chaves voltam ao buffer",
+                                 self.nome, len(pendentes))
+                with self._lock:
+                    self.erros += 1
+                    for chave, delta in pendentes.items():
+                        self._pendentes[chave] = self._pendentes.get(chave, 0) + delta
+                    self._mais_antigo = min(filter(None, (self._mais_antigo, mais_antigo)), default=None)
+                return 0
+
+            fim = time.monotonic()
+            with self._lock:
+                self.descargas += 1
+                self.chaves_aplicadas += aplicadas
+                self.chaves_descartadas += len(pendentes) - aplicadas
+                self.latencia_ultima_s = fim - inicio
+                self.latencia_total_s += fim - inicio
+                self.latencia_maxima_s = max(self.latencia_maxima_s, fim - inicio)
+                self.atraso_maximo_s = max(self.atraso_maximo_s, fim - mais_antigo)
+            return aplicadas
+
+    def encerrar(self) -> None:
+        # Shutdown da aplicação: para a thread e grava o que restou
+        self._parar.set()
+        self._cheio.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.intervalo_s + 5)
+            self._thread = None
+        self._parar.clear()
+        self.descarregar()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "profundidade": len(self._pendentes),
+                "profundidade_maxima": self.profundidade_maxima,
+                "max_chaves": self.max_chaves,
+                "intervalo_s": self.intervalo_s,
+                "incrementos_recebidos": self.incrementos_recebidos,
+                "descargas": self.descargas,
+                "chaves_aplicadas": self.chaves_aplicadas,
+                # Incrementos para matrículas que não existem
+                "chaves_descartadas": self.chaves_descartadas,
+                "erros": self.erros,
+                "latencia_descarga_ms": {
+                    "ultima": round(self.latencia_ultima_s * 1000, 2),
+                    "media": round(self.latencia_total_s / self.descargas * 1000, 2) if self.descargas else None,
+                    "maxima": round(self.latencia_maxima_s * 1000, 2),
+                },
+                # Maior tempo entre um incremento chegar ao buffer e ser gravado
+                "atraso_maximo_ms": round(self.atraso_maximo_s * 1000, 2),
+            }
+
+
+def buffer_do_ambiente(nome: str, prefixo: str, aplicar: Callable[[dict[Hashable, int]], int]) \
+        -> BufferIncrementos | None:
+    """
+    Cria o buffer se <prefixo>_ESCRITA_ADIADA estiver ligado (None = escrita direta).
+    """
+    if os.getenv(f"{prefixo}_ESCRITA_ADIADA", "0").lower() not in ("1", "true", "sim"):
+        return None
+    return BufferIncrementos(
+        nome, aplicar,
+        max_chaves=int(os.getenv(f"{prefixo}_BUFFER_MAX_CHAVES", "1000")),
+        intervalo_s=float(os.getenv(f"{prefixo}_BUFFER_INTERVALO_S", "1.0")),
+    )
+
+
+def encerrar_buffers() -> None:
+    for buffer in BUFFERS.values():
+        buffer.encerrar()
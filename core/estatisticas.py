@@ -0,0 +1,217 @@
+from sqlalchemy import func, select
+
+# Tabelas-resumo de /stats, mantidas por triggers no próprio banco: assim as escritas
+# em massa (INSERT ... ON CONFLICT, UPDATE ... FROM) também as atualizam.
+# No Postgres os triggers de matricula são por comando, agregando as tabelas de
+# transição; no SQLite (testes) são por linha.
+
+# Momento da última alteração das linhas-resumo lidas pela rota
+HEADER_ATUALIZACAO = "X-Stats-Updated-At"
+
+_AGORA_SQLITE = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+_FUNCOES_POSTGRES = """
+CREATE OR REPLACE FUNCTION estatisticas_matricula() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    -- UPDATE que não mexe em nota nem em disciplina (ex.: só numero_faltas) não altera o resumo
+    -- (IFs aninhados: antigas/novas só existem no trigger de UPDATE)
+    IF TG_OP = 'UPDATE' THEN
+        IF NOT EXISTS (
+            SELECT 1 FROM antigas a FULL JOIN novas n USING (id_aluno, disciplina_id)
+            WHERE a.id_aluno IS NULL OR n.id_aluno IS NULL OR a.nota_final IS DISTINCT FROM n.nota_final
+        ) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+    IF TG_OP <> 'INSERT' THEN
+        UPDATE estatisticadisciplina e
+        SET total_alunos = e.total_alunos - d.alunos,
+            total_avaliados = e.total_avaliados - d.avaliados,
+            soma_notas = e.soma_notas - d.soma,
+            atualizado_em = now()
+        FROM (SELECT disciplina_id, count(*) AS alunos, count(nota_final) AS avaliados,
+                     coalesce(sum(nota_final), 0) AS soma
+              FROM antigas GROUP BY disciplina_id) d
+        WHERE e.disciplina_id = d.disciplina_id;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        UPDATE estatisticadisciplina e
+        SET total_alunos = e.total_alunos + d.alunos,
+            total_avaliados = e.total_avaliados + d.avaliados,
+            soma_notas = e.soma_notas + d.soma,
+            atualizado_em = now()
+        FROM (SELECT disciplina_id, count(*) AS alunos, count(nota_final) AS avaliados,
+                     coalesce(sum(nota_final), 0) AS soma
+              FROM novas GROUP BY disciplina_id) d
+        WHERE e.disciplina_id = d.disciplina_id;
+    END IF;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION estatisticas_professor() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        UPDATE estatisticadepartamento SET total_professores = total_professores - 1, atualizado_em = now()
+        WHERE departamento_id = OLD.id_departamento;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        UPDATE estatisticadepartamento SET total_professores = total_professores + 1, atualizado_em = now()
+        WHERE departamento_id = NEW.id_departamento;
+    END IF;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION estatisticas_entidade() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    -- disciplina/departamento: cria ou remove a linha-resumo correspondente
+    IF TG_TABLE_NAME = 'disciplina' THEN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO estatisticadisciplina (disciplina_id, total_alunos, total_avaliados, soma_notas, atualizado_em)
+            VALUES (NEW.id, 0, 0, 0, now()) ON CONFLICT DO NOTHING;
+        ELSE
+            DELETE FROM estatisticadisciplina WHERE disciplina_id = OLD.id;
+        END IF;
+    ELSE
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO estatisticadepartamento (departamento_id, total_professores, atualizado_em)
+            VALUES (NEW.id, 0, now()) ON CONFLICT DO NOTHING;
+        ELSE
+            DELETE FROM estatisticadepartamento WHERE departamento_id = OLD.id;
+        END IF;
+    END IF;
+    RETURN NULL;
+END $$;
+"""
+
+# nome -> (tabela, definição) dos triggers do Postgres
+_TRIGGERS_POSTGRES = {
+    "matricula_estatisticas_ins": ("matricula", "AFTER INSERT ON matricula REFERENCING NEW TABLE AS novas "
+                                                "FOR EACH STATEMENT EXECUTE FUNCTION estatisticas_matricula()"),
+    "matricula_estatisticas_del": ("matricula", "AFTER DELETE ON matricula REFERENCING OLD TABLE AS antigas "
+                                                "FOR EACH STATEMENT EXECUTE FUNCTION estatisticas_matricula()"),
+    "matricula_estatisticas_upd": ("matricula", "AFTER UPDATE ON matricula "
+                                                "REFERENCING OLD TABLE AS antigas NEW TABLE AS novas "
+                                                "FOR EACH STATEMENT EXECUTE FUNCTION estatisticas_matricula()"),
+    "professor_estatisticas": ("professor", "AFTER INSERT OR DELETE OR UPDATE OF id_departamento ON professor "
+                                            "FOR EACH ROW EXECUTE FUNCTION estatisticas_professor()"),
+    "disciplina_estatisticas": ("disciplina", "AFTER INSERT OR DELETE ON disciplina "
+                                              "FOR EACH ROW EXECUTE FUNCTION estatisticas_entidade()"),
+    "departamento_estatisticas": ("departamento", "AFTER INSERT OR DELETE ON departamento "
+                                                  "FOR EACH ROW EXECUTE FUNCTION estatisticas_entidade()"),
+}
+FUNCOES_POSTGRES = ("estatisticas_matricula", "estatisticas_professor", "estatisticas_entidade")
+
+
+def _ajuste_matricula(linha: str, sinal: str) -> str:
+    return f"""
+        UPDATE estatisticadisciplina SET
+            total_alunos = total_alunos {sinal} 1,
+            total_avaliados = total_avaliados {sinal} ({linha}.nota_final IS NOT NULL),
+            soma_notas = soma_notas {sinal} coalesce({linha}.nota_final, 0),
+            atualizado_em = {_AGORA_SQLITE}
+        WHERE disciplina_id = {linha}.disciplina_id;"""
+
+
+def _ajuste_professor(linha: str, sinal: str) -> str:
+    return f"""
+        UPDATE estatisticadepartamento SET
+            total_professores = total_professores {sinal} 1, atualizado_em = {_AGORA_SQLITE}
+        WHERE departamento_id = {linha}.id_departamento;"""
+
+
+_TRIGGERS_SQLITE = {
+    "matricula_estatisticas_ai": ("AFTER INSERT ON matricula", _ajuste_matricula("new", "+")),
+    "matricula_estatisticas_ad": ("AFTER DELETE ON matricula", _ajuste_matricula("old", "-")),
+    "matricula_estatisticas_au": ("AFTER UPDATE OF nota_final, disciplina_id ON matricula",
+                                  _ajuste_matricula("old", "-") + _ajuste_matricula("new", "+")),
+    "professor_estatisticas_ai": ("AFTER INSERT ON professor", _ajuste_professor("new", "+")),
+    "professor_estatisticas_ad": ("AFTER DELETE ON professor", _ajuste_professor("old", "-")),
+    "professor_estatisticas_au": ("AFTER UPDATE OF id_departamento ON professor",
+                                  _ajuste_professor("old", "-") + _ajuste_professor("new", "+")),
+    "disciplina_estatisticas_ai": ("AFTER INSERT ON disciplina", f"""
+        INSERT OR IGNORE INTO estatisticadisciplina
+            (disciplina_id, total_alunos, total_avaliados, soma_notas, atualizado_em)
+        VALUES (new.id, 0, 0, 0, {_AGORA_SQLITE});"""),
+    "disciplina_estatisticas_ad": ("AFTER DELETE ON disciplina",
+                                   "DELETE FROM estatisticadisciplina WHERE disciplina_id = old.id;"),
+    "departamento_estatisticas_ai": ("AFTER INSERT ON departamento", f"""
+        INSERT OR IGNORE INTO estatisticadepartamento (departamento_id, total_professores, atualizado_em)
+        VALUES (new.id, 0, {_AGORA_SQLITE});"""),
+    "departamento_estatisticas_ad": ("AFTER DELETE ON departamento",
+                                     "DELETE FROM estatisticadepartamento WHERE departamento_id = old.id;"),
+}
+
+
+def criar_triggers(connection) -> None:
+    """
+    Cria (ou recria) os triggers que mantêm as tabelas-resumo.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(_FUNCOES_POSTGRES)
+        for nome, (tabela, definicao) in _TRIGGERS_POSTGRES.items():
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {nome} ON {tabela}")
+            connection.exec_driver_sql(f"CREATE TRIGGER {nome} {definicao}")
+    elif connection.dialect.name == "sqlite":
+        for nome, (evento, corpo) in _TRIGGERS_SQLITE.items():
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {nome}")
+            connection.exec_driver_sql(f"CREATE TRIGGER {nome} {evento} BEGIN {corpo} END")
+
+
+def remover_triggers(connection) -> None:
+    if connection.dialect.name == "postgresql":
+        for nome, (tabela, _) in _TRIGGERS_POSTGRES.items():
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {nome} ON {tabela}")
+        for funcao in FUNCOES_POSTGRES:
+            connection.exec_driver_sql(f"DROP FUNCTION IF EXISTS {funcao}()")
+    elif connection.dialect.name == "sqlite":
+        for nome in _TRIGGERS_SQLITE:
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {nome}")
+
+
+def reconstruir(connection) -> dict[str, int]:
+    """
+    Recalcula as tabelas-resumo do zero com GROUP BY (corrige qualquer divergência).
+    Retorna quantas linhas cada tabela ficou.
+    """
+    from models import Departamento, Disciplina, EstatisticaDepartamento, EstatisticaDisciplina, Matricula, Professor
+
+    agora = func.now() if connection.dialect.name == "postgresql" else func.strftime("%Y-%m-%d %H:%M:%f", "now")
+
+    connection.execute(EstatisticaDisciplina.__table__.delete())
+    connection.execute(EstatisticaDisciplina.__table__.insert().from_select(
+        ["disciplina_id", "total_alunos", "total_avaliados", "soma_notas", "atualizado_em"],
+        select(
+            Disciplina.id,
+            func.count(Matricula.id_aluno),
+            func.count(Matricula.nota_final),
+            func.coalesce(func.sum(Matricula.nota_final), 0),
+            agora,
+        ).outerjoin(Matricula).group_by(Disciplina.id),
+    ))
+
+    connection.execute(EstatisticaDepartamento.__table__.delete())
+    connection.execute(EstatisticaDepartamento.__table__.insert().from_select(
+        ["departamento_id", "total_professores", "atualizado_em"],
+        select(Departamento.id, func.count(Professor.id), agora).outerjoin(Professor).group_by(Departamento.id),
+    ))
+
+    return {
+        "estatisticadisciplina": connection.execute(select(func.count()).select_from(EstatisticaDisciplina)).scalar(),
+        "estatisticadepartamento": connection.execute(
+            select(func.count()).select_from(EstatisticaDepartamento)).scalar(),
+    }
+
+
+def ao_criar_tabelas(target, connection, **kw) -> None:
+    # Listener de `after_create` do metadata (create_all): mesmo efeito da migration
+    criar_triggers(connection)
+    reconstruir(connection)
+
+
+def informar_atualizacao(response, atualizacoes) -> None:
+    """
+    Preenche o cabeçalho de frescor com o `atualizado_em` mais recente das linhas lidas.
+    """
+    recentes = [valor for valor in atualizacoes if valor is not None]
+    if recentes:
+        response.headers[HEADER_ATUALIZACAO] = max(recentes).isoformat()
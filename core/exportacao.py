@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import AsyncIterator, Iterator
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+import database
+
+# Linhas buscadas por vez do cursor no servidor (e serializadas por pedaço da resposta)
+TAMANHO_PARTICAO = 1_000
+
+TIPOS_MIDIA = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _json_padrao(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"{type(valor).__name__} não serializável")
+
+
+def _serializador(formato: str, colunas: list[str]):
+    """
+    Devolve (cabecalho, serializar_particao): o cabeçalho (CSV) sai antes da primeira
+    linha do banco, para o cliente receber o primeiro byte imediatamente.
+    """
+    if formato == "csv":
+        def serializar(linhas) -> bytes:
+            buffer = io.StringIO()
+            csv.writer(buffer, lineterminator="\n").writerows(linhas)
+            return buffer.getvalue().encode()
+
+        return serializar([colunas]), serializar
+
+    def serializar(linhas) -> bytes:
+        return "".join(
+            json.dumps(dict(zip(colunas, linha)), default=_json_padrao, ensure_ascii=False) + "\n"
+            for linha in linhas
+        ).encode()
+
+    return b"", serializar
+
+
+class _Compactador:
+    def __init__(self, gzip: bool):
+        # wbits=31: formato gzip (cabeçalho + CRC), não zlib puro
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+
+    def __call__(self, dados: bytes) -> bytes:
+        return self._compressor.compress(dados) if self._compressor else dados
+
+    def finalizar(self) -> bytes:
+        return self._compressor.flush() if self._compressor else b""
+
+
+def _linhas_sync(engine, statement, formato: str, gzip: bool) -> Iterator[bytes]:
+    colunas = list(statement.selected_columns.keys())
+    cabecalho, serializar = _serializador(formato, colunas)
+    compactar = _Compactador(gzip)
+    yield compactar(cabecalho)
+
+    # Conexão própria: precisa ficar aberta até o fim da resposta, depois do ciclo
+    # de vida das dependências da rota
+    with engine.connect() as connection:
+        resultado = connection.execution_options(stream_results=True, yield_per=TAMANHO_PARTICAO).execute(statement)
+        for particao in resultado.partitions():
+            if pedaco := compactar(serializar(particao)):
+                yield pedaco
+    yield compactar.finalizar()
+
+
+async def _linhas_async(engine, statement, formato: str, gzip: bool) -> AsyncIterator[bytes]:
+    colunas = list(statement.selected_columns.keys())
+    cabecalho, serializar = _serializador(formato, colunas)
+    compactar = _Compactador(gzip)
+    yield compactar(cabecalho)
+
+    async with engine.connect() as connection:
+        resultado = await connection.stream(statement.execution_options(yield_per=TAMANHO_PARTICAO))
+        async for particao in resultado.partitions():
+            if pedaco := compactar(serializar(particao)):
+                yield pedaco
+    yield compactar.finalizar()
+
+
+def transmitir(statement, nome: str, formato: str = "ndjson", gzip: bool = False,
+               request: Request | None = None) -> StreamingResponse:
+    """
+    Resposta em streaming com todas as linhas de `statement` (um SELECT de colunas),
+    lidas por cursor no servidor em partições de TAMANHO_PARTICAO: a memória não
+    depende do total exportado. Com `request`, lê da réplica quando ela pode atender.
+    """
+    replica = database.replica
+    da_replica = request is not None and replica is not None and replica.escolher(request)
+    if database.ASYNC_ATIVO:
+        gerador, engine = _linhas_async, replica.engine_async if da_replica else database.async_engine
+    else:
+        gerador, engine = _linhas_sync, replica.engine if da_replica else database.engine
+    cabecalhos = {"Content-Disposition": f'attachment; filename="{nome}.{formato}{".gz" if gzip else ""}"'}
+    if gzip:
+        cabecalhos["Content-Encoding"] = "gzip"
+    return StreamingResponse(gerador(engine, statement, formato, gzip), media_type=TIPOS_MIDIA[formato], headers=cabecalhos)
+
@@ -0,0 +1,62 @@
+from datetime import date, timedelta
+
+from fastapi import HTTPException
+
+# Limites dos parâmetros: fora deles as datas do intervalo não cabem em `date`
+ANO_MAXIMO = 9998
+IDADE_MAXIMA = 150
+
+
+def _anos_antes(referencia: date, anos: int) -> date:
+    try:
+        return referencia.replace(year=referencia.year - anos)
+    except ValueError:  # 29/02 em ano não bissexto
+        return referencia.replace(year=referencia.year - anos, day=28)
+
+
+def intervalo_nascimento(
+        ano_nascimento: int | None,
+        nascido_entre: str | None,
+        idade_minima: int | None,
+        idade_maxima: int | None,
+) -> tuple[date | None, date | None]:
+    """
+    Converte os filtros de nascimento num único intervalo semiaberto [inicio, fim)
+    sobre data_nascimento, para que a consulta use o índice da coluna.
+    """
+    try:
+        return _intervalo(ano_nascimento, nascido_entre, idade_minima, idade_maxima)
+    except (ValueError, OverflowError):
+        raise HTTPException(status_code=400, detail="Filtro de nascimento fora do intervalo de datas suportado.")
+
+
+def _intervalo(ano_nascimento, nascido_entre, idade_minima, idade_maxima) -> tuple[date | None, date | None]:
+    inicio, fim = None, None
+
+    def restringir(novo_inicio: date | None, novo_fim: date | None):
+        nonlocal inicio, fim
+        if novo_inicio is not None:
+            inicio = novo_inicio if inicio is None else max(inicio, novo_inicio)
+        if novo_fim is not None:
+            fim = novo_fim if fim is None else min(fim, novo_fim)
+
+    if ano_nascimento:
+        restringir(date(ano_nascimento, 1, 1), date(ano_nascimento + 1, 1, 1))
+
+    if nascido_entre:
+        try:
+            de, ate = (date.fromisoformat(parte.strip()) for parte in nascido_entre.split(","))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="nascido_entre deve ser 'AAAA-MM-DD,AAAA-MM-DD'.")
+        # Até 31/12/9999 inclusive: sem limite superior
+        restringir(de, ate + timedelta(days=1) if ate < date.max else None)
+
+    hoje = date.today()
+    if idade_minima is not None:
+        # Tem pelo menos N anos: nasceu até hoje - N anos (inclusive)
+        restringir(None, _anos_antes(hoje, idade_minima) + timedelta(days=1))
+    if idade_maxima is not None:
+        # Ainda não fez N + 1 anos: nasceu depois de hoje - (N + 1) anos
+        restringir(_anos_antes(hoje, idade_maxima + 1) + timedelta(days=1), None)
+
+    return inicio, fim
@@ -0,0 +1,79 @@
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator
+
+from fastapi import HTTPException, Request, status
+
+FORMATOS = ("csv", "ndjson")
+
+
+def detectar_formato(request: Request, formato: str | None) -> str:
+    """
+    Usa o parâmetro `formato` ou, na falta dele, o Content-Type do corpo.
+    """
+    if formato:
+        if formato not in FORMATOS:
+            raise HTTPException(status_code=400, detail=f"formato deve ser um de: {', '.join(FORMATOS)}.")
+        return formato
+
+    tipo = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if "csv" in tipo:
+        return "csv"
+    if "ndjson" in tipo or "jsonl" in tipo or "json" in tipo:
+        return "ndjson"
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Envie text/csv ou application/x-ndjson (ou informe ?formato=).",
+    )
+
+
+async def _linhas(request: Request) -> AsyncIterator[str]:
+    # Decodifica o corpo aos pedaços: só a linha corrente fica em memória
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")()
+    pendente = ""
+    async for pedaco in request.stream():
+        pendente += decodificador.decode(pedaco)
+        *completas, pendente = pendente.split("\n")
+        for linha in completas:
+            yield linha.rstrip("\r")
+    pendente += decodificador.decode(b"", final=True)
+    if pendente:
+        yield pendente.rstrip("\r")
+
+
+async def registros(request: Request, formato: str) -> AsyncIterator[tuple[int, dict[str, Any] | None, str | None]]:
+    """
+    Lê o corpo em streaming e produz (linha, registro, erro) para cada linha de dados.
+    CSV exige cabeçalho (separador ',' ou ';') e um registro por linha.
+    """
+    cabecalho: list[str] | None = None
+    delimitador = ","
+    numero = 0
+    async for linha in _linhas(request):
+        numero += 1
+        if not linha.strip():
+            continue
+
+        if formato == "ndjson":
+            try:
+                registro = json.loads(linha)
+            except json.JSONDecodeError as erro:
+                yield numero, None, f"JSON inválido: {erro.msg}"
+                continue
+            if not isinstance(registro, dict):
+                yield numero, None, "Cada linha deve ser um objeto JSON."
+                continue
+            yield numero, registro, None
+            continue
+
+        if cabecalho is None:
+            delimitador = ";" if linha.count(";") > linha.count(",") else ","
+            cabecalho = [coluna.strip() for coluna in next(csv.reader([linha], delimiter=delimitador))]
+            continue
+        valores = next(csv.reader([linha], delimiter=delimitador))
+        if len(valores) != len(cabecalho):
+            yield numero, None, f"Esperadas {len(cabecalho)} colunas, encontradas {len(valores)}."
+            continue
+        # Célula vazia = campo ausente (deixa o modelo aplicar o default ou acusar obrigatório)
+        yield numero, {coluna: valor for coluna, valor in zip(cabecalho, valores) if valor != ""}, None
@@ -0,0 +1,224 @@
+from typing import Any, Iterable, NamedTuple, Sequence
+
+from fastapi import HTTPException, Query, Request, Response
+from pydantic import create_model
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, SQLModel, select
+
+from core.cache import cache, tag
+from core.condicional import etag_colecao
+
+# Relações carregadas sob demanda (`include=carteira,disciplinas`): sem `include` as
+# rotas só leem a própria tabela e respondem com o modelo enxuto; cada relação pedida
+# acrescenta a sua opção de carregamento e o campo correspondente na resposta.
+#
+# Coleções (ex.: alunos de uma disciplina) nunca vêm inteiras: a resposta traz até
+# `limite_aninhado` itens e o total (`total_<relacao>`); com `include=<relacao>:total`
+# vem só o total. O restante se lê pelas sub-rotas paginadas (ex.: /disciplinas/{id}/alunos).
+
+LIMITE_ANINHADO = 10
+SUFIXO_TOTAL = ":total"
+
+
+class Colecao(NamedTuple):
+    filho: type[SQLModel]
+    pai: Any  # coluna com o id do pai (ex.: Matricula.disciplina_id)
+    ordem: Sequence  # ordenação dos itens embutidos (a mesma da sub-rota paginada)
+    juncao: tuple | None = None  # (tabela, condição) quando o vínculo passa por outra tabela
+
+
+class Relacao(NamedTuple):
+    opcao: Any  # joinedload(...) para relações escalares; Colecao para coleções
+    tipo: Any  # tipo do campo na resposta (ex.: list[DisciplinaBase])
+    entidade: str  # nome usado nas tags do cache e no ETag
+
+
+class Incluidas(NamedTuple):
+    relacoes: frozenset[str]  # "alunos" (itens + total) ou "alunos:total" (só o total)
+    limite: int = LIMITE_ANINHADO
+
+
+def _fatias(session: Session, colecao: Colecao, ids: list, limite: int) -> dict[Any, tuple[list, int]]:
+    """
+    Até `limite` filhos de cada pai e o total de cada um, numa única consulta com
+    funções de janela (row_number/count particionados pelo pai).
+    """
+    statement = select(
+        colecao.filho,
+        colecao.pai.label("pai"),
+        func.row_number().over(partition_by=colecao.pai, order_by=list(colecao.ordem)).label("posicao"),
+        func.count().over(partition_by=colecao.pai).label("total"),
+    )
+    if colecao.juncao is not None:
+        statement = statement.join(*colecao.juncao)
+    numerada = statement.where(colecao.pai.in_(ids)).subquery()
+    filho = aliased(colecao.filho, numerada)
+
+    linhas = session.exec(
+        select(filho, numerada.c.pai, numerada.c.total)
+        .where(numerada.c.posicao <= limite)
+        .order_by(numerada.c.pai, numerada.c.posicao)
+    )
+    resultado: dict[Any, tuple[list, int]] = {}
+    for item, id_pai, total in linhas:
+        resultado.setdefault(id_pai, ([], total))[0].append(item)
+    return resultado
+
+
+def _totais(session: Session, colecao: Colecao, ids: list) -> dict[Any, int]:
+    statement = select(colecao.pai, func.count()).select_from(colecao.filho)
+    if colecao.juncao is not None:
+        statement = statement.join(*colecao.juncao)
+    return dict(session.exec(statement.where(colecao.pai.in_(ids)).group_by(colecao.pai)).all())
+
+
+class Inclusoes:
+    def __init__(self, tabela: type[SQLModel], entidade: str, enxuto: type[SQLModel], **relacoes: Relacao):
+        self.tabela = tabela
+        self.entidade = entidade
+        self.enxuto = enxuto
+        self.relacoes = relacoes
+        self.colecoes = {nome for nome, relacao in relacoes.items() if isinstance(relacao.opcao, Colecao)}
+        self._modelos: dict[frozenset[str], type[SQLModel]] = {frozenset(): enxuto}
+        # Modelo com todas as relações: é o que aparece na documentação
+        self.completo = self.modelo(frozenset(relacoes))
+
+        opcoes = ", ".join(f"{nome} (ou {nome}{SUFIXO_TOTAL})" if nome in self.colecoes else nome for nome in relacoes)
+
+        def dependencia(
+                include: str | None = Query(None, description=f"Relações a incluir, separadas por vírgula: {opcoes}"),
+                limite_aninhado: int = Query(LIMITE_ANINHADO, ge=0, le=100,
+                                             description="Máximo de itens por coleção incluída"),
+        ) -> Incluidas:
+            return self.interpretar(include, limite_aninhado)
+
+        self.dependencia = dependencia
+
+    def interpretar(self, include: str | None, limite: int = LIMITE_ANINHADO) -> Incluidas:
+        nomes = {parte.strip() for parte in (include or "").split(",") if parte.strip()}
+        desconhecidas = {
+            nome for nome in nomes
+            if nome not in self.relacoes and nome.removesuffix(SUFIXO_TOTAL) not in self.colecoes
+        }
+        if desconhecidas:
+            raise HTTPException(
+                status_code=400,
+                detail=f"include inválido: {', '.join(sorted(desconhecidas))}. Opções: {', '.join(self.relacoes)}."
+            )
+        # "alunos" já traz o total: "alunos:total" junto é redundante
+        return Incluidas(frozenset(nomes - {nome + SUFIXO_TOTAL for nome in nomes}), limite)
+
+    def opcoes(self, incluidas: Incluidas) -> list:
+        # Só as relações escalares viram opções de carregamento; coleções são lidas em `_visoes`
+        return [self.relacoes[nome].opcao for nome in sorted(self._escalares(incluidas))]
+
+    def _escalares(self, incluidas: Incluidas) -> set[str]:
+        return {nome for nome in incluidas.relacoes if nome in self.relacoes and nome not in self.colecoes}
+
+    def modelo(self, relacoes: frozenset[str]) -> type[SQLModel]:
+        if relacoes not in self._modelos:
+            campos = {}
+            for nome in relacoes:
+                if nome.removesuffix(SUFIXO_TOTAL) in self.colecoes:
+                    campos[f"total_{nome.removesuffix(SUFIXO_TOTAL)}"] = (int, 0)
+                if nome in self.relacoes:
+                    campos[nome] = (self.relacoes[nome].tipo, None)
+            sufixo = "".join(parte.title() for nome in sorted(relacoes) for parte in nome.replace(":", "_").split("_"))
+            self._modelos[relacoes] = create_model(f"{self.tabela.__name__}Com{sufixo}", __base__=self.enxuto, **campos)
+        return self._modelos[relacoes]
+
+    def chave(self, id_: Any, incluidas: Incluidas) -> str:
+        # Chave do cache: cada combinação de relações (e limite) é uma resposta diferente
+        chave = tag(self.entidade, id_)
+        if not incluidas.relacoes:
+            return chave
+        return f"{chave}?include={','.join(sorted(incluidas.relacoes))}&limite={incluidas.limite}"
+
+    def _visoes(self, session: Session, objetos: Sequence[Any], incluidas: Incluidas) -> list[dict]:
+        """
+        Dados de cada objeto para serialização: colunas do modelo enxuto, relações
+        escalares já carregadas e, por coleção pedida, a fatia e o total (uma consulta
+        por coleção para a página inteira).
+        """
+        campos = [*self.enxuto.model_fields, "atualizado_em"]
+        escalares = self._escalares(incluidas)
+        visoes = [
+            {**{campo: getattr(objeto, campo) for campo in campos}, **{nome: getattr(objeto, nome) for nome in escalares}}
+            for objeto in objetos
+        ]
+
+        for nome in sorted(incluidas.relacoes - escalares):
+            base = nome.removesuffix(SUFIXO_TOTAL)
+            colecao = self.relacoes[base].opcao
+            ids = [visao["id"] for visao in visoes]
+            if nome == base and incluidas.limite > 0 and ids:
+                fatias = _fatias(session, colecao, ids, incluidas.limite)
+                for visao in visoes:
+                    visao[base], visao[f"total_{base}"] = fatias.get(visao["id"], ([], 0))
+            else:
+                totais = _totais(session, colecao, ids) if ids else {}
+                for visao in visoes:
+                    if nome == base:
+                        visao[base] = []
+                    visao[f"total_{base}"] = totais.get(visao["id"], 0)
+        return visoes
+
+    def _relacionados(self, visao: dict, incluidas: Incluidas) -> Iterable[tuple[str, Any]]:
+        for nome in sorted(incluidas.relacoes & self.relacoes.keys()):
+            valor = visao[nome]
+            for item in (valor if isinstance(valor, list) else [valor]):
+                yield self.relacoes[nome].entidade, item
+
+    def _versoes(self, visao: dict, incluidas: Incluidas) -> list:
+        # `atualizado_em` do objeto e dos relacionados (None para relação vazia) e os totais, para o ETag
+        return [
+            visao["atualizado_em"],
+            *(item.atualizado_em if item is not None else None for _, item in self._relacionados(visao, incluidas)),
+            *(visao[f"total_{nome}"] for nome in sorted(self.colecoes) if f"total_{nome}" in visao),
+        ]
+
+    def _tags(self, visao: dict, incluidas: Incluidas) -> list[str]:
+        # A entrada do cache cai quando o objeto ou qualquer relacionado embutido muda
+        return [tag(self.entidade, visao["id"]), *(
+            tag(entidade, item.id) for entidade, item in self._relacionados(visao, incluidas) if item is not None
+        )]
+
+    def ler_por_id(self, session: Session, request: Request, id_: Any, incluidas: Incluidas,
+                   nao_encontrado: str) -> Response:
+        """
+        GET por id com as relações pedidas, pelo cache e com ETag. Sem relações, um GET
+        condicional pode ser respondido só com o `atualizado_em` da linha.
+        """
+        def carregar():
+            statement = select(self.tabela).where(self.tabela.id == id_).options(*self.opcoes(incluidas))
+            objeto = session.exec(statement).unique().first()
+            if not objeto:
+                raise HTTPException(status_code=404, detail=nao_encontrado)
+            return self._visoes(session, [objeto], incluidas)[0]
+
+        def consultar_versoes():
+            versao = session.exec(select(self.tabela.atualizado_em).where(self.tabela.id == id_)).first()
+            return [versao] if versao else None
+
+        return cache.ler_ou_carregar(
+            self.chave(id_, incluidas), self.modelo(incluidas.relacoes), carregar,
+            tags=lambda visao: self._tags(visao, incluidas), request=request,
+            versoes=lambda visao: self._versoes(visao, incluidas),
+            consultar_versoes=None if incluidas.relacoes else consultar_versoes
+        )
+
+    def responder_pagina(self, session: Session, request: Request, response: Response, pagina: list,
+                         incluidas: Incluidas) -> Response:
+        """
+        Serializa uma página só com as relações pedidas (sem disparar lazy loads das
+        demais), com o ETag da coleção e os cabeçalhos já gravados em `response`.
+        """
+        visoes = self._visoes(session, pagina, incluidas)
+        nao_modificada = etag_colecao(request, response,
+                                      (v for visao in visoes for v in self._versoes(visao, incluidas)))
+        if nao_modificada is not None:
+            return nao_modificada
+        modelo = self.modelo(incluidas.relacoes)
+        corpo = b"[" + b",".join(modelo.model_validate(visao).model_dump_json().encode() for visao in visoes) + b"]"
+        return Response(content=corpo, media_type="application/json", headers=dict(response.headers))
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import time
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# Instrumentação de SQL por requisição: numa fração das requisições (SQL_AMOSTRAGEM,
+# de 0 a 1; 0 = desligada, sem listeners nem middleware) conta os statements, soma o
+# tempo no banco e guarda o mais lento e as repetições por fingerprint (o SQL com
+# literais e listas de parâmetros normalizados). O resultado vai no cabeçalho
+# Server-Timing e numa linha de log JSON (logger core.instrumentacao). Um SELECT com o
+# mesmo fingerprint SQL_LIMIAR_N_MAIS_1 vezes ou mais na mesma requisição é marcado como
+# provável N+1 (tipicamente lazy loads na serialização) e a linha sai em WARNING.
+#
+# A coleta usa uma ContextVar: acompanha o threadpool das rotas síncronas e o greenlet
+# do AsyncSession. Consultas fora de requisições (threads de escrita adiada) não contam.
+
+HEADER_SERVER_TIMING = "Server-Timing"
+# Caracteres do SQL normalizado guardados no log
+TAMANHO_AMOSTRA_SQL = 200
+# Repetições listadas no log, das mais frequentes
+MAX_REPETIDAS = 5
+
+_TEXTOS = re.compile(r"'(?:[^']|'')*'")
+# Marcadores de parâmetro dos drivers (qmark, pyformat, format, numeric do asyncpg, named);
+# o lookbehind/lookahead deixa de fora o cast `::tipo` do Postgres
+_PARAMETROS = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<!:):(?!:)\w+")
+_NUMEROS = re.compile(r"\b\d+(?:\.\d+)?\b")
+# IN (...) e VALUES (...) com qualquer quantidade de parâmetros viram "(?)"
+_LISTAS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_LINHAS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_ESPACOS = re.compile(r"\s+")
+
+_coleta: ContextVar["ColetaSql | None"] = ContextVar("coleta_sql", default=None)
+
+
+def normalizar(sql: str) -> str:
+    """
+    SQL sem literais, com os parâmetros como `?` e as listas de parâmetros (e de linhas
+    do VALUES) como `(?)`.
+    """
+    sql = _ESPACOS.sub(" ", sql).strip()
+    sql = _TEXTOS.sub("?", sql)
+    sql = _PARAMETROS.sub("?", sql)
+    sql = _NUMEROS.sub("?", sql)
+    return _LINHAS.sub("(?)", _LISTAS.sub("(?)", sql))
+
+
+def fingerprint(sql_normalizado: str) -> str:
+    return hashlib.sha1(sql_normalizado.encode()).hexdigest()[:12]
+
+
+class ColetaSql:
+    """
+    Statements executados durante uma requisição.
+    """
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_s = 0.0
+        self.mais_lenta: tuple[float, str] | None = None
+        # fingerprint -> [vezes, sql normalizado]
+        self.por_fingerprint: dict[str, list] = {}
+
+    def registrar(self, sql: str, duracao_s: float) -> None:
+        normalizado = normalizar(sql)
+        self.consultas += 1
+        self.tempo_s += duracao_s
+        if self.mais_lenta is None or duracao_s > self.mais_lenta[0]:
+            self.mais_lenta = (duracao_s, normalizado)
+        entrada = self.por_fingerprint.setdefault(fingerprint(normalizado), [0, normalizado])
+        entrada[0] += 1
+
+    def repetidas(self) -> list[tuple[str, int, str]]:
+        # (fingerprint, vezes, sql) dos statements executados mais de uma vez
+        return sorted(((fp, vezes, sql) for fp, (vezes, sql) in self.por_fingerprint.items() if vezes > 1),
+                      key=lambda item: -item[1])
+
+    def n_mais_1(self, limiar: int) -> list[tuple[str, int, str]]:
+        return [(fp, vezes, sql) for fp, vezes, sql in self.repetidas()
+                if vezes >= limiar and sql.lstrip("( ").upper().startswith("SELECT")]
+
+
+def antes_de_executar(conn, cursor, statement, parameters, context, executemany) -> None:
+    # Listener de before_cursor_execute (registrado em database.py)
+    if context is not None and _coleta.get() is not None:
+        context.instrumentacao_inicio = time.perf_counter()
+
+
+def depois_de_executar(conn, cursor, statement, parameters, context, executemany) -> None:
+    coleta = _coleta.get()
+    inicio = getattr(context, "instrumentacao_inicio", None)
+    if coleta is not None and inicio is not None:
+        coleta.registrar(statement, time.perf_counter() - inicio)
+
+
+def _server_timing(coleta: ColetaSql, suspeitas: list) -> str:
+    partes = [f'db;dur={coleta.tempo_s * 1000:.2f};desc="{coleta.consultas} consultas"']
+    if coleta.mais_lenta is not None:
+        partes.append(f"db-max;dur={coleta.mais_lenta[0] * 1000:.2f}")
+    if suspeitas:
+        partes.append(f'n-mais-1;desc="{len(suspeitas)} statements repetidos"')
+    return ", ".join(partes)
+
+
+class MiddlewareInstrumentacao:
+    """
+    Middleware ASGI que abre uma ColetaSql para as requisições sorteadas, escreve o
+    Server-Timing na resposta e loga o resumo quando ela termina.
+    """
+
+    def __init__(self, app, amostragem: float, limiar_n_mais_1: int = 5):
+        self.app = app
+        self.amostragem = amostragem
+        self.limiar_n_mais_1 = limiar_n_mais_1
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= self.amostragem:
+            return await self.app(scope, receive, send)
+
+        coleta = ColetaSql()
+        token = _coleta.set(coleta)
+        status = None
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+                # Em streaming, as consultas feitas depois deste ponto só entram no log
+                cabecalho = _server_timing(coleta, coleta.n_mais_1(self.limiar_n_mais_1))
+                mensagem = {**mensagem, "headers": [*mensagem.get("headers", []),
+                                                    (HEADER_SERVER_TIMING.lower().encode(), cabecalho.encode())]}
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _coleta.reset(token)
+            self._logar(scope, status, coleta, time.perf_counter() - inicio)
+
+    def _logar(self, scope, status: int | None, coleta: ColetaSql, duracao_s: float) -> None:
+        suspeitas = coleta.n_mais_1(self.limiar_n_mais_1)
+        rota = scope.get("route")
+        registro = {
+            "metodo": scope["method"],
+            "rota": getattr(rota, "path", scope["path"]),
+            "status": status,
+            "duracao_ms": round(duracao_s * 1000, 2),
+            "consultas": coleta.consultas,
+            "tempo_db_ms": round(coleta.tempo_s * 1000, 2),
+            "mais_lenta": {"ms": round(coleta.mais_lenta[0] * 1000, 2),
+                           "sql": coleta.mais_lenta[1][:TAMANHO_AMOSTRA_SQL]} if coleta.mais_lenta else None,
+            "repetidas": [{"fingerprint": fp, "vezes": vezes, "sql": sql[:TAMANHO_AMOSTRA_SQL]}
+                          for fp, vezes, sql in coleta.repetidas()[:MAX_REPETIDAS]],
+            "n_mais_1": [fp for fp, _, _ in suspeitas],
+        }
+        nivel = logging.WARNING if suspeitas else logging.INFO
+        logger.log(nivel, json.dumps(registro, ensure_ascii=False), extra={"sql": registro})
+
+
+def amostragem_do_ambiente() -> float:
+    return min(max(float(os.getenv("SQL_AMOSTRAGEM", "0")), 0.0), 1.0)
+
+
+def limiar_do_ambiente() -> int:
+    return int(os.getenv("SQL_LIMIAR_N_MAIS_1", "5"))
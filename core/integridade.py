@@ -0,0 +1,69 @@
+import re
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+from fastapi import HTTPException
+from sqlalchemy import Table, select
+from sqlalchemy.exc import IntegrityError
+
+# As rotas de escrita confiam nas constraints do banco em vez de consultar antes de
+# gravar (SELECT + INSERT é uma ida a mais e ainda tem corrida entre requisições):
+# o IntegrityError é traduzido nas mesmas respostas 400/404 de antes.
+
+# Postgres: "DETAIL:  Key (cpf)=(123) already exists." / "... is not present in table"
+_CHAVE_POSTGRES = re.compile(r"Key \((?P<colunas>[^)]+)\)=")
+# SQLite: "UNIQUE constraint failed: aluno.cpf"
+_UNICA_SQLITE = re.compile(r"UNIQUE constraint failed: (?P<colunas>[\w.]+(?:, [\w.]+)*)")
+
+
+def violacao(erro: IntegrityError, tabela: Table) -> tuple[str, str | None]:
+    """
+    ("unica" | "estrangeira" | "outra", colunas) da constraint violada.
+    """
+    mensagem = str(erro.orig)
+    if "unique constraint" in mensagem.lower():
+        achado = _CHAVE_POSTGRES.search(mensagem) or _UNICA_SQLITE.search(mensagem)
+        colunas = achado["colunas"] if achado else None
+        return "unica", ", ".join(c.split(".")[-1] for c in colunas.split(", ")) if colunas else None
+    if "foreign key constraint" in mensagem.lower():
+        if achado := _CHAVE_POSTGRES.search(mensagem):
+            return "estrangeira", achado["colunas"]
+        # O SQLite não informa a coluna: só dá para identificar quando a tabela tem uma única FK
+        estrangeiras = [coluna.name for coluna in tabela.columns if coluna.foreign_keys]
+        return "estrangeira", estrangeiras[0] if len(estrangeiras) == 1 else None
+    return "outra", None
+
+
+def _estrangeira_ausente(session, tabela: Table, colunas: Iterable[str], valores: dict) -> str | None:
+    # Só no caminho de erro: procura a primeira referência que não existe
+    for coluna in colunas:
+        valor = valores.get(coluna)
+        if valor is None:
+            continue
+        referenciada = next(iter(tabela.c[coluna].foreign_keys)).column
+        if session.execute(select(referenciada).where(referenciada == valor)).first() is None:
+            return coluna
+    return None
+
+
+@contextmanager
+def traduzir_violacoes(session, tabela: Table, unicas: dict[str, str] | None = None,
+                       estrangeiras: dict[str, str] | None = None,
+                       valores: dict | None = None) -> Iterator[None]:
+    """
+    Executa o bloco (que faz o flush/commit) e converte violações de constraint em
+    HTTPException: `unicas` (coluna -> mensagem) viram 400 e `estrangeiras` viram 404.
+    Quando o banco não diz qual FK falhou (SQLite com mais de uma), as referências em
+    `valores` são conferidas depois do erro. Violações não mapeadas seguem como IntegrityError.
+    """
+    try:
+        yield
+    except IntegrityError as erro:
+        session.rollback()
+        tipo, colunas = violacao(erro, tabela)
+        if tipo == "estrangeira" and colunas is None and estrangeiras and valores:
+            colunas = _estrangeira_ausente(session, tabela, estrangeiras, valores)
+        mensagens = {"unica": unicas or {}, "estrangeira": estrangeiras or {}}.get(tipo, {})
+        if colunas in mensagens:
+            raise HTTPException(status_code=400 if tipo == "unica" else 404, detail=mensagens[colunas]) from erro
+        raise
@@ -0,0 +1,110 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Sequence
+
+from fastapi import HTTPException, Response
+from sqlalchemy import literal, tuple_
+
+HEADER_PROXIMO_CURSOR = "X-Next-Cursor"
+
+
+def _codificar_valor(valor: Any) -> Any:
+    # JSON já preserva int/float/str; datas levam uma marca para serem reconstruídas
+    if isinstance(valor, datetime):
+        return {"dt": valor.isoformat()}
+    if isinstance(valor, date):
+        return {"d": valor.isoformat()}
+    return valor
+
+
+def _decodificar_valor(valor: Any) -> Any:
+    if isinstance(valor, dict):
+        if "dt" in valor:
+            return datetime.fromisoformat(valor["dt"])
+        return date.fromisoformat(valor["d"])
+    return valor
+
+
+def _conferir_tipo(coluna, valor: Any) -> None:
+    # O cursor vem do cliente: um valor de outro tipo que a coluna falharia no banco (500)
+    tipo_sql = coluna.type
+    try:
+        # TypeDecorator (ex.: o AutoString do SQLModel) não informa o tipo Python; o tipo base sim
+        tipo = getattr(tipo_sql, "impl_instance", tipo_sql).python_type
+    except NotImplementedError:
+        return
+    if valor is None:
+        return
+    # No JSON, números com casas decimais podem vir sem elas (9.0 -> 9)
+    aceitos = (int, float) if tipo in (float, Decimal) else tipo
+    if (not isinstance(valor, aceitos) or (isinstance(valor, bool) and tipo is not bool)
+            or (tipo is date and isinstance(valor, datetime))):
+        raise ValueError(f"Valor do cursor não combina com a coluna {coluna.key}")
+
+
+def codificar_cursor(colunas: Sequence, linha: Any) -> str:
+    """
+    Gera o cursor opaco a partir dos valores da chave de ordenação da última linha.
+    """
+    dados = {
+        "k": [c.key for c in colunas],
+        "v": [_codificar_valor(getattr(linha, c.key)) for c in colunas],
+    }
+    bruto = json.dumps(dados, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+
+def decodificar_cursor(colunas: Sequence, cursor: str) -> list[Any]:
+    try:
+        preenchimento = "=" * (-len(cursor) % 4)
+        dados = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+        if dados["k"] != [c.key for c in colunas] or len(dados["v"]) != len(colunas):
+            raise ValueError("Cursor gerado para outra ordenação")
+        valores = [_decodificar_valor(v) for v in dados["v"]]
+        for coluna, valor in zip(colunas, valores):
+            _conferir_tipo(coluna, valor)
+        return valores
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+
+def paginar(statement, colunas: Sequence, *, offset: int, limit: int, cursor: str | None,
+            descendente: bool = False):
+    """
+    Ordena pela chave (colunas de ordenação + PK como desempate) e aplica a página.
+    Com `cursor` faz seek pela chave (keyset) e ignora o `offset`.
+    Busca uma linha a mais para saber se existe próxima página.
+    """
+    statement = statement.order_by(*[c.desc() if descendente else c.asc() for c in colunas])
+
+    if cursor:
+        valores = decodificar_cursor(colunas, cursor)
+        chave = tuple_(*colunas)
+        alvo = tuple_(*[literal(v, c.type) for c, v in zip(colunas, valores)])
+        statement = statement.where(chave < alvo if descendente else chave > alvo)
+    else:
+        statement = statement.offset(offset)
+
+    return statement.limit(limit + 1)
+
+
+def fatiar_pagina(resultados: Sequence, colunas: Sequence, limit: int, response: Response,
+                  emitir_cursor: bool = True) -> list:
+    """
+    Remove a linha extra buscada por `paginar` e publica o `X-Next-Cursor` quando houver mais páginas.
+    Ordenações que não seguem a chave (ex.: relevância) passam `emitir_cursor=False`.
+    """
+    resultados = list(resultados)
+    if len(resultados) > limit:
+        resultados = resultados[:limit]
+        if emitir_cursor:
+            response.headers[HEADER_PROXIMO_CURSOR] = codificar_cursor(colunas, resultados[-1])
+    return resultados
+
+
+def validar_cursor_relevancia(cursor: str | None, relevancia: bool) -> None:
+    if cursor and relevancia:
+        raise HTTPException(status_code=400, detail="Ordenação por relevância não suporta cursor; use offset.")
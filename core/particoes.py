@@ -0,0 +1,335 @@
+import re
+import time
+from datetime import date
+
+from sqlalchemy.exc import OperationalError
+
+# No Postgres, matricula é particionada por semestre (PARTITION BY LIST): uma partição
+# por semestre (matricula_25_1) e a padrão (matricula_padrao) para valores sem partição.
+# Consultas com `semestre = ...` só leem a partição do semestre (partition pruning) e
+# semestres antigos podem ser desanexados/arquivados sem reescrever a tabela.
+#
+# Restrições do particionamento e como são contornadas:
+# - PK/UNIQUE precisam conter a chave de partição: a PK física é (id_aluno, disciplina_id,
+#   semestre) e a regra "uma matrícula por aluno e disciplina" (PK do modelo) é garantida
+#   pelos triggers matricula_unica*, que levantam o mesmo unique_violation de uma PK.
+# - Criar a partição de um semestre varre a padrão: mantenha-a vazia criando as
+#   partições com antecedência (python -m scripts.particoes criar).
+# - DETACH ... CONCURRENTLY não é permitido com partição padrão; o desanexar usa o DETACH
+#   comum (só metadados, mas com lock exclusivo) com lock_timeout curto e novas tentativas,
+#   para nunca enfileirar as consultas da API atrás dele.
+#
+# No SQLite (testes) nada disso se aplica: as funções não fazem nada.
+
+TABELA = "matricula"
+PADRAO = "matricula_padrao"
+ESQUEMA_ARQUIVO = "arquivo"
+
+_SEMESTRE = re.compile(r"^(?P<ano>\d{2})\.(?P<periodo>[12])$")
+
+_INDICES = {
+    "ix_matricula_semestre_id_aluno_disciplina_id": "(semestre, id_aluno, disciplina_id)",
+    "ix_matricula_semestre_nota_final": "(semestre, nota_final)",
+    "ix_matricula_disciplina_id": "(disciplina_id)",
+}
+
+# Grupos de alunos para os advisory locks da unicidade: limita os locks por transação
+# (um INSERT em massa trava no máximo GRUPOS_UNICIDADE chaves, não uma por linha)
+GRUPOS_UNICIDADE = 128
+
+_FUNCOES_UNICA = f"""
+CREATE OR REPLACE FUNCTION matricula_unica() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    repetida record;
+BEGIN
+    -- Serializa até o commit quem grava matrículas do mesmo grupo de alunos: depois do lock,
+    -- a outra transação já commitou e a consulta abaixo (snapshot novo) enxerga as linhas dela
+    PERFORM pg_advisory_xact_lock(hashtext('matricula'), grupo)
+    FROM (SELECT DISTINCT mod(id_aluno, {GRUPOS_UNICIDADE}) AS grupo FROM novas ORDER BY 1) g;
+    SELECT n.id_aluno, n.disciplina_id INTO repetida
+    FROM novas n
+    JOIN matricula m ON m.id_aluno = n.id_aluno AND m.disciplina_id = n.disciplina_id AND m.semestre <> n.semestre
+    LIMIT 1;
+    IF FOUND THEN
+        RAISE unique_violation USING
+            MESSAGE = 'duplicate key value violates unique constraint "matricula_unica"',
+            DETAIL = 'Key (id_aluno, disciplina_id)=(' || repetida.id_aluno || ', ' || repetida.disciplina_id
+                     || ') already exists.';
+    END IF;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION matricula_unica_troca() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    -- UPDATE que troca aluno ou disciplina (raro): mesma regra, linha a linha
+    IF NEW.id_aluno = OLD.id_aluno AND NEW.disciplina_id = OLD.disciplina_id THEN
+        RETURN NEW;
+    END IF;
+    PERFORM pg_advisory_xact_lock(hashtext('matricula'), mod(NEW.id_aluno, {GRUPOS_UNICIDADE}));
+    IF EXISTS (SELECT 1 FROM matricula WHERE id_aluno = NEW.id_aluno AND disciplina_id = NEW.disciplina_id) THEN
+        RAISE unique_violation USING
+            MESSAGE = 'duplicate key value violates unique constraint "matricula_unica"',
+            DETAIL = 'Key (id_aluno, disciplina_id)=(' || NEW.id_aluno || ', ' || NEW.disciplina_id
+                     || ') already exists.';
+    END IF;
+    RETURN NEW;
+END $$;
+"""
+
+
+def nome_particao(semestre: str) -> str:
+    """
+    "25.1" -> "matricula_25_1".
+    """
+    if not _SEMESTRE.match(semestre):
+        raise ValueError(f"Semestre inválido: {semestre!r} (esperado AA.1 ou AA.2)")
+    return f"{TABELA}_{semestre.replace('.', '_')}"
+
+
+def semestre_de(dia: date) -> str:
+    return f"{dia.year % 100:02d}.{1 if dia.month <= 6 else 2}"
+
+
+def proximo_semestre(semestre: str) -> str:
+    achado = _SEMESTRE.match(semestre)
+    if not achado:
+        raise ValueError(f"Semestre inválido: {semestre!r} (esperado AA.1 ou AA.2)")
+    ano, periodo = int(achado["ano"]), int(achado["periodo"])
+    return f"{ano:02d}.2" if periodo == 1 else f"{(ano + 1) % 100:02d}.1"
+
+
+def semestres_a_frente(dia: date, quantidade: int) -> list[str]:
+    """
+    O semestre de `dia` e os `quantidade` seguintes.
+    """
+    semestres = [semestre_de(dia)]
+    for _ in range(quantidade):
+        semestres.append(proximo_semestre(semestres[-1]))
+    return semestres
+
+
+def particionada(connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return connection.exec_driver_sql(
+        f"SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('{TABELA}'))"
+    ).scalar()
+
+
+def particoes(connection) -> dict[str, str]:
+    """
+    {semestre: partição} das partições anexadas (sem a padrão).
+    """
+    if not particionada(connection):
+        return {}
+    linhas = connection.exec_driver_sql(
+        f"SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        f"JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = '{TABELA}'::regclass"
+    ).all()
+    resultado = {}
+    for nome, limite in linhas:
+        # "FOR VALUES IN ('25.1')"
+        achado = re.search(r"IN \('([^']+)'\)", limite)
+        if achado:
+            resultado[achado[1]] = nome
+    return dict(sorted(resultado.items()))
+
+
+def _criar_estrutura(connection, origem: str) -> None:
+    # Tabela particionada vazia com as colunas de `origem` e a partição padrão
+    connection.exec_driver_sql(
+        f"CREATE TABLE {TABELA} (LIKE {origem} INCLUDING DEFAULTS) PARTITION BY LIST (semestre)"
+    )
+    connection.exec_driver_sql(f"CREATE TABLE {PADRAO} PARTITION OF {TABELA} DEFAULT")
+
+
+def _restricoes(connection) -> None:
+    connection.exec_driver_sql(
+        f"ALTER TABLE {TABELA} ADD CONSTRAINT matricula_pkey PRIMARY KEY (id_aluno, disciplina_id, semestre)"
+    )
+    connection.exec_driver_sql(
+        f"ALTER TABLE {TABELA} ADD CONSTRAINT matricula_id_aluno_fkey FOREIGN KEY (id_aluno) REFERENCES aluno (id)"
+    )
+    connection.exec_driver_sql(
+        f"ALTER TABLE {TABELA} ADD CONSTRAINT matricula_disciplina_id_fkey "
+        f"FOREIGN KEY (disciplina_id) REFERENCES disciplina (id)"
+    )
+    for nome, colunas in _INDICES.items():
+        connection.exec_driver_sql(f"CREATE INDEX {nome} ON {TABELA} {colunas}")
+    connection.exec_driver_sql(_FUNCOES_UNICA)
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER matricula_unica AFTER INSERT ON {TABELA} REFERENCING NEW TABLE AS novas "
+        f"FOR EACH STATEMENT EXECUTE FUNCTION matricula_unica()"
+    )
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER matricula_unica_troca BEFORE UPDATE OF id_aluno, disciplina_id ON {TABELA} "
+        f"FOR EACH ROW EXECUTE FUNCTION matricula_unica_troca()"
+    )
+
+
+def particionar(connection, semestres_adiante: int = 1) -> list[str]:
+    """
+    Converte matricula numa tabela particionada por semestre, com uma partição por
+    semestre existente, a do semestre atual e as `semestres_adiante` seguintes.
+    Copia os dados (bloqueia a tabela durante a cópia). Os triggers de estatísticas e
+    contagem precisam ser recriados depois (a tabela antiga vai embora com os seus).
+    Retorna os semestres com partição.
+    """
+    if connection.dialect.name != "postgresql" or particionada(connection):
+        return []
+
+    antiga = f"{TABELA}_nao_particionada"
+    connection.exec_driver_sql(f"ALTER TABLE {TABELA} RENAME TO {antiga}")
+    connection.exec_driver_sql(f"ALTER INDEX matricula_pkey RENAME TO {antiga}_pkey")
+    for nome in _INDICES:
+        connection.exec_driver_sql(f"DROP INDEX IF EXISTS {nome}")
+
+    _criar_estrutura(connection, antiga)
+    existentes = [
+        semestre for (semestre,) in connection.exec_driver_sql(f"SELECT DISTINCT semestre FROM {antiga}")
+        if _SEMESTRE.match(semestre)
+    ]
+    semestres = set(existentes) | set(semestres_a_frente(date.today(), semestres_adiante))
+    for semestre in sorted(semestres):
+        connection.exec_driver_sql(
+            f"CREATE TABLE {nome_particao(semestre)} PARTITION OF {TABELA} FOR VALUES IN ('{semestre}')"
+        )
+    connection.exec_driver_sql(f"INSERT INTO {TABELA} SELECT * FROM {antiga}")
+    connection.exec_driver_sql(f"DROP TABLE {antiga}")
+    # PK, FKs e índices depois da carga: uma construção por partição em vez de inserção a inserção
+    _restricoes(connection)
+    return sorted(semestres)
+
+
+def desparticionar(connection) -> None:
+    """
+    Volta matricula a uma tabela comum com PK (id_aluno, disciplina_id) (downgrade).
+    """
+    if not particionada(connection):
+        return
+    nova = f"{TABELA}_nao_particionada"
+    connection.exec_driver_sql(f"CREATE TABLE {nova} (LIKE {TABELA} INCLUDING DEFAULTS)")
+    connection.exec_driver_sql(f"INSERT INTO {nova} SELECT * FROM {TABELA}")
+    connection.exec_driver_sql(f"DROP TABLE {TABELA} CASCADE")
+    connection.exec_driver_sql("DROP FUNCTION IF EXISTS matricula_unica()")
+    connection.exec_driver_sql("DROP FUNCTION IF EXISTS matricula_unica_troca()")
+    connection.exec_driver_sql(f"ALTER TABLE {nova} RENAME TO {TABELA}")
+    connection.exec_driver_sql(f"ALTER TABLE {TABELA} ADD CONSTRAINT matricula_pkey PRIMARY KEY (id_aluno, disciplina_id)")
+    connection.exec_driver_sql(
+        f"ALTER TABLE {TABELA} ADD CONSTRAINT matricula_id_aluno_fkey FOREIGN KEY (id_aluno) REFERENCES aluno (id)"
+    )
+    connection.exec_driver_sql(
+        f"ALTER TABLE {TABELA} ADD CONSTRAINT matricula_disciplina_id_fkey "
+        f"FOREIGN KEY (disciplina_id) REFERENCES disciplina (id)"
+    )
+    for nome, colunas in _INDICES.items():
+        connection.exec_driver_sql(f"CREATE INDEX {nome} ON {TABELA} {colunas}")
+
+
+def criar_particao(connection, semestre: str) -> bool:
+    """
+    Cria a partição do semestre se ainda não existir (False se já existia). Linhas do
+    semestre que estejam na partição padrão são movidas para ela.
+    """
+    if not particionada(connection) or semestre in particoes(connection):
+        return False
+    nome = nome_particao(semestre)
+    # Criada fora da tabela e anexada depois: as linhas que caíram na padrão são movidas
+    # antes do ATTACH, senão a validação da padrão falha
+    connection.exec_driver_sql(f"CREATE TABLE {nome} (LIKE {TABELA} INCLUDING DEFAULTS)")
+    connection.exec_driver_sql(
+        f"WITH movidas AS (DELETE FROM {PADRAO} WHERE semestre = '{semestre}' RETURNING *) "
+        f"INSERT INTO {nome} SELECT * FROM movidas"
+    )
+    # A CHECK equivalente ao limite evita a varredura de validação no ATTACH
+    connection.exec_driver_sql(
+        f"ALTER TABLE {nome} ADD CONSTRAINT {nome}_limite CHECK (semestre IS NOT NULL AND semestre = '{semestre}')"
+    )
+    connection.exec_driver_sql(f"ALTER TABLE {TABELA} ATTACH PARTITION {nome} FOR VALUES IN ('{semestre}')")
+    connection.exec_driver_sql(f"ALTER TABLE {nome} DROP CONSTRAINT {nome}_limite")
+    return True
+
+
+def _contar(connection, nome: str) -> list[tuple]:
+    # (disciplina_id, alunos, avaliados, soma) da partição, calculado antes do DETACH:
+    # depois dele, só UPDATEs de poucas linhas com valores prontos seguram o lock de matricula
+    return connection.exec_driver_sql(
+        f"SELECT disciplina_id, count(*), count(nota_final), coalesce(sum(nota_final), 0) "
+        f"FROM {nome} GROUP BY disciplina_id"
+    ).all()
+
+
+def _descontar(connection, contagem: list[tuple]) -> int:
+    # O DETACH não dispara triggers: tira as linhas da partição das tabelas-resumo e da contagem
+    if contagem:
+        valores = ", ".join(f"({disciplina_id}, {alunos}, {avaliados}, {soma})"
+                            for disciplina_id, alunos, avaliados, soma in contagem)
+        connection.exec_driver_sql(f"""
+            UPDATE estatisticadisciplina e
+            SET total_alunos = e.total_alunos - d.alunos,
+                total_avaliados = e.total_avaliados - d.avaliados,
+                soma_notas = e.soma_notas - d.soma,
+                atualizado_em = now()
+            FROM (VALUES {valores}) AS d (disciplina_id, alunos, avaliados, soma)
+            WHERE e.disciplina_id = d.disciplina_id
+        """)
+    linhas = sum(alunos for _, alunos, _, _ in contagem)
+    connection.exec_driver_sql(
+        f"UPDATE contagemtabela SET total = total - {linhas}, atualizado_em = now() "
+        f"WHERE tabela = '{TABELA}' AND fatia = 0"
+    )
+    return linhas
+
+
+def _remover_estrangeiras(connection, nome: str) -> None:
+    # O DETACH mantém na tabela as FKs herdadas de matricula (para aluno e disciplina): sem
+    # removê-las, apagar um aluno ou uma disciplina com matrícula no semestre desanexado falharia
+    restricoes = connection.exec_driver_sql(
+        f"SELECT conname FROM pg_constraint WHERE conrelid = '{nome}'::regclass AND contype = 'f'"
+    ).scalars().all()
+    for restricao in restricoes:
+        connection.exec_driver_sql(f'ALTER TABLE {nome} DROP CONSTRAINT "{restricao}"')
+
+
+def desanexar_particao(connection, semestre: str, arquivar: bool = False, lock_timeout_ms: int = 2_000,
+                       tentativas: int = 5) -> int:
+    """
+    Tira o semestre de matricula (DETACH PARTITION). A partição vira uma tabela comum,
+    sem as FKs para aluno e disciplina, movida para o esquema `arquivo` com `arquivar`.
+    Retorna quantas linhas saíram. Roda na transação de `connection`, que deve estar em
+    autocommit=False e ser confirmada por quem chama.
+    """
+    nome = particoes(connection).get(semestre)
+    if nome is None:
+        raise ValueError(f"Semestre sem partição: {semestre}")
+
+    connection.exec_driver_sql(f"SET LOCAL lock_timeout = '{int(lock_timeout_ms)}ms'")
+    # SHARE na partição: bloqueia só as escritas no semestre (as leituras seguem), para que a
+    # contagem feita agora continue valendo no DETACH
+    connection.exec_driver_sql(f"LOCK TABLE {nome} IN SHARE MODE")
+    contagem = _contar(connection, nome)
+    for tentativa in range(1, tentativas + 1):
+        ponto = connection.begin_nested()
+        try:
+            connection.exec_driver_sql(f"ALTER TABLE {TABELA} DETACH PARTITION {nome}")
+            ponto.commit()
+            break
+        except OperationalError:
+            # lock_timeout: uma consulta longa segura a tabela; tenta de novo em seguida
+            ponto.rollback()
+            if tentativa == tentativas:
+                raise
+            time.sleep(tentativa)
+
+    linhas = _descontar(connection, contagem)
+    _remover_estrangeiras(connection, nome)
+    if arquivar:
+        connection.exec_driver_sql(f"CREATE SCHEMA IF NOT EXISTS {ESQUEMA_ARQUIVO}")
+        connection.exec_driver_sql(f"ALTER TABLE {nome} SET SCHEMA {ESQUEMA_ARQUIVO}")
+    return linhas
+
+
+def ao_criar_tabelas(target, connection, **kw) -> None:
+    # Listener de `after_create` do metadata (create_all): mesmo efeito da migration.
+    # Registrado antes dos triggers de estatísticas/contagem, que são criados já na tabela nova
+    particionar(connection)
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Limites (em ms) dos buckets do histograma de espera por conexão
+BUCKETS_ESPERA_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1_000, 2_500, 5_000, 10_000)
+
+
+def _int_env(nome: str) -> int | None:
+    valor = os.getenv(nome)
+    return int(valor) if valor not in (None, "") else None
+
+
+def configuracao_pool(url) -> dict:
+    """
+    Argumentos de create_engine para o pool, lidos do ambiente:
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE (segundos),
+    DB_POOL_PRE_PING (1/0) e DB_STATEMENT_TIMEOUT_MS (só Postgres).
+    """
+    kwargs: dict = {"pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1").lower() in ("1", "true", "sim")}
+    if url.get_backend_name() == "sqlite":
+        # O SQLite escolhe o próprio pool (SingletonThreadPool/StaticPool para :memory:)
+        return kwargs
+
+    for chave, variavel in (("pool_size", "DB_POOL_SIZE"), ("max_overflow", "DB_MAX_OVERFLOW"),
+                            ("pool_timeout", "DB_POOL_TIMEOUT"), ("pool_recycle", "DB_POOL_RECYCLE")):
+        valor = _int_env(variavel)
+        if valor is not None:
+            kwargs[chave] = valor
+
+    statement_timeout = _int_env("DB_STATEMENT_TIMEOUT_MS")
+    if statement_timeout is not None:
+        if url.get_driver_name() == "asyncpg":
+            kwargs["connect_args"] = {"server_settings": {"statement_timeout": str(statement_timeout)}}
+        else:
+            kwargs["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    return kwargs
+
+
+class MetricasPool:
+    """
+    Contadores e histograma de espera de um pool de conexões. Os contadores de eventos
+    são alimentados pelos listeners de pool em database.py; a espera e os timeouts,
+    pela classe de pool criada em `classe_pool`.
+    """
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self._lock = threading.Lock()
+        self.engine = None
+        self.conexoes_criadas = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidacoes = 0
+        self.timeouts = 0
+        self.espera_total_s = 0.0
+        self.espera_maxima_s = 0.0
+        self.histograma = [0] * (len(BUCKETS_ESPERA_MS) + 1)
+
+    def incrementar(self, contador: str) -> None:
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def registrar_espera(self, segundos: float) -> None:
+        ms = segundos * 1000
+        indice = next((i for i, limite in enumerate(BUCKETS_ESPERA_MS) if ms <= limite), len(BUCKETS_ESPERA_MS))
+        with self._lock:
+            self.histograma[indice] += 1
+            self.espera_total_s += segundos
+            self.espera_maxima_s = max(self.espera_maxima_s, segundos)
+
+    def snapshot(self) -> dict:
+        # engine.pool é relido a cada chamada: dispose() troca o pool por um novo
+        pool = self.engine.pool if self.engine is not None else None
+        with self._lock:
+            esperas = sum(self.histograma)
+            return {
+                "pool": type(pool).__name__ if pool is not None else None,
+                # size/checkedin/checkedout/overflow só existem nos pools com fila (QueuePool)
+                "tamanho": pool.size() if hasattr(pool, "size") else None,
+                "em_uso": pool.checkedout() if hasattr(pool, "checkedout") else None,
+                "ociosas": pool.checkedin() if hasattr(pool, "checkedin") else None,
+                "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+                "conexoes_criadas": self.conexoes_criadas,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidacoes": self.invalidacoes,
+                "timeouts_checkout": self.timeouts,
+                "espera_media_ms": round(self.espera_total_s * 1000 / esperas, 3) if esperas else 0.0,
+                "espera_maxima_ms": round(self.espera_maxima_s * 1000, 3),
+                "histograma_espera_ms": {
+                    **{f"<={limite}": total for limite, total in zip(BUCKETS_ESPERA_MS, self.histograma)},
+                    "+Inf": self.histograma[-1],
+                },
+            }
+
+
+def classe_pool(metricas: MetricasPool, assincrono: bool = False) -> type:
+    """
+    Subclasse de QueuePool (ou AsyncAdaptedQueuePool) que mede quanto tempo cada
+    checkout esperou por uma conexão e conta os que estouraram o pool_timeout.
+    """
+    base = AsyncAdaptedQueuePool if assincrono else QueuePool
+
+    class PoolInstrumentado(base):
+        def _do_get(self):
+            inicio = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                metricas.incrementar("timeouts")
+                raise
+            finally:
+                metricas.registrar_espera(time.perf_counter() - inicio)
+
+    PoolInstrumentado.__name__ = f"{base.__name__}Instrumentado"
+    return PoolInstrumentado
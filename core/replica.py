@@ -0,0 +1,242 @@
+import logging
+import math
+import os
+import threading
+import time
+
+from fastapi import Request
+from sqlalchemy import event, exc
+
+logger = logging.getLogger(__name__)
+
+# Réplica de leitura opcional (DATABASE_REPLICA_URL). A sessão das rotas GET/HEAD vai
+# para a réplica, e a das demais para o primário, exceto nestes casos:
+#   - o cliente escreveu há menos de REPLICA_ATRASO_MAXIMO_S (read-your-writes): as
+#     respostas de escrita trazem o cookie `ultima_escrita` e o cabeçalho X-Last-Write,
+#     e qualquer um dos dois de volta numa leitura a manda para o primário;
+#   - a réplica está fora do ar ou atrasada mais que REPLICA_ATRASO_MAXIMO_S. O estado
+#     é verificado no máximo a cada REPLICA_VERIFICACAO_S. Entre as verificações, a
+#     sessão já abre a conexão com a réplica ao ser criada e, se não conseguir, a marca
+#     como indisponível e segue no primário; uma conexão perdida no meio de uma
+#     consulta também a marca (mas essa requisição falha).
+# Como a réplica nunca é usada com mais atraso que o limite, uma escrita mais antiga
+# que ele já está nela: o mesmo valor serve de janela do read-your-writes.
+#
+# Para testar localmente: uma cópia do arquivo SQLite (cp app.db replica.db) faz o papel
+# de réplica parada no tempo; com dois Postgres, sem streaming o atraso medido é zero.
+
+HEADER_BANCO = "X-Database"
+HEADER_ESCRITA = "X-Last-Write"
+COOKIE_ESCRITA = "ultima_escrita"
+METODOS_LEITURA = frozenset({"GET", "HEAD"})
+
+# Sem réplica em recovery (ou com tudo o que foi recebido já aplicado) o atraso é zero;
+# senão, o tempo desde a última transação aplicada
+_ATRASO_POSTGRES = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def medir_atraso(connection) -> float:
+    """
+    Atraso de replicação em segundos (0 quando o banco não informa, como no SQLite).
+    """
+    if connection.dialect.name == "postgresql":
+        return float(connection.exec_driver_sql(_ATRASO_POSTGRES).scalar())
+    connection.exec_driver_sql("SELECT 1")
+    return 0.0
+
+
+def escreveu_ha_pouco(request: Request, janela_s: float) -> bool:
+    # Cabeçalho (clientes de API) ou cookie (navegador) com o instante da última escrita
+    valor = request.headers.get(HEADER_ESCRITA) or request.cookies.get(COOKIE_ESCRITA)
+    try:
+        instante = float(valor)
+    except (TypeError, ValueError):
+        return False
+    return abs(time.time() - instante) < janela_s
+
+
+def leu_da_replica(request: Request | None) -> bool:
+    return request is not None and getattr(request.state, "banco", None) == "replica"
+
+
+class Replica:
+    """
+    Engines da réplica (síncrono e, no modo assíncrono, o assíncrono) e o estado
+    compartilhado por eles: disponível ou não e o último atraso medido.
+    """
+
+    def __init__(self, engine, engine_async=None, atraso_maximo_s: float = 5.0, verificacao_s: float = 1.0):
+        self.engine = engine
+        self.engine_async = engine_async
+        self.atraso_maximo_s = atraso_maximo_s
+        self.verificacao_s = verificacao_s
+        self._lock = threading.Lock()
+        self._proxima_verificacao = 0.0
+        self.disponivel = False
+        self.atraso_s: float | None = None
+        self.ultimo_erro: str | None = None
+        self.leituras_replica = 0
+        self.leituras_primario = 0
+        self.quedas = 0
+
+        for alvo in (engine, engine_async.sync_engine if engine_async is not None else None):
+            if alvo is not None:
+                event.listen(alvo, "handle_error", self._ao_errar)
+
+    def _ao_errar(self, contexto) -> None:
+        # Conexão perdida ou recusada: as próximas leituras vão para o primário até a
+        # próxima verificação bem-sucedida. Uma falha no pre-ping não conta: o pool
+        # já descarta a conexão velha e abre outra
+        if (contexto.is_disconnect or contexto.connection is None) and not contexto.is_pre_ping:
+            self.marcar_indisponivel(contexto.original_exception)
+
+    def marcar_indisponivel(self, erro: BaseException) -> None:
+        with self._lock:
+            if self.disponivel:
+                self.quedas += 1
+                logger.warning("Réplica indisponível, lendo do primário: %s", erro)
+            self.disponivel = False
+            self.ultimo_erro = str(erro)
+            self._proxima_verificacao = time.monotonic() + self.verificacao_s
+
+    def _registrar_atraso(self, atraso: float) -> None:
+        with self._lock:
+            self.disponivel = True
+            self.atraso_s = atraso
+            self.ultimo_erro = None
+
+    def _reservar_verificacao(self) -> bool:
+        # Só uma requisição por intervalo verifica; as outras usam o último estado
+        with self._lock:
+            agora = time.monotonic()
+            if agora < self._proxima_verificacao:
+                return False
+            self._proxima_verificacao = agora + self.verificacao_s
+            return True
+
+    def _utilizavel(self) -> bool:
+        return self.disponivel and self.atraso_s is not None and self.atraso_s <= self.atraso_maximo_s
+
+    def verificar(self) -> bool:
+        if self._reservar_verificacao():
+            try:
+                with self.engine.connect() as connection:
+                    self._registrar_atraso(medir_atraso(connection))
+            except (exc.DBAPIError, OSError) as erro:
+                self.marcar_indisponivel(erro)
+        return self._utilizavel()
+
+    async def verificar_async(self) -> bool:
+        if self._reservar_verificacao():
+            try:
+                async with self.engine_async.connect() as connection:
+                    self._registrar_atraso(await connection.run_sync(medir_atraso))
+            except (exc.DBAPIError, OSError) as erro:
+                self.marcar_indisponivel(erro)
+        return self._utilizavel()
+
+    def _candidata(self, request: Request) -> bool:
+        return request.method in METODOS_LEITURA and not escreveu_ha_pouco(request, self.atraso_maximo_s)
+
+    def _registrar_escolha(self, request: Request, usar_replica: bool) -> bool:
+        request.state.banco = "replica" if usar_replica else "primario"
+        with self._lock:
+            if usar_replica:
+                self.leituras_replica += 1
+            elif request.method in METODOS_LEITURA:
+                self.leituras_primario += 1
+        return usar_replica
+
+    def escolher(self, request: Request) -> bool:
+        """
+        True se a requisição deve ler da réplica (contexto síncrono).
+        """
+        return self._registrar_escolha(request, self._candidata(request) and self.verificar())
+
+    async def escolher_async(self, request: Request) -> bool:
+        return self._registrar_escolha(request, self._candidata(request) and await self.verificar_async())
+
+    def _recuar(self, request: Request, erro: BaseException) -> None:
+        self.marcar_indisponivel(erro)
+        request.state.banco = "primario"
+        with self._lock:
+            self.leituras_replica -= 1
+            self.leituras_primario += 1
+
+    def conectar(self, session, request: Request) -> bool:
+        """
+        Abre já a conexão da sessão na réplica. Se falhar, marca a réplica como
+        indisponível e devolve False, para a requisição seguir no primário.
+        """
+        try:
+            session.connection()
+        except (exc.DBAPIError, OSError) as erro:
+            self._recuar(request, erro)
+            return False
+        return True
+
+    async def conectar_async(self, session, request: Request) -> bool:
+        try:
+            await session.connection()
+        except (exc.DBAPIError, OSError) as erro:
+            self._recuar(request, erro)
+            return False
+        return True
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return {
+                "disponivel": self.disponivel,
+                "atraso_s": self.atraso_s,
+                "atraso_maximo_s": self.atraso_maximo_s,
+                "ultimo_erro": self.ultimo_erro,
+                "leituras_replica": self.leituras_replica,
+                "leituras_primario": self.leituras_primario,
+                "quedas": self.quedas,
+            }
+
+
+def replica_do_ambiente(engine, engine_async=None) -> Replica:
+    return Replica(
+        engine, engine_async,
+        atraso_maximo_s=float(os.getenv("REPLICA_ATRASO_MAXIMO_S", "5")),
+        verificacao_s=float(os.getenv("REPLICA_VERIFICACAO_S", "1")),
+    )
+
+
+class MiddlewareReplica:
+    """
+    Middleware ASGI: marca as respostas de escrita bem-sucedidas com o instante da
+    escrita (cookie e X-Last-Write) e as de leitura com o banco usado (X-Database).
+    """
+
+    def __init__(self, app, replica: Replica):
+        self.app = app
+        self.replica = replica
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        escrita = scope["method"] not in METODOS_LEITURA
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                cabecalhos = list(mensagem.get("headers", []))
+                banco = scope.get("state", {}).get("banco")
+                if banco is not None:
+                    cabecalhos.append((HEADER_BANCO.lower().encode(), banco.encode()))
+                if escrita and mensagem["status"] < 400:
+                    instante = f"{time.time():.3f}"
+                    validade = math.ceil(self.replica.atraso_maximo_s)
+                    cabecalhos.append((HEADER_ESCRITA.lower().encode(), instante.encode()))
+                    cabecalhos.append((b"set-cookie", f"{COOKIE_ESCRITA}={instante}; Max-Age={validade}; "
+                                                      f"Path=/; HttpOnly; SameSite=Lax".encode()))
+                mensagem = {**mensagem, "headers": cabecalhos}
+            await send(mensagem)
+
+        await self.app(scope, receive, enviar)
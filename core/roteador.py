@@ -0,0 +1,78 @@
+import functools
+import inspect
+from typing import Any, Callable
+
+from fastapi import APIRouter, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.params import Depends as DependsParam
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import database
+
+
+def _parametros_sessao(assinatura: inspect.Signature) -> list[str]:
+    return [
+        nome for nome, parametro in assinatura.parameters.items()
+        if isinstance(parametro.default, DependsParam) and parametro.default.dependency in database.DEPENDENCIAS_ASYNC
+    ]
+
+
+def adaptar_endpoint(endpoint: Callable) -> Callable:
+    """
+    No modo assíncrono (DATABASE_ASYNC=1), troca as dependências de sessão síncronas
+    pelas assíncronas. Endpoints `def` viram `async def` que executam o corpo original
+    via `AsyncSession.run_sync`: o mesmo código ORM (incluindo selectinload/joinedload)
+    roda sobre o driver assíncrono, sem ocupar o threadpool. Não são rotas assíncronas
+    nativas: o corpo roda num greenlet no event loop, e o que bloqueia fora do banco
+    passa por core.concorrencia.bloqueante.
+    """
+    assinatura = inspect.signature(endpoint)
+    nomes = _parametros_sessao(assinatura)
+    if not database.ASYNC_ATIVO or not nomes:
+        return endpoint
+
+    parametros = [
+        parametro.replace(default=Depends(database.DEPENDENCIAS_ASYNC[parametro.default.dependency]),
+                          annotation=AsyncSession)
+        if nome in nomes else parametro
+        for nome, parametro in assinatura.parameters.items()
+    ]
+
+    if inspect.iscoroutinefunction(endpoint):
+        # Endpoints já assíncronos recebem o AsyncSession diretamente
+        @functools.wraps(endpoint)
+        async def assincrono(**kwargs: Any) -> Any:
+            return await endpoint(**kwargs)
+    else:
+        @functools.wraps(endpoint)
+        async def assincrono(**kwargs: Any) -> Any:
+            sessoes = {nome: kwargs.pop(nome) for nome in nomes}
+
+            def executar(sync_session):
+                # Cada dependência tem o próprio AsyncSession; o corpo usa a versão síncrona de cada um
+                return endpoint(**kwargs, **{nome: sessao.sync_session for nome, sessao in sessoes.items()})
+
+            return await sessoes[nomes[0]].run_sync(executar)
+
+    assincrono.__signature__ = assinatura.replace(parameters=parametros)
+    return assincrono
+
+
+async def executar_em_sessao(session: Session | AsyncSession, funcao: Callable, *args: Any) -> Any:
+    """
+    Para endpoints `async def`: executa `funcao(sync_session, *args)` com a sessão
+    síncrona, via run_sync no modo assíncrono ou no threadpool no modo síncrono.
+    """
+    if isinstance(session, AsyncSession):
+        return await session.run_sync(funcao, *args)
+    return await run_in_threadpool(funcao, session, *args)
+
+
+class RoteadorSessao(APIRouter):
+    """
+    APIRouter que adapta cada endpoint ao modo de banco configurado (síncrono ou assíncrono).
+    """
+
+    def add_api_route(self, path: str, endpoint: Callable, **kwargs: Any) -> None:
+        super().add_api_route(path, adaptar_endpoint(endpoint), **kwargs)
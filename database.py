@@ -1,15 +1,140 @@
 import sqlite3
 from sqlmodel import create_engine, Session, SQLModel
-from sqlalchemy import event, Engine
-from typing import Generator
+from sqlmodel.ext.asyncio.session import AsyncSession
+from fastapi import Request
+from sqlalchemy import event, Engine, make_url
+from sqlalchemy.orm import Session as SessionOrm
+from sqlalchemy.ext.asyncio import create_async_engine
+from typing import AsyncGenerator, Generator
 from dotenv import load_dotenv
 import logging
 import os  
 
+from core import busca, carregamento, contagem, estatisticas, instrumentacao, particoes
+from core.pool import MetricasPool, classe_pool, configuracao_pool
+from core.replica import Replica, replica_do_ambiente
+
 load_dotenv()
 
-engine = create_engine(os.getenv("DATABASE_URL"))
+DATABASE_URL = os.getenv("DATABASE_URL")
+# Réplica de leitura opcional para as rotas GET (ver core/replica.py)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+
+# DATABASE_ASYNC=1 faz os routers rodarem como `async def` sobre um AsyncSession
+# (asyncpg / aiosqlite), sem passar pelo threadpool do anyio. É uma adaptação dos mesmos
+# corpos síncronos (core/roteador.py), não rotas `async def` nativas.
+ASYNC_ATIVO = os.getenv("DATABASE_ASYNC", "0").lower() in ("1", "true", "sim")
+
+_DRIVERS_ASYNC = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def url_async(url: str, variavel: str = "ASYNC_DATABASE_URL") -> str:
+    """
+    Deriva a URL do driver assíncrono a partir de `url` (ou usa a da variável `variavel`).
+    """
+    if os.getenv(variavel):
+        return os.getenv(variavel)
+    url = make_url(url)
+    return url.set(drivername=_DRIVERS_ASYNC.get(url.drivername, url.drivername)).render_as_string(hide_password=False)
+
+
+def _criar_engine(url: str, metricas: MetricasPool, assincrono: bool = False):
+    """
+    Cria o engine com o pool configurado pelo ambiente (ver core.pool.configuracao_pool)
+    e registra os listeners de pool que alimentam `metricas`.
+    """
+    kwargs = configuracao_pool(make_url(url))
+    if make_url(url).get_backend_name() != "sqlite":
+        kwargs["poolclass"] = classe_pool(metricas, assincrono)
+    novo = create_async_engine(url, **kwargs) if assincrono else create_engine(url, **kwargs)
+    alvo = novo.sync_engine if assincrono else novo
+
+    event.listen(alvo, "connect", lambda *_: metricas.incrementar("conexoes_criadas"))
+    event.listen(alvo, "checkout", lambda *_: metricas.incrementar("checkouts"))
+    event.listen(alvo, "checkin", lambda *_: metricas.incrementar("checkins"))
+    event.listen(alvo, "invalidate", lambda *_: metricas.incrementar("invalidacoes"))
+    metricas.engine = novo
+    return novo
+
+
+# Métricas expostas em /_internal/pool
+METRICAS_POOL = {"sync": MetricasPool("sync")}
+
+engine = _criar_engine(DATABASE_URL, METRICAS_POOL["sync"])
+async_engine = None
+if ASYNC_ATIVO:
+    METRICAS_POOL["async"] = MetricasPool("async")
+    async_engine = _criar_engine(url_async(DATABASE_URL), METRICAS_POOL["async"], assincrono=True)
+
+replica: Replica | None = None
+if DATABASE_REPLICA_URL:
+    METRICAS_POOL["replica"] = MetricasPool("replica")
+    replica_async_engine = None
+    if ASYNC_ATIVO:
+        METRICAS_POOL["replica_async"] = MetricasPool("replica_async")
+        replica_async_engine = _criar_engine(url_async(DATABASE_REPLICA_URL, "ASYNC_DATABASE_REPLICA_URL"),
+                                             METRICAS_POOL["replica_async"], assincrono=True)
+    replica = replica_do_ambiente(_criar_engine(DATABASE_REPLICA_URL, METRICAS_POOL["replica"]), replica_async_engine)
 
-def get_session() -> Generator[Session, None, None]:
+
+@event.listens_for(Engine, "connect")
+def _configurar_sqlite(dbapi_connection, connection_record):
+    # Funções usadas pelos triggers da busca FTS5 (fallback do pg_trgm no SQLite);
+    # o adaptador do aiosqlite também expõe create_function
+    if isinstance(dbapi_connection, sqlite3.Connection) or hasattr(dbapi_connection, "create_function"):
+        busca.registrar_funcoes_sqlite(dbapi_connection)
+        # As rotas dependem das FKs para responder 404 (core.integridade), como no Postgres
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+# Instrumentação de SQL por requisição (core.instrumentacao): sem amostragem, nem os listeners
+SQL_AMOSTRAGEM = instrumentacao.amostragem_do_ambiente()
+if SQL_AMOSTRAGEM > 0:
+    event.listen(Engine, "before_cursor_execute", instrumentacao.antes_de_executar)
+    event.listen(Engine, "after_cursor_execute", instrumentacao.depois_de_executar)
+
+# Lazy loads de relacionamentos: permitir, avisar (padrão) ou proibir (core.carregamento).
+# Na classe base, vale também para a sessão síncrona por trás do AsyncSession
+LAZY_LOAD = carregamento.modo_do_ambiente()
+if LAZY_LOAD != "permitir":
+    event.listen(SessionOrm, "do_orm_execute", carregamento.ouvinte(LAZY_LOAD))
+
+event.listen(SQLModel.metadata, "after_create", busca.ao_criar_tabelas)
+# Antes dos triggers: particionar recria a tabela matricula
+event.listen(SQLModel.metadata, "after_create", particoes.ao_criar_tabelas)
+event.listen(SQLModel.metadata, "after_create", estatisticas.ao_criar_tabelas)
+event.listen(SQLModel.metadata, "after_create", contagem.ao_criar_tabelas)
+
+
+def get_session(request: Request) -> Generator[Session, None, None]:
+    # GET/HEAD vão para a réplica quando ela existe e pode atender (core.replica)
+    if replica is not None and replica.escolher(request):
+        with Session(replica.engine) as session:
+            if replica.conectar(session, request):
+                yield session
+                return
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+async def get_async_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    # expire_on_commit=False: a serialização da resposta acontece fora do greenlet,
+    # então nada pode depender de recarregar atributos depois do commit
+    if replica is not None and await replica.escolher_async(request):
+        async with AsyncSession(replica.engine_async, expire_on_commit=False) as session:
+            if await replica.conectar_async(session, request):
+                yield session
+                return
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+# Dependência síncrona -> equivalente assíncrona, usada por core.roteador
+DEPENDENCIAS_ASYNC = {get_session: get_async_session}
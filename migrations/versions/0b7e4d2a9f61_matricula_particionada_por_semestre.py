@@ -0,0 +1,169 @@
+"""matricula particionada por semestre
+
+Revision ID: 0b7e4d2a9f61
+Revises: f2d6a8c41b93
+Create Date: 2026-10-18 11:40:18.731052
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b7e4d2a9f61'
+down_revision: Union[str, Sequence[str], None] = 'f2d6a8c41b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Cópia congelada do SQL de core/particoes.py (e dos triggers de matricula de
+# core/estatisticas.py e core/contagem.py) nesta revisão: a migration não importa o código
+# da aplicação (que muda depois) e roda também com `alembic upgrade --sql`
+
+_INDICES = {
+    "ix_matricula_semestre_id_aluno_disciplina_id": "(semestre, id_aluno, disciplina_id)",
+    "ix_matricula_semestre_nota_final": "(semestre, nota_final)",
+    "ix_matricula_disciplina_id": "(disciplina_id)",
+}
+
+# Uma partição por semestre já usado (AA.1/AA.2) e para o semestre atual e o seguinte
+_PARTICOES = """
+DO $$
+DECLARE
+    valor text;
+BEGIN
+    FOR valor IN
+        SELECT DISTINCT m.semestre FROM matricula_nao_particionada m WHERE m.semestre ~ '^[0-9]{2}[.][12]$'
+        UNION
+        SELECT to_char(dia, 'YY') || '.' || CASE WHEN extract(month FROM dia) <= 6 THEN '1' ELSE '2' END
+        FROM (SELECT current_date + n * interval '6 months' AS dia FROM generate_series(0, 1) n) proximos
+        ORDER BY 1
+    LOOP
+        EXECUTE format('CREATE TABLE %I PARTITION OF matricula FOR VALUES IN (%L)',
+                       'matricula_' || replace(valor, '.', '_'), valor);
+    END LOOP;
+END $$
+"""
+
+_FUNCOES_UNICA = """
+CREATE OR REPLACE FUNCTION matricula_unica() RETURNS trigger LANGUAGE plpgsql AS $$
+DECLARE
+    repetida record;
+BEGIN
+    -- Serializa até o commit quem grava matrículas do mesmo grupo de alunos: depois do lock,
+    -- a outra transação já commitou e a consulta abaixo (snapshot novo) enxerga as linhas dela
+    PERFORM pg_advisory_xact_lock(hashtext('matricula'), grupo)
+    FROM (SELECT DISTINCT mod(id_aluno, 128) AS grupo FROM novas ORDER BY 1) g;
+    SELECT n.id_aluno, n.disciplina_id INTO repetida
+    FROM novas n
+    JOIN matricula m ON m.id_aluno = n.id_aluno AND m.disciplina_id = n.disciplina_id AND m.semestre <> n.semestre
+    LIMIT 1;
+    IF FOUND THEN
+        RAISE unique_violation USING
+            MESSAGE = 'duplicate key value violates unique constraint "matricula_unica"',
+            DETAIL = 'Key (id_aluno, disciplina_id)=(' || repetida.id_aluno || ', ' || repetida.disciplina_id
+                     || ') already exists.';
+    END IF;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION matricula_unica_troca() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    -- UPDATE que troca aluno ou disciplina (raro): mesma regra, linha a linha
+    IF NEW.id_aluno = OLD.id_aluno AND NEW.disciplina_id = OLD.disciplina_id THEN
+        RETURN NEW;
+    END IF;
+    PERFORM pg_advisory_xact_lock(hashtext('matricula'), mod(NEW.id_aluno, 128));
+    IF EXISTS (SELECT 1 FROM matricula WHERE id_aluno = NEW.id_aluno AND disciplina_id = NEW.disciplina_id) THEN
+        RAISE unique_violation USING
+            MESSAGE = 'duplicate key value violates unique constraint "matricula_unica"',
+            DETAIL = 'Key (id_aluno, disciplina_id)=(' || NEW.id_aluno || ', ' || NEW.disciplina_id
+                     || ') already exists.';
+    END IF;
+    RETURN NEW;
+END $$;
+"""
+
+# Os triggers de estatísticas e contagem vão embora com a tabela antiga (as funções ficam)
+_TRIGGERS_MATRICULA = {
+    "matricula_estatisticas_ins": "AFTER INSERT ON matricula REFERENCING NEW TABLE AS novas "
+                                  "FOR EACH STATEMENT EXECUTE FUNCTION estatisticas_matricula()",
+    "matricula_estatisticas_del": "AFTER DELETE ON matricula REFERENCING OLD TABLE AS antigas "
+                                  "FOR EACH STATEMENT EXECUTE FUNCTION estatisticas_matricula()",
+    "matricula_estatisticas_upd": "AFTER UPDATE ON matricula REFERENCING OLD TABLE AS antigas NEW TABLE AS novas "
+                                  "FOR EACH STATEMENT EXECUTE FUNCTION estatisticas_matricula()",
+    "matricula_contagem_ins": "AFTER INSERT ON matricula REFERENCING NEW TABLE AS novas "
+                              "FOR EACH STATEMENT EXECUTE FUNCTION contagem_tabela()",
+    "matricula_contagem_del": "AFTER DELETE ON matricula REFERENCING OLD TABLE AS antigas "
+                              "FOR EACH STATEMENT EXECUTE FUNCTION contagem_tabela()",
+}
+
+
+def _chaves_estrangeiras_e_indices() -> None:
+    op.execute(
+        "ALTER TABLE matricula ADD CONSTRAINT matricula_id_aluno_fkey FOREIGN KEY (id_aluno) REFERENCES aluno (id)"
+    )
+    op.execute(
+        "ALTER TABLE matricula ADD CONSTRAINT matricula_disciplina_id_fkey "
+        "FOREIGN KEY (disciplina_id) REFERENCES disciplina (id)"
+    )
+    for nome, colunas in _INDICES.items():
+        op.execute(f"CREATE INDEX {nome} ON matricula {colunas}")
+
+
+def _triggers_matricula() -> None:
+    for nome, definicao in _TRIGGERS_MATRICULA.items():
+        op.execute(f"DROP TRIGGER IF EXISTS {nome} ON matricula")
+        op.execute(f"CREATE TRIGGER {nome} {definicao}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_context().dialect.name != "postgresql":
+        return
+    # Copia a tabela inteira com ela bloqueada: rodar numa janela de manutenção
+    op.execute("ALTER TABLE matricula RENAME TO matricula_nao_particionada")
+    op.execute("ALTER INDEX matricula_pkey RENAME TO matricula_nao_particionada_pkey")
+    for nome in _INDICES:
+        op.execute(f"DROP INDEX IF EXISTS {nome}")
+
+    op.execute("CREATE TABLE matricula (LIKE matricula_nao_particionada INCLUDING DEFAULTS) PARTITION BY LIST (semestre)")
+    op.execute("CREATE TABLE matricula_padrao PARTITION OF matricula DEFAULT")
+    op.execute(_PARTICOES)
+    op.execute("INSERT INTO matricula SELECT * FROM matricula_nao_particionada")
+    op.execute("DROP TABLE matricula_nao_particionada")
+
+    # PK, FKs e índices depois da carga: uma construção por partição em vez de inserção a inserção.
+    # A PK precisa conter a chave de partição: "uma matrícula por aluno e disciplina" fica com
+    # os triggers matricula_unica*
+    op.execute("ALTER TABLE matricula ADD CONSTRAINT matricula_pkey PRIMARY KEY (id_aluno, disciplina_id, semestre)")
+    _chaves_estrangeiras_e_indices()
+    op.execute(_FUNCOES_UNICA)
+    op.execute(
+        "CREATE TRIGGER matricula_unica AFTER INSERT ON matricula REFERENCING NEW TABLE AS novas "
+        "FOR EACH STATEMENT EXECUTE FUNCTION matricula_unica()"
+    )
+    op.execute(
+        "CREATE TRIGGER matricula_unica_troca BEFORE UPDATE OF id_aluno, disciplina_id ON matricula "
+        "FOR EACH ROW EXECUTE FUNCTION matricula_unica_troca()"
+    )
+    _triggers_matricula()
+    op.execute("ANALYZE matricula")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_context().dialect.name != "postgresql":
+        return
+    op.execute("CREATE TABLE matricula_nao_particionada (LIKE matricula INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO matricula_nao_particionada SELECT * FROM matricula")
+    op.execute("DROP TABLE matricula CASCADE")
+    op.execute("DROP FUNCTION IF EXISTS matricula_unica()")
+    op.execute("DROP FUNCTION IF EXISTS matricula_unica_troca()")
+    op.execute("ALTER TABLE matricula_nao_particionada RENAME TO matricula")
+    op.execute("ALTER TABLE matricula ADD CONSTRAINT matricula_pkey PRIMARY KEY (id_aluno, disciplina_id)")
+    _chaves_estrangeiras_e_indices()
+    _triggers_matricula()
@@ -0,0 +1,37 @@
+"""indices paginacao por cursor
+
+Revision ID: 5354d9e599db
+Revises: 3de7bfe848ef
+Create Date: 2026-10-17 09:12:41.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5354d9e599db'
+down_revision: Union[str, Sequence[str], None] = '3de7bfe848ef'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_aluno_nome_id', 'aluno', ['nome', 'id'], unique=False)
+    op.create_index('ix_matricula_semestre_id_aluno_disciplina_id', 'matricula', ['semestre', 'id_aluno', 'disciplina_id'], unique=False)
+    op.create_index('ix_carteiraestudantil_data_criacao_id', 'carteiraestudantil', ['data_criacao', 'id'], unique=False)
+    op.create_index('ix_professor_nome_id', 'professor', ['nome', 'id'], unique=False)
+    op.create_index('ix_disciplina_nome_id', 'disciplina', ['nome', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_disciplina_nome_id', table_name='disciplina')
+    op.drop_index('ix_professor_nome_id', table_name='professor')
+    op.drop_index('ix_carteiraestudantil_data_criacao_id', table_name='carteiraestudantil')
+    op.drop_index('ix_matricula_semestre_id_aluno_disciplina_id', table_name='matricula')
+    op.drop_index('ix_aluno_nome_id', table_name='aluno')
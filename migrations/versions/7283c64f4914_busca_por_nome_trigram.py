@@ -0,0 +1,95 @@
+"""busca por nome trigram
+
+Revision ID: 7283c64f4914
+Revises: 5354d9e599db
+Create Date: 2026-10-17 10:02:18.730415
+
+"""
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7283c64f4914'
+down_revision: Union[str, Sequence[str], None] = '5354d9e599db'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Cópia congelada de core/busca.py nesta revisão: a migration não importa o código da
+# aplicação (que muda depois) e roda também com `alembic upgrade --sql`
+_TABELAS_BUSCA = ("aluno", "professor", "disciplina", "departamento")
+
+
+def _normalizar(texto: str | None) -> str | None:
+    # Mesma normalização da função normalizar_busca que a aplicação registra no SQLite
+    if texto is None:
+        return None
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def _criar_busca_sqlite() -> None:
+    # Tabelas FTS5 com o nome normalizado e os triggers que as mantêm. A carga inicial usa
+    # normalizar_busca: registrada aqui quando conectado; um script gerado com --sql deve
+    # rodar numa conexão que já a tenha (como as da aplicação)
+    if not op.get_context().as_sql:
+        op.get_bind().connection.dbapi_connection.create_function(
+            "normalizar_busca", 1, _normalizar, deterministic=True)
+    for tabela in _TABELAS_BUSCA:
+        fts = f"{tabela}_busca"
+        op.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(nome, tokenize='trigram')")
+        op.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabela} BEGIN
+                INSERT INTO {fts}(rowid, nome) VALUES (new.id, normalizar_busca(new.nome));
+            END""")
+        op.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabela} BEGIN
+                DELETE FROM {fts} WHERE rowid = old.id;
+            END""")
+        op.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF nome ON {tabela} BEGIN
+                UPDATE {fts} SET nome = normalizar_busca(new.nome) WHERE rowid = new.id;
+            END""")
+        op.execute(f"DELETE FROM {fts}")
+        op.execute(f"INSERT INTO {fts}(rowid, nome) SELECT id, normalizar_busca(nome) FROM {tabela}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_context().dialect.name != "postgresql":
+        _criar_busca_sqlite()
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    # unaccent() não é IMMUTABLE, então não pode ir direto num índice de expressão
+    op.execute("""
+        CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+            LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+            SET search_path = public, extensions, pg_catalog
+            AS $$ SELECT unaccent('unaccent', $1) $$
+    """)
+    for tabela in _TABELAS_BUSCA:
+        op.execute(
+            f"CREATE INDEX ix_{tabela}_nome_trgm ON {tabela} "
+            f"USING gin (f_unaccent(lower(nome)) gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_context().dialect.name != "postgresql":
+        for tabela in _TABELAS_BUSCA:
+            for sufixo in ("ai", "ad", "au"):
+                op.execute(f"DROP TRIGGER IF EXISTS {tabela}_busca_{sufixo}")
+            op.execute(f"DROP TABLE IF EXISTS {tabela}_busca")
+        return
+
+    for tabela in _TABELAS_BUSCA:
+        op.execute(f"DROP INDEX IF EXISTS ix_{tabela}_nome_trgm")
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
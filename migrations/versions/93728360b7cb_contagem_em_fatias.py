@@ -0,0 +1,121 @@
+"""contagem em fatias
+
+Revision ID: 93728360b7cb
+Revises: 0b7e4d2a9f61
+Create Date: 2026-10-18 15:27:09.318640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '93728360b7cb'
+down_revision: Union[str, Sequence[str], None] = '0b7e4d2a9f61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Cópia congelada do SQL de core/contagem.py nesta revisão: a migration não importa o
+# código da aplicação (que muda depois) e roda também com `alembic upgrade --sql`.
+# O contador de cada tabela passa a ter _FATIAS linhas, somadas na leitura: no Postgres
+# cada conexão ajusta a fatia mod(pg_backend_pid(), _FATIAS)
+
+_TABELAS = ("aluno", "carteiraestudantil", "departamento", "disciplina", "matricula", "professor")
+
+_FATIAS = 16
+
+_AGORA_SQLITE = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+_FUNCAO_POSTGRES = """
+CREATE OR REPLACE FUNCTION contagem_tabela() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE contagemtabela SET total = total + (SELECT count(*) FROM novas), atualizado_em = now()
+        WHERE tabela = TG_TABLE_NAME{filtro};
+    ELSE
+        UPDATE contagemtabela SET total = total - (SELECT count(*) FROM antigas), atualizado_em = now()
+        WHERE tabela = TG_TABLE_NAME{filtro};
+    END IF;
+    RETURN NULL;
+END $$;
+"""
+
+# Fatias 1 a _FATIAS - 1 zeradas, com o atualizado_em da fatia 0
+_NOVAS_FATIAS = f"""
+WITH fatias (fatia) AS (VALUES {", ".join(f"({fatia})" for fatia in range(1, _FATIAS))})
+INSERT INTO contagemtabela (tabela, fatia, total, atualizado_em)
+SELECT c.tabela, f.fatia, 0, c.atualizado_em FROM contagemtabela c CROSS JOIN fatias f
+"""
+
+_TABELA_SQLITE = """
+CREATE TABLE {nome} (
+    tabela VARCHAR(64) NOT NULL,{fatia}
+    total INTEGER NOT NULL,
+    atualizado_em DATETIME NOT NULL,
+    PRIMARY KEY ({chave})
+)
+"""
+
+
+def _triggers_sqlite(filtro: str) -> None:
+    for tabela in _TABELAS:
+        for sufixo, evento, sinal in (("ai", "INSERT", "+"), ("ad", "DELETE", "-")):
+            op.execute(
+                f"CREATE TRIGGER {tabela}_contagem_{sufixo} AFTER {evento} ON {tabela} BEGIN "
+                f"UPDATE contagemtabela SET total = total {sinal} 1, atualizado_em = {_AGORA_SQLITE} "
+                f"WHERE tabela = '{tabela}'{filtro}; END"
+            )
+
+
+def _recriar_sqlite(fatia: str, chave: str, selecao: str) -> None:
+    # O SQLite não altera a chave primária: recria a tabela e copia os contadores. Os
+    # triggers saem antes (o RENAME confere as tabelas que eles usam) e voltam depois
+    for tabela in _TABELAS:
+        for sufixo in ("ai", "ad"):
+            op.execute(f"DROP TRIGGER IF EXISTS {tabela}_contagem_{sufixo}")
+    op.execute(_TABELA_SQLITE.format(nome="contagemtabela_nova", fatia=fatia, chave=chave))
+    op.execute(f"INSERT INTO contagemtabela_nova {selecao}")
+    op.execute("DROP TABLE contagemtabela")
+    op.execute("ALTER TABLE contagemtabela_nova RENAME TO contagemtabela")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialeto = op.get_context().dialect.name
+    if dialeto == "postgresql":
+        op.execute("ALTER TABLE contagemtabela ADD COLUMN fatia INTEGER NOT NULL DEFAULT 0")
+        op.execute("ALTER TABLE contagemtabela ALTER COLUMN fatia DROP DEFAULT")
+        op.execute("ALTER TABLE contagemtabela DROP CONSTRAINT contagemtabela_pkey")
+        op.execute("ALTER TABLE contagemtabela ADD PRIMARY KEY (tabela, fatia)")
+        op.execute(_FUNCAO_POSTGRES.format(filtro=f" AND fatia = mod(pg_backend_pid(), {_FATIAS})"))
+    elif dialeto == "sqlite":
+        _recriar_sqlite("\n    fatia INTEGER NOT NULL,", "tabela, fatia",
+                        "SELECT tabela, 0, total, atualizado_em FROM contagemtabela")
+        _triggers_sqlite(" AND fatia = 0")
+    else:
+        return
+    op.execute(_NOVAS_FATIAS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialeto = op.get_context().dialect.name
+    if dialeto == "postgresql":
+        op.execute("""
+            UPDATE contagemtabela c SET total = s.total, atualizado_em = s.atualizado_em
+            FROM (SELECT tabela, sum(total) AS total, max(atualizado_em) AS atualizado_em
+                  FROM contagemtabela GROUP BY tabela) s
+            WHERE c.tabela = s.tabela AND c.fatia = 0
+        """)
+        op.execute("DELETE FROM contagemtabela WHERE fatia <> 0")
+        op.execute("ALTER TABLE contagemtabela DROP CONSTRAINT contagemtabela_pkey")
+        op.execute("ALTER TABLE contagemtabela DROP COLUMN fatia")
+        op.execute("ALTER TABLE contagemtabela ADD PRIMARY KEY (tabela)")
+        op.execute(_FUNCAO_POSTGRES.format(filtro=""))
+    elif dialeto == "sqlite":
+        _recriar_sqlite("", "tabela", "SELECT tabela, sum(total), max(atualizado_em) FROM contagemtabela GROUP BY tabela")
+        _triggers_sqlite("")
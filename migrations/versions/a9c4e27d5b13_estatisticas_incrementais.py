@@ -0,0 +1,219 @@
+"""estatisticas incrementais
+
+Revision ID: a9c4e27d5b13
+Revises: 1f0bff5111ef
+Create Date: 2026-10-17 14:05:41.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c4e27d5b13'
+down_revision: Union[str, Sequence[str], None] = '1f0bff5111ef'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Cópia congelada do SQL de core/estatisticas.py nesta revisão: a migration não importa o
+# código da aplicação (que muda depois) e roda também com `alembic upgrade --sql`
+
+_FUNCOES_POSTGRES = """
+CREATE OR REPLACE FUNCTION estatisticas_matricula() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    -- UPDATE que não mexe em nota nem em disciplina (ex.: só numero_faltas) não altera o resumo
+    -- (IFs aninhados: antigas/novas só existem no trigger de UPDATE)
+    IF TG_OP = 'UPDATE' THEN
+        IF NOT EXISTS (
+            SELECT 1 FROM antigas a FULL JOIN novas n USING (id_aluno, disciplina_id)
+            WHERE a.id_aluno IS NULL OR n.id_aluno IS NULL OR a.nota_final IS DISTINCT FROM n.nota_final
+        ) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+    IF TG_OP <> 'INSERT' THEN
+        UPDATE estatisticadisciplina e
+        SET total_alunos = e.total_alunos - d.alunos,
+            total_avaliados = e.total_avaliados - d.avaliados,
+            soma_notas = e.soma_notas - d.soma,
+            atualizado_em = now()
+        FROM (SELECT disciplina_id, count(*) AS alunos, count(nota_final) AS avaliados,
+                     coalesce(sum(nota_final), 0) AS soma
+              FROM antigas GROUP BY disciplina_id) d
+        WHERE e.disciplina_id = d.disciplina_id;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        UPDATE estatisticadisciplina e
+        SET total_alunos = e.total_alunos + d.alunos,
+            total_avaliados = e.total_avaliados + d.avaliados,
+            soma_notas = e.soma_notas + d.soma,
+            atualizado_em = now()
+        FROM (SELECT disciplina_id, count(*) AS alunos, count(nota_final) AS avaliados,
+                     coalesce(sum(nota_final), 0) AS soma
+              FROM novas GROUP BY disciplina_id) d
+        WHERE e.disciplina_id = d.disciplina_id;
+    END IF;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION estatisticas_professor() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        UPDATE estatisticadepartamento SET total_professores = total_professores - 1, atualizado_em = now()
+        WHERE departamento_id = OLD.id_departamento;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        UPDATE estatisticadepartamento SET total_professores = total_professores + 1, atualizado_em = now()
+        WHERE departamento_id = NEW.id_departamento;
+    END IF;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION estatisticas_entidade() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    -- disciplina/departamento: cria ou remove a linha-resumo correspondente
+    IF TG_TABLE_NAME = 'disciplina' THEN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO estatisticadisciplina (disciplina_id, total_alunos, total_avaliados, soma_notas, atualizado_em)
+            VALUES (NEW.id, 0, 0, 0, now()) ON CONFLICT DO NOTHING;
+        ELSE
+            DELETE FROM estatisticadisciplina WHERE disciplina_id = OLD.id;
+        END IF;
+    ELSE
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO estatisticadepartamento (departamento_id, total_professores, atualizado_em)
+            VALUES (NEW.id, 0, now()) ON CONFLICT DO NOTHING;
+        ELSE
+            DELETE FROM estatisticadepartamento WHERE departamento_id = OLD.id;
+        END IF;
+    END IF;
+    RETURN NULL;
+END $$;
+"""
+
+# nome -> (tabela, definição) dos triggers do Postgres
+_TRIGGERS_POSTGRES = {
+    "matricula_estatisticas_ins": ("matricula", "AFTER INSERT ON matricula REFERENCING NEW TABLE AS novas "
+                                                "FOR EACH STATEMENT EXECUTE FUNCTION estatisticas_matricula()"),
+    "matricula_estatisticas_del": ("matricula", "AFTER DELETE ON matricula REFERENCING OLD TABLE AS antigas "
+                                                "FOR EACH STATEMENT EXECUTE FUNCTION estatisticas_matricula()"),
+    "matricula_estatisticas_upd": ("matricula", "AFTER UPDATE ON matricula "
+                                                "REFERENCING OLD TABLE AS antigas NEW TABLE AS novas "
+                                                "FOR EACH STATEMENT EXECUTE FUNCTION estatisticas_matricula()"),
+    "professor_estatisticas": ("professor", "AFTER INSERT OR DELETE OR UPDATE OF id_departamento ON professor "
+                                            "FOR EACH ROW EXECUTE FUNCTION estatisticas_professor()"),
+    "disciplina_estatisticas": ("disciplina", "AFTER INSERT OR DELETE ON disciplina "
+                                              "FOR EACH ROW EXECUTE FUNCTION estatisticas_entidade()"),
+    "departamento_estatisticas": ("departamento", "AFTER INSERT OR DELETE ON departamento "
+                                                  "FOR EACH ROW EXECUTE FUNCTION estatisticas_entidade()"),
+}
+_FUNCOES = ("estatisticas_matricula", "estatisticas_professor", "estatisticas_entidade")
+
+_AGORA_SQLITE = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def _ajuste_matricula(linha: str, sinal: str) -> str:
+    return f"""
+        UPDATE estatisticadisciplina SET
+            total_alunos = total_alunos {sinal} 1,
+            total_avaliados = total_avaliados {sinal} ({linha}.nota_final IS NOT NULL),
+            soma_notas = soma_notas {sinal} coalesce({linha}.nota_final, 0),
+            atualizado_em = {_AGORA_SQLITE}
+        WHERE disciplina_id = {linha}.disciplina_id;"""
+
+
+def _ajuste_professor(linha: str, sinal: str) -> str:
+    return f"""
+        UPDATE estatisticadepartamento SET
+            total_professores = total_professores {sinal} 1, atualizado_em = {_AGORA_SQLITE}
+        WHERE departamento_id = {linha}.id_departamento;"""
+
+
+_TRIGGERS_SQLITE = {
+    "matricula_estatisticas_ai": ("AFTER INSERT ON matricula", _ajuste_matricula("new", "+")),
+    "matricula_estatisticas_ad": ("AFTER DELETE ON matricula", _ajuste_matricula("old", "-")),
+    "matricula_estatisticas_au": ("AFTER UPDATE OF nota_final, disciplina_id ON matricula",
+                                  _ajuste_matricula("old", "-") + _ajuste_matricula("new", "+")),
+    "professor_estatisticas_ai": ("AFTER INSERT ON professor", _ajuste_professor("new", "+")),
+    "professor_estatisticas_ad": ("AFTER DELETE ON professor", _ajuste_professor("old", "-")),
+    "professor_estatisticas_au": ("AFTER UPDATE OF id_departamento ON professor",
+                                  _ajuste_professor("old", "-") + _ajuste_professor("new", "+")),
+    "disciplina_estatisticas_ai": ("AFTER INSERT ON disciplina", f"""
+        INSERT OR IGNORE INTO estatisticadisciplina
+            (disciplina_id, total_alunos, total_avaliados, soma_notas, atualizado_em)
+        VALUES (new.id, 0, 0, 0, {_AGORA_SQLITE});"""),
+    "disciplina_estatisticas_ad": ("AFTER DELETE ON disciplina",
+                                   "DELETE FROM estatisticadisciplina WHERE disciplina_id = old.id;"),
+    "departamento_estatisticas_ai": ("AFTER INSERT ON departamento", f"""
+        INSERT OR IGNORE INTO estatisticadepartamento (departamento_id, total_professores, atualizado_em)
+        VALUES (new.id, 0, {_AGORA_SQLITE});"""),
+    "departamento_estatisticas_ad": ("AFTER DELETE ON departamento",
+                                     "DELETE FROM estatisticadepartamento WHERE departamento_id = old.id;"),
+}
+
+
+def _reconstruir(agora: str) -> None:
+    # Resumo inicial com GROUP BY sobre os dados existentes
+    op.execute(f"""
+        INSERT INTO estatisticadisciplina (disciplina_id, total_alunos, total_avaliados, soma_notas, atualizado_em)
+        SELECT disciplina.id, count(matricula.id_aluno), count(matricula.nota_final),
+               coalesce(sum(matricula.nota_final), 0), {agora}
+        FROM disciplina LEFT OUTER JOIN matricula ON disciplina.id = matricula.disciplina_id
+        GROUP BY disciplina.id
+    """)
+    op.execute(f"""
+        INSERT INTO estatisticadepartamento (departamento_id, total_professores, atualizado_em)
+        SELECT departamento.id, count(professor.id), {agora}
+        FROM departamento LEFT OUTER JOIN professor ON departamento.id = professor.id_departamento
+        GROUP BY departamento.id
+    """)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('estatisticadisciplina',
+    sa.Column('disciplina_id', sa.Integer(), nullable=False),
+    sa.Column('total_alunos', sa.Integer(), nullable=False),
+    sa.Column('total_avaliados', sa.Integer(), nullable=False),
+    sa.Column('soma_notas', sa.Float(), nullable=False),
+    sa.Column('atualizado_em', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('disciplina_id')
+    )
+    op.create_table('estatisticadepartamento',
+    sa.Column('departamento_id', sa.Integer(), nullable=False),
+    sa.Column('total_professores', sa.Integer(), nullable=False),
+    sa.Column('atualizado_em', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('departamento_id')
+    )
+
+    dialeto = op.get_context().dialect.name
+    if dialeto == "postgresql":
+        op.execute(_FUNCOES_POSTGRES)
+        for nome, (tabela, definicao) in _TRIGGERS_POSTGRES.items():
+            op.execute(f"DROP TRIGGER IF EXISTS {nome} ON {tabela}")
+            op.execute(f"CREATE TRIGGER {nome} {definicao}")
+        _reconstruir("now()")
+    elif dialeto == "sqlite":
+        for nome, (evento, corpo) in _TRIGGERS_SQLITE.items():
+            op.execute(f"DROP TRIGGER IF EXISTS {nome}")
+            op.execute(f"CREATE TRIGGER {nome} {evento} BEGIN {corpo} END")
+        _reconstruir(_AGORA_SQLITE)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialeto = op.get_context().dialect.name
+    if dialeto == "postgresql":
+        for nome, (tabela, _) in _TRIGGERS_POSTGRES.items():
+            op.execute(f"DROP TRIGGER IF EXISTS {nome} ON {tabela}")
+        for funcao in _FUNCOES:
+            op.execute(f"DROP FUNCTION IF EXISTS {funcao}()")
+    elif dialeto == "sqlite":
+        for nome in _TRIGGERS_SQLITE:
+            op.execute(f"DROP TRIGGER IF EXISTS {nome}")
+    op.drop_table('estatisticadepartamento')
+    op.drop_table('estatisticadisciplina')
@@ -0,0 +1,35 @@
+"""versao das linhas (atualizado_em)
+
+Revision ID: c71d0e4a2f86
+Revises: a9c4e27d5b13
+Create Date: 2026-10-17 16:22:09.514382
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71d0e4a2f86'
+down_revision: Union[str, Sequence[str], None] = 'a9c4e27d5b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABELAS = ('aluno', 'carteiraestudantil', 'departamento', 'professor', 'disciplina', 'matricula')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Linhas existentes recebem o momento da migration pelo server_default
+    for tabela in TABELAS:
+        op.add_column(tabela, sa.Column('atualizado_em', sa.DateTime(timezone=True), nullable=False,
+                                        server_default=sa.text('CURRENT_TIMESTAMP')))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for tabela in reversed(TABELAS):
+        op.drop_column(tabela, 'atualizado_em')
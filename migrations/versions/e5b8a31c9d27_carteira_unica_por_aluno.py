@@ -0,0 +1,32 @@
+"""carteira unica por aluno
+
+Revision ID: e5b8a31c9d27
+Revises: c71d0e4a2f86
+Create Date: 2026-10-18 00:21:47.930215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b8a31c9d27'
+down_revision: Union[str, Sequence[str], None] = 'c71d0e4a2f86'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # O índice de FK vira único: a regra "uma carteira por aluno" passa a ser do banco
+    op.drop_index(op.f('ix_carteiraestudantil_id_aluno'), table_name='carteiraestudantil')
+    op.create_index(op.f('ix_carteiraestudantil_id_aluno'), 'carteiraestudantil', ['id_aluno'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_carteiraestudantil_id_aluno'), table_name='carteiraestudantil')
+    op.create_index(op.f('ix_carteiraestudantil_id_aluno'), 'carteiraestudantil', ['id_aluno'], unique=False)
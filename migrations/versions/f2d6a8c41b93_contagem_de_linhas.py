@@ -0,0 +1,96 @@
+"""contagem de linhas
+
+Revision ID: f2d6a8c41b93
+Revises: e5b8a31c9d27
+Create Date: 2026-10-18 09:12:36.504218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2d6a8c41b93'
+down_revision: Union[str, Sequence[str], None] = 'e5b8a31c9d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Cópia congelada do SQL de core/contagem.py nesta revisão: a migration não importa o
+# código da aplicação (que muda depois) e roda também com `alembic upgrade --sql`
+
+_TABELAS = ("aluno", "carteiraestudantil", "departamento", "disciplina", "matricula", "professor")
+
+_AGORA_SQLITE = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+_FUNCAO_POSTGRES = """
+CREATE OR REPLACE FUNCTION contagem_tabela() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE contagemtabela SET total = total + (SELECT count(*) FROM novas), atualizado_em = now()
+        WHERE tabela = TG_TABLE_NAME;
+    ELSE
+        UPDATE contagemtabela SET total = total - (SELECT count(*) FROM antigas), atualizado_em = now()
+        WHERE tabela = TG_TABLE_NAME;
+    END IF;
+    RETURN NULL;
+END $$;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('contagemtabela',
+    sa.Column('tabela', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('atualizado_em', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('tabela')
+    )
+
+    dialeto = op.get_context().dialect.name
+    if dialeto == "postgresql":
+        op.execute(_FUNCAO_POSTGRES)
+        for tabela in _TABELAS:
+            for sufixo, definicao in (("ins", f"INSERT ON {tabela} REFERENCING NEW TABLE AS novas"),
+                                      ("del", f"DELETE ON {tabela} REFERENCING OLD TABLE AS antigas")):
+                op.execute(f"DROP TRIGGER IF EXISTS {tabela}_contagem_{sufixo} ON {tabela}")
+                op.execute(
+                    f"CREATE TRIGGER {tabela}_contagem_{sufixo} AFTER {definicao} "
+                    f"FOR EACH STATEMENT EXECUTE FUNCTION contagem_tabela()"
+                )
+    elif dialeto == "sqlite":
+        for tabela in _TABELAS:
+            for sufixo, evento, sinal in (("ai", "INSERT", "+"), ("ad", "DELETE", "-")):
+                op.execute(f"DROP TRIGGER IF EXISTS {tabela}_contagem_{sufixo}")
+                op.execute(
+                    f"CREATE TRIGGER {tabela}_contagem_{sufixo} AFTER {evento} ON {tabela} BEGIN "
+                    f"UPDATE contagemtabela SET total = total {sinal} 1, atualizado_em = {_AGORA_SQLITE} "
+                    f"WHERE tabela = '{tabela}'; END"
+                )
+    else:
+        return
+
+    # Contadores iniciais com count(*)
+    agora = "now()" if dialeto == "postgresql" else _AGORA_SQLITE
+    for tabela in _TABELAS:
+        op.execute(
+            f"INSERT INTO contagemtabela (tabela, total, atualizado_em) SELECT '{tabela}', count(*), {agora} FROM {tabela}"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialeto = op.get_context().dialect.name
+    if dialeto == "postgresql":
+        for tabela in _TABELAS:
+            for sufixo in ("ins", "del"):
+                op.execute(f"DROP TRIGGER IF EXISTS {tabela}_contagem_{sufixo} ON {tabela}")
+        op.execute("DROP FUNCTION IF EXISTS contagem_tabela()")
+    elif dialeto == "sqlite":
+        for tabela in _TABELAS:
+            for sufixo in ("ai", "ad"):
+                op.execute(f"DROP TRIGGER IF EXISTS {tabela}_contagem_{sufixo}")
+    op.drop_table('contagemtabela')
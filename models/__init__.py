@@ -3,4 +3,5 @@ from .carteira_estudantil import CarteiraEstudantil
 from .departamento import Departamento
 from .disciplina import Disciplina
 from .matricula import Matricula
-from .professor import Professor
\ No newline at end of file
+from .professor import Professor
+from .estatisticas import ContagemTabela, EstatisticaDepartamento, EstatisticaDisciplina
\ No newline at end of file
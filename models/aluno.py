@@ -1,7 +1,9 @@
 from sqlmodel import SQLModel, Field, Relationship
-from datetime import date
+from sqlalchemy import Index
+from datetime import date, datetime
 from typing import TYPE_CHECKING
 
+from .comum import campo_atualizado_em
 from .carteira_estudantil import CarteiraEstudantil, CarteiraEstudantilBase
 from .matricula import Matricula
 
@@ -13,12 +15,17 @@ class AlunoBase(SQLModel):
     id: int | None = Field(default=None, primary_key=True)
     nome: str
     cpf: str = Field(unique=True, max_length=14)
-    data_nascimento: date
+    data_nascimento: date = Field(index=True)
     numero_matricula: int
     email: str
 
 
 class Aluno(AlunoBase, table=True):
+    # Índice da paginação por cursor ordenada por nome
+    __table_args__ = (Index("ix_aluno_nome_id", "nome", "id"),)
+
+    atualizado_em: datetime = campo_atualizado_em()
+
     carteira: "CarteiraEstudantil" = Relationship(
         back_populates="aluno",
         sa_relationship_kwargs={"uselist": False, "cascade": "all, delete-orphan"}
@@ -36,4 +43,41 @@ class Aluno(AlunoBase, table=True):
 
 
 class AlunoWithCarteira(AlunoBase):
-    carteira: CarteiraEstudantilBase | None = None
\ No newline at end of file
+    carteira: CarteiraEstudantilBase | None = None
+
+class ErroImportacao(SQLModel):
+    linha: int
+    cpf: str | None = None
+    motivo: str
+
+
+class ResultadoImportacao(SQLModel):
+    inseridos: int = 0
+    ignorados: int = 0
+    falhas: int = 0
+    erros: list[ErroImportacao] = []
+    erros_truncados: bool = False
+
+
+class DisciplinaHistorico(SQLModel):
+    disciplina_id: int
+    nome: str
+    carga_horaria: int
+    nota_final: float | None = None
+    numero_faltas: int = 0
+
+
+class SemestreHistorico(SQLModel):
+    semestre: str
+    disciplinas: list[DisciplinaHistorico] = []
+    carga_horaria: int = 0
+    # Médias das notas ponderadas pela carga horária (só disciplinas com nota)
+    coeficiente: float | None = None
+    coeficiente_acumulado: float | None = None
+
+
+class HistoricoAluno(SQLModel):
+    id_aluno: int
+    semestres: list[SemestreHistorico] = []
+    carga_horaria_total: int = 0
+    coeficiente_rendimento: float | None = None
@@ -1,7 +1,10 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from datetime import datetime, timezone
 from typing import TYPE_CHECKING
 
+from .comum import campo_atualizado_em
+
 if TYPE_CHECKING:
     from .aluno import Aluno, AlunoBase
 
@@ -13,8 +16,16 @@ class CarteiraEstudantilBase(SQLModel):
     numero_de_registro: str = Field(unique=True, max_length=10)
 
 class CarteiraEstudantil(CarteiraEstudantilBase, table=True):
-    id_aluno: int = Field(foreign_key="aluno.id")
+    # Índice da paginação por cursor (data_criacao DESC + PK)
+    __table_args__ = (Index("ix_carteiraestudantil_data_criacao_id", "data_criacao", "id"),)
+
+    # Uma carteira por aluno (garantido pelo banco, ver create_carteira)
+    id_aluno: int = Field(foreign_key="aluno.id", index=True, unique=True)
+    atualizado_em: datetime = campo_atualizado_em()
     aluno: "Aluno" = Relationship(back_populates="carteira")
 
+class CarteiraEstudantilPublic(CarteiraEstudantilBase):
+    id_aluno: int
+
 class CarteiraWithAluno(CarteiraEstudantilBase):
     aluno: "AlunoBase"
\ No newline at end of file
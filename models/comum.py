@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime, text
+from sqlmodel import Field, SQLModel
+
+
+def agora_utc() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def campo_atualizado_em():
+    """
+    Coluna de versão da linha: preenchida na criação e renovada pelo SQLAlchemy a cada
+    UPDATE (ORM ou Core). É a base do ETag/Last-Modified das rotas GET.
+    """
+    return Field(
+        default_factory=agora_utc,
+        sa_type=DateTime(timezone=True),
+        sa_column_kwargs={"server_default": text("CURRENT_TIMESTAMP"), "onupdate": agora_utc},
+    )
+
+
+class ResultadoUpsert(SQLModel):
+    recebidos: int
+    # Inseridos ou alterados; os demais já estavam iguais no banco
+    gravados: int
@@ -1,6 +1,9 @@
 from sqlmodel import SQLModel, Field, Relationship
+from datetime import datetime
 from typing import TYPE_CHECKING
 
+from .comum import campo_atualizado_em
+
 if TYPE_CHECKING:
     from .professor import Professor
     from .disciplina import Disciplina
@@ -11,6 +14,8 @@ class DepartamentoBase(SQLModel):
     codigo_departamento: str = Field(unique=True, max_length=5, index=True)
 
 class Departamento(DepartamentoBase, table=True):
+    atualizado_em: datetime = campo_atualizado_em()
+
     professores_departamento: list["Professor"] = Relationship(back_populates="departamento")
     disciplinas_departamento: list["Disciplina"] = Relationship(back_populates="departamento")
 
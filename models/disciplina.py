@@ -1,6 +1,9 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
+from datetime import datetime
 from typing import TYPE_CHECKING
 
+from .comum import campo_atualizado_em
 from .departamento import Departamento, DepartamentoBase
 from .professor import Professor, ProfessorBase
 
@@ -19,8 +22,12 @@ class DisciplinaBase(SQLModel):
 
 
 class Disciplina(DisciplinaBase, table=True):
-    id_professor: int | None = Field(default=None, foreign_key="professor.id")
-    departamento_disciplina_cod: str | None = Field(default=None, foreign_key="departamento.codigo_departamento")
+    # Índice da paginação por cursor ordenada por nome
+    __table_args__ = (Index("ix_disciplina_nome_id", "nome", "id"),)
+
+    id_professor: int | None = Field(default=None, foreign_key="professor.id", index=True)
+    departamento_disciplina_cod: str | None = Field(default=None, foreign_key="departamento.codigo_departamento", index=True)
+    atualizado_em: datetime = campo_atualizado_em()
 
     professor_disciplina: "Professor" = Relationship(back_populates="disciplinas_ministradas")
     departamento: "Departamento" = Relationship(back_populates="disciplinas_departamento")
@@ -33,5 +40,10 @@ class Disciplina(DisciplinaBase, table=True):
     )
 
 
+class DisciplinaPublic(DisciplinaBase):
+    id_professor: int | None = None
+    departamento_disciplina_cod: str | None = None
+
+
 class DisciplinaWithProfessor(DisciplinaBase):
     professor_disciplina: ProfessorBase | None = None
\ No newline at end of file
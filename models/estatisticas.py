@@ -0,0 +1,31 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import DateTime
+from datetime import datetime, timezone
+
+
+# Tabelas-resumo mantidas por triggers (ver core/estatisticas.py); não são escritas pela API
+
+class EstatisticaDisciplina(SQLModel, table=True):
+    disciplina_id: int = Field(primary_key=True)
+    total_alunos: int = Field(default=0)
+    total_avaliados: int = Field(default=0)
+    soma_notas: float = Field(default=0.0)
+    atualizado_em: datetime = Field(default_factory=lambda: datetime.now(timezone.utc),
+                                    sa_type=DateTime(timezone=True))
+
+
+class EstatisticaDepartamento(SQLModel, table=True):
+    departamento_id: int = Field(primary_key=True)
+    total_professores: int = Field(default=0)
+    atualizado_em: datetime = Field(default_factory=lambda: datetime.now(timezone.utc),
+                                    sa_type=DateTime(timezone=True))
+
+
+class ContagemTabela(SQLModel, table=True):
+    # Total de linhas por tabela, em fatias somadas na leitura (ver core/contagem.py):
+    # X-Total-Count e /stats/contagem
+    tabela: str = Field(primary_key=True, max_length=64)
+    fatia: int = Field(default=0, primary_key=True)
+    total: int = Field(default=0)
+    atualizado_em: datetime = Field(default_factory=lambda: datetime.now(timezone.utc),
+                                    sa_type=DateTime(timezone=True))
@@ -1,6 +1,10 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
+from datetime import datetime
 from typing import TYPE_CHECKING
 
+from .comum import campo_atualizado_em
+
 if TYPE_CHECKING:
     from .aluno import Aluno
     from .disciplina import Disciplina
@@ -11,8 +15,64 @@ class MatriculaBase(SQLModel):
     semestre: str = Field(max_length=4)
 
 class Matricula(MatriculaBase, table=True):
+    __table_args__ = (
+        # Índice da paginação por cursor (semestre DESC + PK), percorrido de trás para frente
+        Index("ix_matricula_semestre_id_aluno_disciplina_id", "semestre", "id_aluno", "disciplina_id"),
+        # Filtro semestre + nota_minima de list_matriculas
+        Index("ix_matricula_semestre_nota_final", "semestre", "nota_final"),
+    )
+
     id_aluno: int | None = Field(default=None, foreign_key="aluno.id", primary_key=True)
-    disciplina_id: int | None = Field(default=None, foreign_key="disciplina.id", primary_key=True)
+    disciplina_id: int | None = Field(default=None, foreign_key="disciplina.id", primary_key=True, index=True)
+    atualizado_em: datetime = campo_atualizado_em()
 
     aluno: "Aluno" = Relationship(back_populates="matriculas_detalhes")
-    disciplina: "Disciplina" = Relationship(back_populates="matriculas")
\ No newline at end of file
+    disciplina: "Disciplina" = Relationship(back_populates="matriculas")
+
+class MatriculaPublic(MatriculaBase):
+    id_aluno: int
+    disciplina_id: int
+
+
+class MatriculaEmLote(SQLModel):
+    ids_alunos: list[int] = Field(min_length=1, max_length=10_000)
+    semestre: str = Field(max_length=4)
+
+
+class ResultadoMatriculaEmLote(SQLModel):
+    matriculados: list[int] = []
+    ja_matriculados: list[int] = []
+    desconhecidos: list[int] = []
+
+
+class NotaEmLote(SQLModel):
+    id_aluno: int
+    # None mantém o valor atual, como no PATCH de uma matrícula
+    nota_final: float | None = None
+    numero_faltas: int | None = None
+
+
+class ResultadoNotasEmLote(SQLModel):
+    atualizados: list[int] = []
+    nao_matriculados: list[int] = []
+
+
+class IncrementoFaltas(SQLModel):
+    id_aluno: int
+    disciplina_id: int
+    # Negativo para abonar faltas
+    delta: int = Field(default=1, ge=-100, le=100)
+
+
+class ChaveMatricula(SQLModel):
+    id_aluno: int
+    disciplina_id: int
+
+
+class ResultadoFaltas(SQLModel):
+    recebidos: int
+    # Escrita direta: matrículas alteradas e as que não existem
+    aplicados: int = 0
+    nao_matriculados: list[ChaveMatricula] = []
+    # Escrita adiada: chaves pendentes no buffer após esta requisição
+    enfileirados: int = 0
@@ -1,5 +1,8 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
+from datetime import datetime
 from typing import TYPE_CHECKING
+from .comum import campo_atualizado_em
 from .departamento import Departamento, DepartamentoBase
 
 if TYPE_CHECKING:
@@ -13,11 +16,19 @@ class ProfessorBase(SQLModel):
 
 
 class Professor(ProfessorBase, table=True):
-    id_departamento: int = Field(foreign_key="departamento.id")
+    # Índice da paginação por cursor ordenada por nome
+    __table_args__ = (Index("ix_professor_nome_id", "nome", "id"),)
+
+    id_departamento: int = Field(foreign_key="departamento.id", index=True)
+    atualizado_em: datetime = campo_atualizado_em()
 
     departamento: "Departamento" = Relationship(back_populates="professores_departamento")
     disciplinas_ministradas: list["Disciplina"] = Relationship(back_populates="professor_disciplina")
 
 
+class ProfessorPublic(ProfessorBase):
+    id_departamento: int
+
+
 class ProfessorWithDepartamento(ProfessorBase):
     departamento: DepartamentoBase
\ No newline at end of file
@@ -1,134 +1,366 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, status
-from sqlmodel import Session, select, func, col
+from fastapi import HTTPException, Body, Depends, Path, Query, Request, Response, status
+from pydantic import ValidationError
+from sqlmodel import Session, select, func
+from sqlalchemy import case
 from sqlalchemy.orm import joinedload, selectinload
 
 from database import get_session
-from models.aluno import Aluno, AlunoBase, AlunoWithCarteira
+from core.roteador import RoteadorSessao, executar_em_sessao
+from core.contagem import DESCRICAO_CONTAGEM, ModoContagem, informar_total, total_da_tabela
+from core.estatisticas import informar_atualizacao
+from core.paginacao import paginar, fatiar_pagina, validar_cursor_relevancia
+from core.busca import filtrar_por_nome
+from core.cache import cache, tag
+from core.inclusao import Colecao, Incluidas, Inclusoes, Relacao
+from core.filtros import ANO_MAXIMO, IDADE_MAXIMA, intervalo_nascimento
+from core.dml import atualizar, inserir, insert, upsert
+from core.integridade import traduzir_violacoes
+from core.importacao import detectar_formato, registros
+from models.carteira_estudantil import CarteiraEstudantilBase
+from models.aluno import (
+    Aluno, AlunoBase, DisciplinaHistorico, ErroImportacao, HistoricoAluno, ResultadoImportacao, SemestreHistorico
+)
 from models.matricula import Matricula
-from models.disciplina import Disciplina
+from models.disciplina import Disciplina, DisciplinaBase
+from models.comum import ResultadoUpsert
 
-router = APIRouter(
+router = RoteadorSessao(
     prefix="/alunos",
     tags=["Alunos"],
 )
 
+TAMANHO_LOTE_IMPORTACAO = 1_000
+# Acima disso a resposta só conta os erros, para não crescer com o tamanho do arquivo
+LIMITE_ERROS_IMPORTACAO = 1_000
+# Linhas por chamada de PUT /alunos/por-cpf (uma única instrução INSERT)
+LIMITE_UPSERT = 1_000
+_UNICAS = {"cpf": "CPF já cadastrado."}
+
+
+INCLUSOES = Inclusoes(
+    Aluno, "aluno", AlunoBase,
+    carteira=Relacao(joinedload(Aluno.carteira), CarteiraEstudantilBase | None, "carteira"),
+    disciplinas=Relacao(
+        Colecao(Disciplina, Matricula.id_aluno, [Disciplina.nome, Disciplina.id],
+                (Matricula, Matricula.disciplina_id == Disciplina.id)),
+        list[DisciplinaBase], "disciplina"),
+)
+
 
-@router.get("/{aluno_id}", response_model=AlunoWithCarteira)
-def read_aluno(aluno_id: int, session: Session = Depends(get_session)):
+@router.get("/{aluno_id}", response_model=INCLUSOES.completo)
+def read_aluno(
+        aluno_id: int,
+        request: Request,
+        incluir: Incluidas = Depends(INCLUSOES.dependencia),
+        session: Session = Depends(get_session)
+):
     """
+    Aluno por id; carteira e disciplinas só com `include`.
     """
-    statement = (
-        select(Aluno)
-        .where(Aluno.id == aluno_id)
-        .options(
-            joinedload(Aluno.carteira),
-            selectinload(Aluno.disciplinas)
-        )
-    )
-    aluno = session.exec(statement).unique().first()
+    return INCLUSOES.ler_por_id(session, request, aluno_id, incluir, "Aluno não encontrado")
 
-    if not aluno:
-        raise HTTPException(status_code=404, detail="Aluno não encontrado")
-    return aluno
 
-
-@router.get("/", response_model=list[AlunoWithCarteira])  # Usando list nativo
+@router.get("/", response_model=list[INCLUSOES.completo])  # Usando list nativo
 def read_alunos(
+        request: Request,
+        response: Response,
         offset: int = 0,
-        limit: int = Query(default=10, le=100),
-        nome: str | None = Query(None, description="Filtrar por nome parcial (Case insensitive)"),
-        ano_nascimento: int | None = Query(None, description="Filtrar por ano de nascimento"),
+        limit: int = Query(default=10, ge=1, le=100),
+        cursor: str | None = Query(None, description="Cursor opaco retornado em X-Next-Cursor"),
+        count: ModoContagem | None = Query(None, description=DESCRICAO_CONTAGEM),
+        nome: str | None = Query(None, description="Filtrar por nome parcial (ignora acentos e caixa)"),
+        ano_nascimento: int | None = Query(None, ge=1, le=ANO_MAXIMO, description="Filtrar por ano de nascimento"),
+        nascido_entre: str | None = Query(None, description="Intervalo de nascimento 'AAAA-MM-DD,AAAA-MM-DD' (inclusivo)"),
+        idade_minima: int | None = Query(None, ge=0, le=IDADE_MAXIMA, description="Idade mínima em anos completos"),
+        idade_maxima: int | None = Query(None, ge=0, le=IDADE_MAXIMA, description="Idade máxima em anos completos"),
         ordenar_por_nome: bool = Query(False, description="Ordenar alfabeticamente por nome"),
+        ordenar_por_relevancia: bool = Query(False, description="Com `nome`, ordena pelos mais parecidos (só offset)"),
+        incluir: Incluidas = Depends(INCLUSOES.dependencia),
         session: Session = Depends(get_session)
 ):
     """
-    Lista alunos com paginação e filtros.
-    Traz Carteira e Disciplinas carregadas (Eager Loading).
+    Lista alunos com paginação (offset ou cursor) e filtros.
+    Carteira e Disciplinas só são carregadas (Eager Loading) se pedidas em `include`.
     """
-    statement = select(Aluno).options(
-        joinedload(Aluno.carteira),
-        selectinload(Aluno.disciplinas)
-    )
+    statement = select(Aluno).options(*INCLUSOES.opcoes(incluir))
 
-    # Busca por texto parcial
+    # Busca por texto parcial (índice trigram / FTS5)
+    relevancia = bool(nome) and ordenar_por_relevancia
+    validar_cursor_relevancia(cursor, relevancia)
     if nome:
-        statement = statement.where(col(Aluno.nome).contains(nome))
+        statement = filtrar_por_nome(statement, Aluno.nome, nome, session, ordenar_por_relevancia)
 
-    #  Filtro por Ano (Extraindo ano da data de nascimento)
-    if ano_nascimento:
-        # strftime funciona bem no SQLite para extrair o ano
-        statement = statement.where(func.extract('year', Aluno.data_nascimento) == ano_nascimento)
-    #  Ordenação
-    if ordenar_por_nome:
-        statement = statement.order_by(Aluno.nome)
+    #  Filtros de nascimento (ano, intervalo, faixa etária) como intervalo sobre a coluna indexada
+    inicio, fim = intervalo_nascimento(ano_nascimento, nascido_entre, idade_minima, idade_maxima)
+    if inicio is not None:
+        statement = statement.where(Aluno.data_nascimento >= inicio)
+    if fim is not None:
+        statement = statement.where(Aluno.data_nascimento < fim)
+    #  Ordenação (id como desempate para a paginação por cursor)
+    chave = [Aluno.nome, Aluno.id] if ordenar_por_nome else [Aluno.id]
+    informar_total(session, response, statement, Aluno, count)
+    statement = paginar(statement, chave, offset=offset, limit=limit, cursor=cursor)
 
-    resultados = session.exec(statement.offset(offset).limit(limit)).unique().all()
-    return resultados
+    resultados = session.exec(statement).unique().all()
+    pagina = fatiar_pagina(resultados, chave, limit, response, emitir_cursor=not relevancia)
+    return INCLUSOES.responder_pagina(session, request, response, pagina, incluir)
 
 
 @router.post("/", response_model=Aluno, status_code=status.HTTP_201_CREATED)
 def create_aluno(aluno: AlunoBase, session: Session = Depends(get_session)):
-    # Validação extra: CPF Único
-    if session.exec(select(Aluno).where(Aluno.cpf == aluno.cpf)).first():
-        raise HTTPException(status_code=400, detail="CPF já cadastrado.")
+    # CPF único: garantido pela constraint, sem consulta prévia
+    with traduzir_violacoes(session, Aluno.__table__, unicas=_UNICAS):
+        novo_aluno = inserir(session, Aluno.model_validate(aluno))
+        session.commit()
+    return novo_aluno
+
 
-    novo_aluno = Aluno.model_validate(aluno)
-    session.add(novo_aluno)
+@router.put("/por-cpf", response_model=ResultadoUpsert)
+def upsert_alunos(
+        alunos: list[AlunoBase] = Body(..., max_length=LIMITE_UPSERT),
+        session: Session = Depends(get_session)
+):
+    """
+    Cria ou atualiza vários alunos pelo CPF com um único INSERT ... ON CONFLICT (cpf) DO UPDATE.
+    Idempotente: reenviar a mesma carga não altera nada.
+    """
+    gravados = upsert(session, Aluno, [aluno.model_dump(exclude={"id"}) for aluno in alunos], "cpf")
     session.commit()
-    session.refresh(novo_aluno)
-    return novo_aluno
+    cache.invalidar(*(tag("aluno", linha.id) for linha in gravados))
+    return ResultadoUpsert(recebidos=len(alunos), gravados=len(gravados))
+
+
+@router.put("/por-cpf/{cpf}", response_model=AlunoBase)
+def upsert_aluno(
+        aluno: AlunoBase,
+        cpf: str = Path(..., max_length=14, description="CPF do aluno (o mesmo limite da coluna)"),
+        session: Session = Depends(get_session)
+):
+    """
+    Cria ou atualiza o aluno deste CPF (o CPF do caminho prevalece sobre o do corpo).
+    """
+    gravados = upsert(session, Aluno, [{**aluno.model_dump(exclude={"id"}), "cpf": cpf}], "cpf")
+    session.commit()
+    if not gravados:
+        # Nada mudou: devolve a linha como está
+        return session.exec(select(Aluno).where(Aluno.cpf == cpf)).one()
+    cache.invalidar(tag("aluno", gravados[0].id))
+    return gravados[0]._mapping
+
+
+def _registrar_erro(resultado: ResultadoImportacao, linha: int, cpf: str | None, motivo: str) -> None:
+    if len(resultado.erros) < LIMITE_ERROS_IMPORTACAO:
+        resultado.erros.append(ErroImportacao(linha=linha, cpf=cpf, motivo=motivo))
+    else:
+        resultado.erros_truncados = True
+
+
+def _importar_lote(session: Session, lote: list[tuple[int, dict]], resultado: ResultadoImportacao) -> None:
+    """
+    Valida o lote com AlunoBase e grava os válidos num único INSERT multi-linha.
+    CPFs já cadastrados (ou repetidos no arquivo) são ignorados e reportados por linha.
+    """
+    validos: dict[str, tuple[int, dict]] = {}
+    for linha, registro in lote:
+        try:
+            aluno = AlunoBase.model_validate(registro)
+        except ValidationError as erro:
+            resultado.falhas += 1
+            motivo = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in erro.errors())
+            _registrar_erro(resultado, linha, str(registro.get("cpf") or "") or None, motivo)
+            continue
+        if aluno.cpf in validos:
+            resultado.ignorados += 1
+            _registrar_erro(resultado, linha, aluno.cpf, f"CPF repetido no arquivo (linha {validos[aluno.cpf][0]}).")
+            continue
+        validos[aluno.cpf] = (linha, aluno.model_dump(exclude={"id"}))
+
+    if not validos:
+        return
+
+    # ON CONFLICT DO NOTHING + RETURNING: quem não voltou já tinha o CPF cadastrado
+    statement = insert(session, Aluno).on_conflict_do_nothing(index_elements=["cpf"]).returning(Aluno.cpf)
+    inseridos = set(session.execute(statement, [dados for _, dados in validos.values()]).scalars())
+    session.commit()
+
+    resultado.inseridos += len(inseridos)
+    for cpf, (linha, _) in validos.items():
+        if cpf not in inseridos:
+            resultado.ignorados += 1
+            _registrar_erro(resultado, linha, cpf, "CPF já cadastrado.")
+
+
+@router.post("/bulk", response_model=ResultadoImportacao)
+async def importar_alunos(
+        request: Request,
+        formato: str | None = Query(None, description="csv ou ndjson (padrão: deduzido do Content-Type)"),
+        tamanho_lote: int = Query(TAMANHO_LOTE_IMPORTACAO, ge=1, le=10_000),
+        session: Session = Depends(get_session)
+):
+    """
+    Importação em massa: lê o corpo (CSV com cabeçalho ou NDJSON) em streaming e grava
+    em lotes de `tamanho_lote`, cada um confirmado separadamente.
+    Retorna o resumo de inseridos, ignorados (CPF duplicado) e falhas, com o motivo por linha.
+    """
+    formato = detectar_formato(request, formato)
+    resultado = ResultadoImportacao()
+    lote: list[tuple[int, dict]] = []
+
+    async for linha, registro, erro in registros(request, formato):
+        if erro:
+            resultado.falhas += 1
+            _registrar_erro(resultado, linha, None, erro)
+            continue
+        lote.append((linha, registro))
+        if len(lote) >= tamanho_lote:
+            await executar_em_sessao(session, _importar_lote, lote, resultado)
+            lote = []
+
+    if lote:
+        await executar_em_sessao(session, _importar_lote, lote, resultado)
+    return resultado
 
 
 @router.put("/{aluno_id}", response_model=Aluno)
 def update_aluno(aluno_id: int, aluno_data: AlunoBase, session: Session = Depends(get_session)):
-    db_aluno = session.get(Aluno, aluno_id)
+    with traduzir_violacoes(session, Aluno.__table__, unicas=_UNICAS):
+        db_aluno = atualizar(session, Aluno, aluno_id, aluno_data.model_dump(exclude_unset=True))
+        session.commit()
     if not db_aluno:
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
 
-    dados = aluno_data.model_dump(exclude_unset=True)
-    for key, value in dados.items():
-        setattr(db_aluno, key, value)
-
-    session.add(db_aluno)
-    session.commit()
-    session.refresh(db_aluno)
+    cache.invalidar(tag("aluno", aluno_id))
     return db_aluno
 
 
 # Delete
 @router.delete("/{aluno_id}")
 def delete_aluno(aluno_id: int, session: Session = Depends(get_session)):
-    aluno = session.get(Aluno, aluno_id)
+    # O delete percorre a carteira e as matrículas (cascata) e o vínculo com as disciplinas
+    aluno = session.get(Aluno, aluno_id, options=[
+        selectinload(Aluno.carteira), selectinload(Aluno.matriculas_detalhes), selectinload(Aluno.disciplinas)
+    ])
     if not aluno:
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
 
+    # As matrículas caem em cascata: as disciplinas perdem o aluno da coleção embutida
+    disciplinas = [matricula.disciplina_id for matricula in aluno.matriculas_detalhes]
     session.delete(aluno)
     session.commit()
+    cache.invalidar(tag("aluno", aluno_id), *(tag("disciplina", disciplina_id) for disciplina_id in disciplinas))
     return {"ok": True}
 
 
 #  Contagem Total
 @router.get("/stats/contagem", response_model=dict)
-def count_alunos(session: Session = Depends(get_session)):
+def count_alunos(response: Response, session: Session = Depends(get_session)):
     """
-    Retorna o total de alunos cadastrados no banco.
+    Retorna o total de alunos cadastrados, lido do contador mantido pelos triggers.
     """
-    total = session.exec(select(func.count(Aluno.id))).one()
+    total, atualizado_em = total_da_tabela(session, Aluno)
+    informar_atualizacao(response, [atualizado_em])
     return {"total_alunos": total}
 
 
 # Consulta Complexa: Alunos por Disciplina
-@router.get("/by-disciplina/{disciplina_id}", response_model=list[Aluno])  # Usando list nativo
-def get_alunos_por_disciplina(disciplina_id: int, session: Session = Depends(get_session)):
+@router.get("/by-disciplina/{disciplina_id}", response_model=list[AlunoBase])  # Usando list nativo
+def get_alunos_por_disciplina(
+        disciplina_id: int,
+        response: Response,
+        offset: int = 0,
+        limit: int = Query(default=10, ge=1, le=100),
+        cursor: str | None = Query(None, description="Cursor opaco retornado em X-Next-Cursor"),
+        count: ModoContagem | None = Query(None, description=DESCRICAO_CONTAGEM),
+        session: Session = Depends(get_session)
+):
     """
-    Retorna todos os alunos matriculados em uma disciplina específica.
-    Faz um JOIN entre Aluno e Matricula.
+    Retorna os alunos matriculados em uma disciplina específica, paginados.
+    Faz um JOIN entre Aluno e Matricula (mesma consulta de /disciplinas/{id}/alunos).
     """
     statement = (
         select(Aluno)
         .join(Matricula)  # Join explícito na tabela de associação
         .where(Matricula.disciplina_id == disciplina_id)
-        .options(selectinload(Aluno.disciplinas))
     )
+    chave = [Aluno.nome, Aluno.id]
+    informar_total(session, response, statement, Aluno, count)
+    statement = paginar(statement, chave, offset=offset, limit=limit, cursor=cursor)
+
+    return fatiar_pagina(session.exec(statement).all(), chave, limit, response)
 
-    return session.exec(statement).unique().all()
\ No newline at end of file
+
+def _coeficiente(soma, peso) -> float | None:
+    return round(soma / peso, 2) if peso else None
+
+
+def _consultar_historico(session: Session, aluno_id: int) -> list:
+    """
+    Matrículas do aluno com a disciplina e, por funções de janela, o coeficiente do
+    semestre e o acumulado até ele, numa única instrução. LEFT JOIN a partir do aluno:
+    nenhuma linha = aluno inexistente; uma linha sem semestre = aluno sem matrículas.
+    """
+    ponderada = Matricula.nota_final * Disciplina.carga_horaria
+    peso = case((Matricula.nota_final.is_not(None), Disciplina.carga_horaria), else_=0)
+    # Com ORDER BY, a janela vai do primeiro semestre até o atual (inclusive os empates)
+    acumulado = {"order_by": Matricula.semestre}
+    statement = (
+        select(
+            Matricula.semestre, Matricula.disciplina_id, Disciplina.nome, Disciplina.carga_horaria,
+            Matricula.nota_final, Matricula.numero_faltas,
+            Matricula.atualizado_em, Disciplina.atualizado_em.label("disciplina_atualizada_em"),
+            func.sum(Disciplina.carga_horaria).over(partition_by=Matricula.semestre).label("carga_semestre"),
+            func.sum(ponderada).over(partition_by=Matricula.semestre).label("soma_semestre"),
+            func.sum(peso).over(partition_by=Matricula.semestre).label("peso_semestre"),
+            func.sum(ponderada).over(**acumulado).label("soma_acumulada"),
+            func.sum(peso).over(**acumulado).label("peso_acumulado"),
+        )
+        .select_from(Aluno)
+        .outerjoin(Matricula, Matricula.id_aluno == Aluno.id)
+        .outerjoin(Disciplina, Disciplina.id == Matricula.disciplina_id)
+        .where(Aluno.id == aluno_id)
+        .order_by(Matricula.semestre, Disciplina.nome, Disciplina.id)
+    )
+    return session.exec(statement).all()
+
+
+@router.get("/{aluno_id}/historico", response_model=HistoricoAluno)
+def historico_aluno(aluno_id: int, request: Request, session: Session = Depends(get_session)):
+    """
+    Histórico do aluno agrupado por semestre, com coeficiente de rendimento (média das
+    notas ponderada pela carga horária) por semestre e acumulado. Fica no cache até a
+    próxima escrita em matrículas do aluno (ou na disciplina).
+    """
+    linhas: list = []
+
+    def carregar() -> HistoricoAluno:
+        linhas.extend(_consultar_historico(session, aluno_id))
+        if not linhas:
+            raise HTTPException(status_code=404, detail="Aluno não encontrado")
+
+        historico = HistoricoAluno(id_aluno=aluno_id)
+        for linha in linhas:
+            if linha.semestre is None:
+                break
+            if not historico.semestres or historico.semestres[-1].semestre != linha.semestre:
+                historico.semestres.append(SemestreHistorico(
+                    semestre=linha.semestre, carga_horaria=linha.carga_semestre,
+                    coeficiente=_coeficiente(linha.soma_semestre, linha.peso_semestre),
+                    coeficiente_acumulado=_coeficiente(linha.soma_acumulada, linha.peso_acumulado),
+                ))
+                historico.carga_horaria_total += linha.carga_semestre
+                historico.coeficiente_rendimento = historico.semestres[-1].coeficiente_acumulado
+            historico.semestres[-1].disciplinas.append(DisciplinaHistorico(
+                disciplina_id=linha.disciplina_id, nome=linha.nome, carga_horaria=linha.carga_horaria,
+                nota_final=linha.nota_final, numero_faltas=linha.numero_faltas,
+            ))
+        return historico
+
+    # As escritas em matrículas invalidam a tag do aluno; as de disciplina (nome, carga), a da disciplina
+    return cache.ler_ou_carregar(
+        f"historico:{aluno_id}", HistoricoAluno, carregar,
+        tags=lambda historico: [tag("aluno", aluno_id), *(
+            tag("disciplina", item.disciplina_id) for semestre in historico.semestres for item in semestre.disciplinas
+        )],
+        request=request,
+        versoes=lambda _: [v for linha in linhas for v in (linha.atualizado_em, linha.disciplina_atualizada_em)],
+    )
@@ -1,59 +1,118 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, status
-from sqlmodel import Session, select, col
+from fastapi import HTTPException, Body, Depends, Query, Request, Response, status
+from sqlmodel import Session, select
 from sqlalchemy.orm import joinedload
 from datetime import datetime, timezone
 
 from database import get_session
-from models.carteira_estudantil import CarteiraEstudantil, CarteiraEstudantilBase, CarteiraWithAluno
+from core.roteador import RoteadorSessao
+from core.contagem import DESCRICAO_CONTAGEM, ModoContagem, informar_total
+from core.paginacao import paginar, fatiar_pagina
+from core.busca import filtrar_por_nome
+from core.cache import cache, tag
+from core.dml import atualizar, inserir, upsert
+from core.integridade import traduzir_violacoes
+from core.inclusao import Incluidas, Inclusoes, Relacao
+from models.carteira_estudantil import (
+    CarteiraEstudantil, CarteiraEstudantilBase, CarteiraEstudantilPublic, CarteiraWithAluno
+)
 from models.aluno import Aluno, AlunoBase
+from models.comum import ResultadoUpsert
 
 CarteiraWithAluno.model_rebuild(_types_namespace={"AlunoBase": AlunoBase})
 
-router = APIRouter(
+router = RoteadorSessao(
     prefix="/carteiras",
     tags=["Carteiras Estudantis"],
 )
 
+# Linhas por chamada de PUT /carteiras/por-registro (uma única instrução INSERT)
+LIMITE_UPSERT = 1_000
+_UNICAS = {
+    "id_aluno": "Este aluno já possui uma carteira estudantil.",
+    "numero_de_registro": "Número de registro já existente.",
+}
+_ESTRANGEIRAS = {"id_aluno": "Aluno não encontrado para emissão da carteira."}
+
+INCLUSOES = Inclusoes(
+    CarteiraEstudantil, "carteira", CarteiraEstudantilPublic,
+    aluno=Relacao(joinedload(CarteiraEstudantil.aluno), AlunoBase, "aluno"),
+)
+
 
 @router.post("/", response_model=CarteiraEstudantil, status_code=status.HTTP_201_CREATED)
 def create_carteira(carteira: CarteiraEstudantilBase, id_aluno: int, session: Session = Depends(get_session)):
-    # 1. Verifica se o Aluno existe
-    aluno = session.get(Aluno, id_aluno)
-    if not aluno:
-        raise HTTPException(status_code=404, detail="Aluno não encontrado para emissão da carteira.")
-
-
-    carteira_existente = session.exec(select(CarteiraEstudantil).where(CarteiraEstudantil.id_aluno == id_aluno)).first()
-    if carteira_existente:
-        raise HTTPException(status_code=400, detail="Este aluno já possui uma carteira estudantil.")
-
-    if session.exec(select(CarteiraEstudantil).where(
-            CarteiraEstudantil.numero_de_registro == carteira.numero_de_registro)).first():
-        raise HTTPException(status_code=400, detail="Número de registro já existente.")
-
     # Criação do objeto completo
     dados_carteira = carteira.model_dump()
     dados_carteira["id_aluno"] = id_aluno
 
     nova_carteira = CarteiraEstudantil.model_validate(dados_carteira)
 
-    session.add(nova_carteira)
-    session.commit()
-    session.refresh(nova_carteira)
+    # Aluno existente, uma carteira por aluno e registro único: tudo pelas constraints
+    with traduzir_violacoes(session, CarteiraEstudantil.__table__, unicas=_UNICAS, estrangeiras=_ESTRANGEIRAS):
+        nova_carteira = inserir(session, nova_carteira)
+        session.commit()
+    cache.invalidar(tag("aluno", id_aluno))
     return nova_carteira
 
 
 
-@router.get("/", response_model=list[CarteiraWithAluno])
+def _tags_gravada(linha) -> list[str]:
+    # Se passou para outro aluno, os dois têm a carteira embutida
+    alunos = {linha.id_aluno, linha.anterior_id_aluno} - {None}
+    return [tag("carteira", linha.id), *(tag("aluno", id_) for id_ in alunos)]
+
+
+@router.put("/por-registro", response_model=ResultadoUpsert)
+def upsert_carteiras(
+        carteiras: list[CarteiraEstudantilPublic] = Body(..., max_length=LIMITE_UPSERT),
+        session: Session = Depends(get_session)
+):
+    """
+    Cria ou atualiza várias carteiras pelo número de registro com um único
+    INSERT ... ON CONFLICT (numero_de_registro) DO UPDATE. Idempotente.
+    """
+    linhas = [carteira.model_dump(exclude={"id"}) for carteira in carteiras]
+    with traduzir_violacoes(session, CarteiraEstudantil.__table__, unicas=_UNICAS, estrangeiras=_ESTRANGEIRAS):
+        gravados = upsert(session, CarteiraEstudantil, linhas, "numero_de_registro", somente_insercao={"data_criacao"},
+                          anteriores=["id_aluno"])
+        session.commit()
+    cache.invalidar(*(t for linha in gravados for t in _tags_gravada(linha)))
+    return ResultadoUpsert(recebidos=len(carteiras), gravados=len(gravados))
+
+
+@router.put("/por-registro/{numero_de_registro}", response_model=CarteiraEstudantilPublic)
+def upsert_carteira(numero_de_registro: str, carteira: CarteiraEstudantilPublic,
+                    session: Session = Depends(get_session)):
+    """
+    Cria ou atualiza a carteira deste número de registro (o do caminho prevalece sobre o do corpo).
+    """
+    linha = {**carteira.model_dump(exclude={"id"}), "numero_de_registro": numero_de_registro}
+    with traduzir_violacoes(session, CarteiraEstudantil.__table__, unicas=_UNICAS, estrangeiras=_ESTRANGEIRAS):
+        gravados = upsert(session, CarteiraEstudantil, [linha], "numero_de_registro", somente_insercao={"data_criacao"},
+                          anteriores=["id_aluno"])
+        session.commit()
+    if not gravados:
+        return session.exec(
+            select(CarteiraEstudantil).where(CarteiraEstudantil.numero_de_registro == numero_de_registro)).one()
+    cache.invalidar(*_tags_gravada(gravados[0]))
+    return gravados[0]._mapping
+
+
+@router.get("/", response_model=list[INCLUSOES.completo])
 def list_carteiras(
+        request: Request,
+        response: Response,
         offset: int = 0,
-        limit: int = Query(default=10, le=100),
+        limit: int = Query(default=10, ge=1, le=100),
+        cursor: str | None = Query(None, description="Cursor opaco retornado em X-Next-Cursor"),
+        count: ModoContagem | None = Query(None, description=DESCRICAO_CONTAGEM),
         status_ativa: bool | None = Query(None, description="Filtrar por status (Ativa/Inativa)"),
         somente_validas: bool = Query(False,
                                       description="Se True, retorna apenas carteiras dentro do prazo de validade"),
+        incluir: Incluidas = Depends(INCLUSOES.dependencia),
         session: Session = Depends(get_session)
 ):
-    statement = select(CarteiraEstudantil).options(joinedload(CarteiraEstudantil.aluno))
+    statement = select(CarteiraEstudantil).options(*INCLUSOES.opcoes(incluir))
 
     # Filtro por Status
     if status_ativa is not None:
@@ -63,28 +122,32 @@ def list_carteiras(
         agora = datetime.now(timezone.utc)
         statement = statement.where(CarteiraEstudantil.validade > agora)
 
-    statement = statement.order_by(col(CarteiraEstudantil.data_criacao).desc())
+    chave = [CarteiraEstudantil.data_criacao, CarteiraEstudantil.id]
+    informar_total(session, response, statement, CarteiraEstudantil, count)
+    statement = paginar(statement, chave, offset=offset, limit=limit, cursor=cursor, descendente=True)
 
-    return session.exec(statement.offset(offset).limit(limit)).unique().all()
+    resultados = session.exec(statement).unique().all()
+    pagina = fatiar_pagina(resultados, chave, limit, response)
+    return INCLUSOES.responder_pagina(session, request, response, pagina, incluir)
 
 
-@router.get("/{carteira_id}", response_model=CarteiraWithAluno)
-def get_carteira(carteira_id: int, session: Session = Depends(get_session)):
-    statement = (
-        select(CarteiraEstudantil)
-        .where(CarteiraEstudantil.id == carteira_id)
-        .options(joinedload(CarteiraEstudantil.aluno))
-    )
-    carteira = session.exec(statement).unique().first()
-
-    if not carteira:
-        raise HTTPException(status_code=404, detail="Carteira não encontrada")
-    return carteira
+@router.get("/{carteira_id}", response_model=INCLUSOES.completo)
+def get_carteira(
+        carteira_id: int,
+        request: Request,
+        incluir: Incluidas = Depends(INCLUSOES.dependencia),
+        session: Session = Depends(get_session)
+):
+    """
+    Carteira por id; o aluno só com `include=aluno`.
+    """
+    return INCLUSOES.ler_por_id(session, request, carteira_id, incluir, "Carteira não encontrada")
 
 
 @router.get("/busca/por-aluno", response_model=list[CarteiraWithAluno])
 def get_carteira_by_aluno_name(
-        nome_aluno: str = Query(..., description="Nome parcial do aluno"),
+        nome_aluno: str = Query(..., description="Nome parcial do aluno (ignora acentos e caixa)"),
+        ordenar_por_relevancia: bool = Query(True, description="Ordena pelos nomes mais parecidos"),
         session: Session = Depends(get_session)
 ):
     """
@@ -93,9 +156,9 @@ def get_carteira_by_aluno_name(
     statement = (
         select(CarteiraEstudantil)
         .join(Aluno)  # Join explícito para filtrar
-        .where(col(Aluno.nome).contains(nome_aluno))
         .options(joinedload(CarteiraEstudantil.aluno))  # Carrega os dados do aluno no retorno
     )
+    statement = filtrar_por_nome(statement, Aluno.nome, nome_aluno, session, ordenar_por_relevancia)
 
     return session.exec(statement).unique().all()
 
@@ -107,18 +170,18 @@ def update_carteira(
         status_novo: bool | None = None,
         session: Session = Depends(get_session)
 ):
-    db_carteira = session.get(CarteiraEstudantil, carteira_id)
-    if not db_carteira:
-        raise HTTPException(status_code=404, detail="Carteira não encontrada")
-
+    valores = {}
     if validade_nova:
-        db_carteira.validade = validade_nova
+        valores["validade"] = validade_nova
     if status_novo is not None:
-        db_carteira.status_carteira = status_novo
+        valores["status_carteira"] = status_novo
 
-    session.add(db_carteira)
+    db_carteira = atualizar(session, CarteiraEstudantil, carteira_id, valores)
     session.commit()
-    session.refresh(db_carteira)
+    if not db_carteira:
+        raise HTTPException(status_code=404, detail="Carteira não encontrada")
+
+    cache.invalidar(tag("carteira", carteira_id))
     return db_carteira
 
 
@@ -131,4 +194,5 @@ def delete_carteira(carteira_id: int, session: Session = Depends(get_session)):
 
     session.delete(db_carteira)
     session.commit()
+    cache.invalidar(tag("carteira", carteira_id))
     return {"ok": True}
\ No newline at end of file
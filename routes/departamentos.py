@@ -1,72 +1,135 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, status, Body
-from sqlmodel import Session, select, func, col
+from fastapi import HTTPException, Depends, Query, Request, Response, status, Body
+from sqlmodel import Session, select
 from sqlalchemy.orm import selectinload
 
 from database import get_session
+from core.roteador import RoteadorSessao
+from core.contagem import DESCRICAO_CONTAGEM, ModoContagem, informar_total
+from core.paginacao import paginar, fatiar_pagina, validar_cursor_relevancia
+from core.busca import filtrar_por_nome
+from core.estatisticas import informar_atualizacao
+from core.cache import cache, tag
+from core.dml import atualizar, inserir, upsert
+from core.integridade import traduzir_violacoes
+from core.condicional import etag_colecao
+from core.inclusao import Colecao, Incluidas, Inclusoes, Relacao
 from models.departamento import Departamento, DepartamentoBase
-from models.professor import Professor
-from models.disciplina import Disciplina
+from models.professor import Professor, ProfessorBase, ProfessorPublic
+from models.disciplina import Disciplina, DisciplinaBase
+from models.estatisticas import EstatisticaDepartamento
+from models.comum import ResultadoUpsert
 
 Departamento.model_rebuild(_types_namespace={
     "Professor": Professor,
     "Disciplina": Disciplina
 })
 
-router = APIRouter(
+router = RoteadorSessao(
     prefix="/departamentos",
     tags=["Departamentos"],
 )
 
+# Linhas por chamada de PUT /departamentos/por-codigo (uma única instrução INSERT)
+LIMITE_UPSERT = 1_000
+_UNICAS = {
+    "codigo_departamento": "Código de departamento já existente.",
+    "nome": "Nome de departamento já existente.",
+}
+
+INCLUSOES = Inclusoes(
+    Departamento, "departamento", DepartamentoBase,
+    professores_departamento=Relacao(
+        Colecao(Professor, Professor.id_departamento, [Professor.nome, Professor.id]), list[ProfessorBase], "professor"),
+    # disciplina -> departamento é pelo código, não pelo id
+    disciplinas_departamento=Relacao(
+        Colecao(Disciplina, Departamento.id, [Disciplina.nome, Disciplina.id],
+                (Departamento, Departamento.codigo_departamento == Disciplina.departamento_disciplina_cod)),
+        list[DisciplinaBase], "disciplina"),
+)
+
 
 @router.post("/", response_model=Departamento, status_code=status.HTTP_201_CREATED)
 def create_departamento(departamento: DepartamentoBase, session: Session = Depends(get_session)):
-    if session.exec(
-            select(Departamento).where(Departamento.codigo_departamento == departamento.codigo_departamento)).first():
-        raise HTTPException(status_code=400, detail="Código de departamento já existente.")
-
-    if session.exec(select(Departamento).where(Departamento.nome == departamento.nome)).first():
-        raise HTTPException(status_code=400, detail="Nome de departamento já existente.")
-
-    novo_dep = Departamento.model_validate(departamento)
-    session.add(novo_dep)
-    session.commit()
-    session.refresh(novo_dep)
+    # Código e nome únicos: garantidos pelos índices únicos
+    with traduzir_violacoes(session, Departamento.__table__, unicas=_UNICAS):
+        novo_dep = inserir(session, Departamento.model_validate(departamento))
+        session.commit()
     return novo_dep
 
 
-@router.get("/", response_model=list[Departamento])
+@router.put("/por-codigo", response_model=ResultadoUpsert)
+def upsert_departamentos(
+        departamentos: list[DepartamentoBase] = Body(..., max_length=LIMITE_UPSERT),
+        session: Session = Depends(get_session)
+):
+    """
+    Cria ou atualiza vários departamentos pelo código com um único
+    INSERT ... ON CONFLICT (codigo_departamento) DO UPDATE. Idempotente.
+    """
+    linhas = [departamento.model_dump(exclude={"id"}) for departamento in departamentos]
+    with traduzir_violacoes(session, Departamento.__table__, unicas=_UNICAS):
+        gravados = upsert(session, Departamento, linhas, "codigo_departamento")
+        session.commit()
+    cache.invalidar(*(tag("departamento", linha.id) for linha in gravados))
+    return ResultadoUpsert(recebidos=len(departamentos), gravados=len(gravados))
+
+
+@router.put("/por-codigo/{codigo_departamento}", response_model=DepartamentoBase)
+def upsert_departamento(codigo_departamento: str, departamento: DepartamentoBase,
+                        session: Session = Depends(get_session)):
+    """
+    Cria ou atualiza o departamento deste código (o do caminho prevalece sobre o do corpo).
+    """
+    linha = {**departamento.model_dump(exclude={"id"}), "codigo_departamento": codigo_departamento}
+    with traduzir_violacoes(session, Departamento.__table__, unicas=_UNICAS):
+        gravados = upsert(session, Departamento, [linha], "codigo_departamento")
+        session.commit()
+    if not gravados:
+        return session.exec(select(Departamento).where(Departamento.codigo_departamento == codigo_departamento)).one()
+    cache.invalidar(tag("departamento", gravados[0].id))
+    return gravados[0]._mapping
+
+
+@router.get("/", response_model=list[INCLUSOES.completo])
 def list_departamentos(
+        request: Request,
+        response: Response,
         offset: int = 0,
-        limit: int = Query(default=10, le=100),
-        nome: str | None = Query(None, description="Filtrar por nome"),
+        limit: int = Query(default=10, ge=1, le=100),
+        cursor: str | None = Query(None, description="Cursor opaco retornado em X-Next-Cursor"),
+        count: ModoContagem | None = Query(None, description=DESCRICAO_CONTAGEM),
+        nome: str | None = Query(None, description="Filtrar por nome (ignora acentos e caixa)"),
+        ordenar_por_relevancia: bool = Query(False, description="Com `nome`, ordena pelos mais parecidos (só offset)"),
+        incluir: Incluidas = Depends(INCLUSOES.dependencia),
         session: Session = Depends(get_session)
 ):
-    statement = select(Departamento).options(
-        selectinload(Departamento.professores_departamento),
-        selectinload(Departamento.disciplinas_departamento)
-    )
+    statement = select(Departamento).options(*INCLUSOES.opcoes(incluir))
 
+    relevancia = bool(nome) and ordenar_por_relevancia
+    validar_cursor_relevancia(cursor, relevancia)
     if nome:
-        statement = statement.where(col(Departamento.nome).contains(nome))
+        statement = filtrar_por_nome(statement, Departamento.nome, nome, session, ordenar_por_relevancia)
 
-    return session.exec(statement.offset(offset).limit(limit)).unique().all()
+    chave = [Departamento.id]
+    informar_total(session, response, statement, Departamento, count)
+    statement = paginar(statement, chave, offset=offset, limit=limit, cursor=cursor)
 
+    resultados = session.exec(statement).unique().all()
+    pagina = fatiar_pagina(resultados, chave, limit, response, emitir_cursor=not relevancia)
+    return INCLUSOES.responder_pagina(session, request, response, pagina, incluir)
 
-@router.get("/{departamento_id}", response_model=Departamento)
-def get_departamento(departamento_id: int, session: Session = Depends(get_session)):
-    statement = (
-        select(Departamento)
-        .where(Departamento.id == departamento_id)
-        .options(
-            selectinload(Departamento.professores_departamento),
-            selectinload(Departamento.disciplinas_departamento)
-        )
-    )
-    departamento = session.exec(statement).unique().first()
 
-    if not departamento:
-        raise HTTPException(status_code=404, detail="Departamento não encontrado")
-    return departamento
+@router.get("/{departamento_id}", response_model=INCLUSOES.completo)
+def get_departamento(
+        departamento_id: int,
+        request: Request,
+        incluir: Incluidas = Depends(INCLUSOES.dependencia),
+        session: Session = Depends(get_session)
+):
+    """
+    Departamento por id; professores e disciplinas só com `include`.
+    """
+    return INCLUSOES.ler_por_id(session, request, departamento_id, incluir, "Departamento não encontrado")
 
 
 @router.patch("/{departamento_id}", response_model=Departamento)
@@ -76,41 +139,76 @@ def update_departamento(
         codigo_departamento: str | None = Body(default=None),
         session: Session = Depends(get_session)
 ):
-    db_dep = session.get(Departamento, departamento_id)
-    if not db_dep:
-        raise HTTPException(status_code=404, detail="Departamento não encontrado")
-
     # Atualiza só se o usuário enviou o valor
+    valores = {}
     if nome is not None:
-        db_dep.nome = nome
+        valores["nome"] = nome
 
     if codigo_departamento is not None:
-        db_dep.codigo_departamento = codigo_departamento
+        valores["codigo_departamento"] = codigo_departamento
 
-    session.add(db_dep)
-    session.commit()
-    session.refresh(db_dep)
+    with traduzir_violacoes(session, Departamento.__table__, unicas=_UNICAS):
+        db_dep = atualizar(session, Departamento, departamento_id, valores)
+        session.commit()
+    if not db_dep:
+        raise HTTPException(status_code=404, detail="Departamento não encontrado")
+
+    cache.invalidar(tag("departamento", departamento_id))
     return db_dep
 
 
 @router.delete("/{departamento_id}")
 def delete_departamento(departamento_id: int, session: Session = Depends(get_session)):
-    dep = session.get(Departamento, departamento_id)
+    # O delete desvincula o departamento destes relacionamentos
+    dep = session.get(Departamento, departamento_id, options=[
+        selectinload(Departamento.professores_departamento), selectinload(Departamento.disciplinas_departamento)
+    ])
     if not dep:
         raise HTTPException(status_code=404, detail="Departamento não encontrado")
 
     session.delete(dep)
     session.commit()
+    cache.invalidar(tag("departamento", departamento_id))
     return {"ok": True}
 
 
 @router.get("/stats/professores", response_model=list[dict])
-def stats_professores_por_departamento(session: Session = Depends(get_session)):
+def stats_professores_por_departamento(response: Response, session: Session = Depends(get_session)):
+    """
+    Total de professores por departamento, lido da tabela-resumo mantida pelos triggers.
+    """
     statement = (
-        select(Departamento.nome, func.count(Professor.id).label("total_professores"))
-        .join(Professor, isouter=True)
-        .group_by(Departamento.id)
+        select(Departamento.nome, EstatisticaDepartamento.total_professores, EstatisticaDepartamento.atualizado_em)
+        .join(EstatisticaDepartamento, EstatisticaDepartamento.departamento_id == Departamento.id)
+        .order_by(Departamento.id)
     )
 
     resultados = session.exec(statement).all()
-    return [{"departamento": row.nome, "total_professores": row.total_professores} for row in resultados]
\ No newline at end of file
+    informar_atualizacao(response, (row.atualizado_em for row in resultados))
+    return [{"departamento": row.nome, "total_professores": row.total_professores} for row in resultados]
+
+
+@router.get("/{departamento_id}/professores", response_model=list[ProfessorPublic])
+def list_professores_do_departamento(
+        departamento_id: int,
+        request: Request,
+        response: Response,
+        offset: int = 0,
+        limit: int = Query(default=10, ge=1, le=100),
+        cursor: str | None = Query(None, description="Cursor opaco retornado em X-Next-Cursor"),
+        count: ModoContagem | None = Query(None, description=DESCRICAO_CONTAGEM),
+        session: Session = Depends(get_session)
+):
+    """
+    Professores do departamento, paginados na mesma ordem de `include=professores_departamento`.
+    """
+    if not session.get(Departamento, departamento_id):
+        raise HTTPException(status_code=404, detail="Departamento não encontrado")
+
+    statement = select(Professor).where(Professor.id_departamento == departamento_id)
+    chave = [Professor.nome, Professor.id]
+    informar_total(session, response, statement, Professor, count)
+    statement = paginar(statement, chave, offset=offset, limit=limit, cursor=cursor)
+
+    pagina = fatiar_pagina(session.exec(statement).all(), chave, limit, response)
+    return etag_colecao(request, response, (professor.atualizado_em for professor in pagina)) or pagina
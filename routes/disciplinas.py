@@ -1,13 +1,26 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, status
-from sqlmodel import Session, select, func, col
+from fastapi import HTTPException, Body, Depends, Query, Request, Response, status
+from sqlmodel import Session, select
 from sqlalchemy.orm import joinedload, selectinload
 
 from database import get_session
-from models.disciplina import Disciplina, DisciplinaBase
-from models.professor import Professor
-from models.departamento import Departamento
-from models.aluno import Aluno
-from models.matricula import Matricula
+from core.roteador import RoteadorSessao
+from core.contagem import DESCRICAO_CONTAGEM, ModoContagem, informar_total
+from core.paginacao import paginar, fatiar_pagina, validar_cursor_relevancia
+from core.busca import filtrar_por_nome
+from core.dml import atualizar, atualizar_em_lote, inserir, insert
+from core.integridade import traduzir_violacoes
+from core.estatisticas import informar_atualizacao
+from core.cache import cache, tag
+from core.condicional import etag_colecao
+from core.inclusao import Colecao, Incluidas, Inclusoes, Relacao
+from models.disciplina import Disciplina, DisciplinaBase, DisciplinaPublic
+from models.professor import Professor, ProfessorBase
+from models.departamento import Departamento, DepartamentoBase
+from models.aluno import Aluno, AlunoBase
+from models.matricula import (
+    Matricula, MatriculaEmLote, NotaEmLote, ResultadoMatriculaEmLote, ResultadoNotasEmLote
+)
+from models.estatisticas import EstatisticaDisciplina
 
 Disciplina.model_rebuild(_types_namespace={
     "Aluno": Aluno,
@@ -16,48 +29,75 @@ Disciplina.model_rebuild(_types_namespace={
     "Matricula": Matricula
 })
 
-router = APIRouter(
+router = RoteadorSessao(
     prefix="/disciplinas",
     tags=["Disciplinas"],
 )
 
+# Alunos por chamada de PATCH /disciplinas/{id}/matriculas
+LIMITE_NOTAS_EM_LOTE = 10_000
+_ESTRANGEIRAS = {
+    "id_professor": "Professor informado não encontrado.",
+    "departamento_disciplina_cod": "Departamento informado não encontrado.",
+}
+# Matrícula concorrente de um dos alunos entre a consulta e o INSERT do lote
+_UNICAS_MATRICULA = {"id_aluno, disciplina_id": "Aluno já matriculado nesta disciplina."}
 
-@router.post("/", response_model=Disciplina, status_code=status.HTTP_201_CREATED)
-def create_disciplina(disciplina: Disciplina, session: Session = Depends(get_session)):
-    if disciplina.id_professor and not session.get(Professor, disciplina.id_professor):
-        raise HTTPException(status_code=404, detail="Professor informado não encontrado.")
+INCLUSOES = Inclusoes(
+    Disciplina, "disciplina", DisciplinaPublic,
+    professor_disciplina=Relacao(joinedload(Disciplina.professor_disciplina), ProfessorBase | None, "professor"),
+    departamento=Relacao(joinedload(Disciplina.departamento), DepartamentoBase | None, "departamento"),
+    alunos=Relacao(
+        Colecao(Aluno, Matricula.disciplina_id, [Aluno.nome, Aluno.id], (Matricula, Matricula.id_aluno == Aluno.id)),
+        list[AlunoBase], "aluno"),
+)
+
+
+def _tags_pais(disciplina: Disciplina, id_departamento: int | None) -> list[str]:
+    # Professor e departamento embutem a disciplina nas suas coleções (e totais)
+    tags = [tag("professor", disciplina.id_professor)] if disciplina.id_professor else []
+    if id_departamento is not None:
+        tags.append(tag("departamento", id_departamento))
+    return tags
 
-    if disciplina.departamento_disciplina_cod:
-        dep = session.exec(select(Departamento).where(
-            Departamento.codigo_departamento == disciplina.departamento_disciplina_cod)).first()
-        if not dep:
-            raise HTTPException(status_code=404, detail="Departamento informado não encontrado.")
 
+@router.post("/", response_model=Disciplina, status_code=status.HTTP_201_CREATED)
+def create_disciplina(disciplina: Disciplina, session: Session = Depends(get_session)):
     disciplina.id = None
 
-    session.add(disciplina)
-    session.commit()
-    session.refresh(disciplina)
+    # O id do departamento (a FK é pelo código) volta no próprio RETURNING, para a invalidação
+    id_departamento = select(Departamento.id).where(
+        Departamento.codigo_departamento == disciplina.departamento_disciplina_cod).scalar_subquery()
+    # Professor e departamento existentes: garantidos pelas FKs
+    with traduzir_violacoes(session, Disciplina.__table__, estrangeiras=_ESTRANGEIRAS,
+                            valores=disciplina.model_dump()):
+        disciplina, id_departamento = inserir(session, disciplina, id_departamento.label("id_departamento"))
+        session.commit()
+    cache.invalidar(*_tags_pais(disciplina, id_departamento))
     return disciplina
 
 
-@router.get("/", response_model=list[Disciplina])
+@router.get("/", response_model=list[INCLUSOES.completo])
 def list_disciplinas(
+        request: Request,
+        response: Response,
         offset: int = 0,
-        limit: int = Query(default=10, le=100),
-        nome: str | None = Query(None, description="Filtro por nome parcial"),
+        limit: int = Query(default=10, ge=1, le=100),
+        cursor: str | None = Query(None, description="Cursor opaco retornado em X-Next-Cursor"),
+        count: ModoContagem | None = Query(None, description=DESCRICAO_CONTAGEM),
+        nome: str | None = Query(None, description="Filtro por nome parcial (ignora acentos e caixa)"),
+        ordenar_por_relevancia: bool = Query(False, description="Com `nome`, ordena pelos mais parecidos (só offset)"),
         id_professor: int | None = Query(None, description="Filtrar disciplinas de um professor"),
         cod_departamento: str | None = Query(None, description="Filtrar por código do departamento"),
+        incluir: Incluidas = Depends(INCLUSOES.dependencia),
         session: Session = Depends(get_session)
 ):
-    statement = select(Disciplina).options(
-        joinedload(Disciplina.professor_disciplina),
-        joinedload(Disciplina.departamento),
-        selectinload(Disciplina.alunos)
-    )
+    statement = select(Disciplina).options(*INCLUSOES.opcoes(incluir))
 
+    relevancia = bool(nome) and ordenar_por_relevancia
+    validar_cursor_relevancia(cursor, relevancia)
     if nome:
-        statement = statement.where(col(Disciplina.nome).contains(nome))
+        statement = filtrar_por_nome(statement, Disciplina.nome, nome, session, ordenar_por_relevancia)
 
     if id_professor:
         statement = statement.where(Disciplina.id_professor == id_professor)
@@ -65,64 +105,165 @@ def list_disciplinas(
     if cod_departamento:
         statement = statement.where(Disciplina.departamento_disciplina_cod == cod_departamento)
 
-    statement = statement.order_by(Disciplina.nome)
-
-    return session.exec(statement.offset(offset).limit(limit)).unique().all()
+    chave = [Disciplina.nome, Disciplina.id]
+    informar_total(session, response, statement, Disciplina, count)
+    statement = paginar(statement, chave, offset=offset, limit=limit, cursor=cursor)
 
+    resultados = session.exec(statement).unique().all()
+    pagina = fatiar_pagina(resultados, chave, limit, response, emitir_cursor=not relevancia)
+    return INCLUSOES.responder_pagina(session, request, response, pagina, incluir)
 
-@router.get("/{disciplina_id}", response_model=Disciplina)
-def get_disciplina(disciplina_id: int, session: Session = Depends(get_session)):
-    statement = (
-        select(Disciplina)
-        .where(Disciplina.id == disciplina_id)
-        .options(
-            joinedload(Disciplina.professor_disciplina),
-            joinedload(Disciplina.departamento),
-            selectinload(Disciplina.alunos)
-        )
-    )
-    disciplina = session.exec(statement).unique().first()
 
-    if not disciplina:
-        raise HTTPException(status_code=404, detail="Disciplina não encontrada")
-    return disciplina
+@router.get("/{disciplina_id}", response_model=INCLUSOES.completo)
+def get_disciplina(
+        disciplina_id: int,
+        request: Request,
+        incluir: Incluidas = Depends(INCLUSOES.dependencia),
+        session: Session = Depends(get_session)
+):
+    """
+    Disciplina por id; professor, departamento e alunos só com `include`.
+    """
+    return INCLUSOES.ler_por_id(session, request, disciplina_id, incluir, "Disciplina não encontrada")
 
 
 @router.put("/{disciplina_id}", response_model=Disciplina)
 def update_disciplina(disciplina_id: int, disciplina_data: DisciplinaBase, session: Session = Depends(get_session)):
-    db_disciplina = session.get(Disciplina, disciplina_id)
+    db_disciplina = atualizar(session, Disciplina, disciplina_id, disciplina_data.model_dump(exclude_unset=True))
+    session.commit()
     if not db_disciplina:
         raise HTTPException(status_code=404, detail="Disciplina não encontrada")
 
-    dados = disciplina_data.model_dump(exclude_unset=True)
-    for key, value in dados.items():
-        setattr(db_disciplina, key, value)
-
-    session.add(db_disciplina)
-    session.commit()
-    session.refresh(db_disciplina)
+    cache.invalidar(tag("disciplina", disciplina_id))
     return db_disciplina
 
 
 @router.delete("/{disciplina_id}")
 def delete_disciplina(disciplina_id: int, session: Session = Depends(get_session)):
-    disciplina = session.get(Disciplina, disciplina_id)
+    # O delete desvincula a disciplina destes relacionamentos
+    disciplina = session.get(Disciplina, disciplina_id, options=[
+        selectinload(Disciplina.departamento), selectinload(Disciplina.matriculas), selectinload(Disciplina.alunos)
+    ])
     if not disciplina:
         raise HTTPException(status_code=404, detail="Disciplina não encontrada")
 
+    pais = _tags_pais(disciplina, disciplina.departamento.id if disciplina.departamento else None)
     session.delete(disciplina)
     session.commit()
+    cache.invalidar(tag("disciplina", disciplina_id), *pais)
     return {"ok": True}
 
 
+@router.post("/{disciplina_id}/matriculas/bulk", response_model=ResultadoMatriculaEmLote)
+def matricular_em_lote(disciplina_id: int, dados: MatriculaEmLote, session: Session = Depends(get_session)):
+    """
+    Matricula vários alunos na disciplina numa única transação: uma consulta confere a
+    disciplina, valida os alunos e acha os já matriculados, e um único INSERT grava os demais.
+    """
+    ids = list(dict.fromkeys(dados.ids_alunos))
+    # Com matricula particionada (Postgres) a unicidade por aluno e disciplina vem de um
+    # trigger, não de um índice: ON CONFLICT não a enxerga, então os já matriculados saem antes.
+    # A partir da disciplina: sem linha nenhuma, ela não existe; aluno None, nenhum aluno válido
+    consulta = session.exec(
+        select(Aluno.id, Matricula.id_aluno)
+        .select_from(Disciplina)
+        .outerjoin(Aluno, Aluno.id.in_(ids))
+        .outerjoin(Matricula, (Matricula.id_aluno == Aluno.id) & (Matricula.disciplina_id == Disciplina.id))
+        .where(Disciplina.id == disciplina_id)
+    ).all()
+    if not consulta:
+        raise HTTPException(status_code=404, detail="Disciplina não encontrada")
+    existentes = {id_aluno: matriculado for id_aluno, matriculado in consulta if id_aluno is not None}
+    validos = [id_aluno for id_aluno in ids if id_aluno in existentes]
+    novos = [id_aluno for id_aluno in validos if existentes[id_aluno] is None]
+
+    inseridos: set[int] = set()
+    if novos:
+        statement = insert(session, Matricula).on_conflict_do_nothing().returning(Matricula.id_aluno)
+        linhas = [{"id_aluno": id_aluno, "disciplina_id": disciplina_id, "semestre": dados.semestre}
+                  for id_aluno in novos]
+        with traduzir_violacoes(session, Matricula.__table__, unicas=_UNICAS_MATRICULA):
+            inseridos = set(session.execute(statement, linhas).scalars())
+            session.commit()
+    cache.invalidar(tag("disciplina", disciplina_id), *(tag("aluno", id_aluno) for id_aluno in inseridos))
+
+    return ResultadoMatriculaEmLote(
+        matriculados=[id_aluno for id_aluno in validos if id_aluno in inseridos],
+        ja_matriculados=[id_aluno for id_aluno in validos if id_aluno not in inseridos],
+        desconhecidos=[id_aluno for id_aluno in ids if id_aluno not in existentes],
+    )
+
+
+@router.patch("/{disciplina_id}/matriculas", response_model=ResultadoNotasEmLote)
+def lancar_notas(
+        disciplina_id: int,
+        notas: list[NotaEmLote] = Body(..., max_length=LIMITE_NOTAS_EM_LOTE),
+        session: Session = Depends(get_session)
+):
+    """
+    Lança nota e/ou faltas da turma inteira numa transação, com UPDATE ... FROM (VALUES ...)
+    em vez de um PATCH por aluno. Alunos sem matrícula na disciplina voltam em `nao_matriculados`.
+    """
+    linhas = [nota.model_dump(exclude_unset=True) for nota in notas]
+    atualizados = set(atualizar_em_lote(session, Matricula, "id_aluno", linhas,
+                                        Matricula.disciplina_id == disciplina_id))
+    session.commit()
+
+    ids = list(dict.fromkeys(nota.id_aluno for nota in notas))
+    nao_matriculados = [id_aluno for id_aluno in ids if id_aluno not in atualizados]
+    # Só no caminho de erro: nenhuma matrícula encontrada pode ser disciplina inexistente
+    if not atualizados and ids and not session.get(Disciplina, disciplina_id):
+        raise HTTPException(status_code=404, detail="Disciplina não encontrada")
+
+    cache.invalidar(tag("disciplina", disciplina_id), *(tag("aluno", id_aluno) for id_aluno in atualizados))
+    return ResultadoNotasEmLote(
+        atualizados=[id_aluno for id_aluno in ids if id_aluno in atualizados],
+        nao_matriculados=nao_matriculados,
+    )
+
+
 @router.get("/stats/alunos-por-disciplina", response_model=list[dict])
-def stats_alunos_por_disciplina(session: Session = Depends(get_session)):
+def stats_alunos_por_disciplina(response: Response, session: Session = Depends(get_session)):
+    """
+    Total de alunos por disciplina, lido da tabela-resumo mantida pelos triggers.
+    """
     statement = (
-        select(Disciplina.nome, func.count(Matricula.id_aluno).label("total_alunos"))
-        .join(Matricula, isouter=True)
-        .group_by(Disciplina.id)
+        select(Disciplina.nome, EstatisticaDisciplina.total_alunos, EstatisticaDisciplina.atualizado_em)
+        .join(EstatisticaDisciplina, EstatisticaDisciplina.disciplina_id == Disciplina.id)
+        .order_by(Disciplina.id)
     )
 
     resultados = session.exec(statement).all()
+    informar_atualizacao(response, (row.atualizado_em for row in resultados))
+
+    return [{"disciplina": row.nome, "total_alunos": row.total_alunos} for row in resultados]
+
+
+@router.get("/{disciplina_id}/alunos", response_model=list[AlunoBase])
+def list_alunos_da_disciplina(
+        disciplina_id: int,
+        request: Request,
+        response: Response,
+        offset: int = 0,
+        limit: int = Query(default=10, ge=1, le=100),
+        cursor: str | None = Query(None, description="Cursor opaco retornado em X-Next-Cursor"),
+        count: ModoContagem | None = Query(None, description=DESCRICAO_CONTAGEM),
+        session: Session = Depends(get_session)
+):
+    """
+    Alunos matriculados na disciplina, paginados na mesma ordem de `include=alunos`.
+    """
+    if not session.get(Disciplina, disciplina_id):
+        raise HTTPException(status_code=404, detail="Disciplina não encontrada")
+
+    statement = (
+        select(Aluno)
+        .join(Matricula, Matricula.id_aluno == Aluno.id)
+        .where(Matricula.disciplina_id == disciplina_id)
+    )
+    chave = [Aluno.nome, Aluno.id]
+    informar_total(session, response, statement, Aluno, count)
+    statement = paginar(statement, chave, offset=offset, limit=limit, cursor=cursor)
 
-    return [{"disciplina": row.nome, "total_alunos": row.total_alunos} for row in resultados]
\ No newline at end of file
+    pagina = fatiar_pagina(session.exec(statement).all(), chave, limit, response)
+    return etag_colecao(request, response, (aluno.atualizado_em for aluno in pagina)) or pagina
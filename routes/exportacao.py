@@ -0,0 +1,103 @@
+from datetime import datetime, timezone
+from typing import Literal
+
+from fastapi import APIRouter, Query, Request
+from sqlmodel import select
+
+import database
+from core.busca import filtrar_por_nome
+from core.exportacao import transmitir
+from core.filtros import ANO_MAXIMO, IDADE_MAXIMA, intervalo_nascimento
+from models.aluno import Aluno
+from models.carteira_estudantil import CarteiraEstudantil
+from models.matricula import Matricula
+
+router = APIRouter(
+    prefix="/export",
+    tags=["Exportação"],
+)
+
+Formato = Literal["ndjson", "csv"]
+
+
+@router.get("/matriculas")
+def export_matriculas(
+        request: Request,
+        formato: Formato = Query("ndjson"),
+        gzip: bool = Query(False, description="Compacta a resposta (Content-Encoding: gzip)"),
+        semestre: str | None = Query(None, description="Filtrar por semestre (ex: 25.1)"),
+        nota_minima: float | None = Query(None, description="Filtrar por nota maior ou igual a X"),
+        id_aluno: int | None = Query(None),
+        disciplina_id: int | None = Query(None),
+):
+    """
+    Exporta todas as matrículas (com os mesmos filtros de GET /matriculas) em streaming.
+    """
+    statement = select(*Matricula.__table__.columns)
+
+    if semestre:
+        statement = statement.where(Matricula.semestre == semestre)
+
+    if nota_minima is not None:
+        statement = statement.where(Matricula.nota_final >= nota_minima)
+
+    if id_aluno:
+        statement = statement.where(Matricula.id_aluno == id_aluno)
+
+    if disciplina_id:
+        statement = statement.where(Matricula.disciplina_id == disciplina_id)
+
+    statement = statement.order_by(Matricula.id_aluno, Matricula.disciplina_id)
+    return transmitir(statement, "matriculas", formato, gzip, request)
+
+
+@router.get("/alunos")
+def export_alunos(
+        request: Request,
+        formato: Formato = Query("ndjson"),
+        gzip: bool = Query(False, description="Compacta a resposta (Content-Encoding: gzip)"),
+        nome: str | None = Query(None, description="Filtrar por nome parcial (ignora acentos e caixa)"),
+        ano_nascimento: int | None = Query(None, ge=1, le=ANO_MAXIMO),
+        nascido_entre: str | None = Query(None, description="Intervalo de nascimento 'AAAA-MM-DD,AAAA-MM-DD' (inclusivo)"),
+        idade_minima: int | None = Query(None, ge=0, le=IDADE_MAXIMA),
+        idade_maxima: int | None = Query(None, ge=0, le=IDADE_MAXIMA),
+):
+    """
+    Exporta todos os alunos (com os mesmos filtros de GET /alunos) em streaming.
+    """
+    statement = select(*Aluno.__table__.columns)
+
+    if nome:
+        statement = filtrar_por_nome(statement, Aluno.nome, nome, database.engine)
+
+    inicio, fim = intervalo_nascimento(ano_nascimento, nascido_entre, idade_minima, idade_maxima)
+    if inicio is not None:
+        statement = statement.where(Aluno.data_nascimento >= inicio)
+    if fim is not None:
+        statement = statement.where(Aluno.data_nascimento < fim)
+
+    statement = statement.order_by(Aluno.id)
+    return transmitir(statement, "alunos", formato, gzip, request)
+
+
+@router.get("/carteiras")
+def export_carteiras(
+        request: Request,
+        formato: Formato = Query("ndjson"),
+        gzip: bool = Query(False, description="Compacta a resposta (Content-Encoding: gzip)"),
+        status_ativa: bool | None = Query(None, description="Filtrar por status (Ativa/Inativa)"),
+        somente_validas: bool = Query(False, description="Apenas carteiras dentro do prazo de validade"),
+):
+    """
+    Exporta todas as carteiras (com os mesmos filtros de GET /carteiras) em streaming.
+    """
+    statement = select(*CarteiraEstudantil.__table__.columns)
+
+    if status_ativa is not None:
+        statement = statement.where(CarteiraEstudantil.status_carteira == status_ativa)
+
+    if somente_validas:
+        statement = statement.where(CarteiraEstudantil.validade > datetime.now(timezone.utc))
+
+    statement = statement.order_by(CarteiraEstudantil.id)
+    return transmitir(statement, "carteiras", formato, gzip, request)
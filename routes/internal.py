@@ -0,0 +1,51 @@
+from fastapi import APIRouter
+
+import database
+from core.cache import cache
+from core.carregamento import OCORRENCIAS
+from core.escrita_adiada import BUFFERS
+
+router = APIRouter(prefix="/_internal", tags=["Interno"], include_in_schema=False)
+
+
+@router.get("/pool")
+def metricas_pool():
+    """
+    Estado e métricas dos pools de conexão: conexões em uso, ociosas e em overflow,
+    histograma de espera por checkout e checkouts que estouraram o timeout.
+    """
+    return {nome: metricas.snapshot() for nome, metricas in database.METRICAS_POOL.items()}
+
+
+@router.get("/replica")
+def estado_replica():
+    """
+    Disponibilidade e atraso da réplica de leitura e quantas leituras foram para cada
+    banco (vazio sem DATABASE_REPLICA_URL).
+    """
+    return database.replica.metricas() if database.replica is not None else {}
+
+
+@router.get("/lazy-load")
+def ocorrencias_lazy_load():
+    """
+    Lazy loads por relacionamento desde o início do processo (LAZY_LOAD=avisar).
+    """
+    return dict(OCORRENCIAS.most_common())
+
+
+@router.get("/cache")
+def metricas_cache():
+    """
+    Acertos, faltas, invalidações e despejos do cache de GET por id.
+    """
+    return cache.metricas()
+
+
+@router.get("/escrita-adiada")
+def metricas_escrita_adiada():
+    """
+    Profundidade, descargas, latência de descarga e atraso máximo dos buffers de escrita
+    adiada (vazio quando nenhum está ligado).
+    """
+    return {nome: buffer.metricas() for nome, buffer in BUFFERS.items()}
@@ -1,15 +1,39 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+
+import database
+from core.escrita_adiada import encerrar_buffers
+from core.instrumentacao import MiddlewareInstrumentacao, limiar_do_ambiente
+from core.replica import MiddlewareReplica
 from routes import (
     alunos,
     carteiras,
     disciplinas,
     professores,
     departamentos,
-    matriculas
+    matriculas,
+    exportacao,
+    internal
 )
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Grava o que ficou nos buffers de escrita adiada antes de sair
+    await run_in_threadpool(encerrar_buffers)
+
+
+app = FastAPI(lifespan=lifespan)
+if database.replica is not None:
+    # Read-your-writes: marca as respostas de escrita (ver core/replica.py)
+    app.add_middleware(MiddlewareReplica, replica=database.replica)
+if database.SQL_AMOSTRAGEM > 0:
+    # Por último: fica por fora e mede o tempo de toda a requisição
+    app.add_middleware(MiddlewareInstrumentacao, amostragem=database.SQL_AMOSTRAGEM,
+                       limiar_n_mais_1=limiar_do_ambiente())
 
 app.include_router(alunos.router)
 app.include_router(carteiras.router)
@@ -17,4 +41,5 @@ app.include_router(professores.router)
 app.include_router(disciplinas.router)
 app.include_router(matriculas.router)
 app.include_router(departamentos.router)
-
+app.include_router(exportacao.router)
+app.include_router(internal.router)
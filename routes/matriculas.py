@@ -1,55 +1,122 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, status, Body
-from sqlmodel import Session, select, func
+from fastapi import HTTPException, Depends, Query, Request, Response, status, Body
+from sqlmodel import Session, select
 from sqlalchemy.orm import joinedload
 
-from database import get_session
-from models.matricula import Matricula
-from models.aluno import Aluno
-from models.disciplina import Disciplina
+from database import engine, get_session
+from core.roteador import RoteadorSessao
+from core.contagem import DESCRICAO_CONTAGEM, ModoContagem, informar_total
+from core.paginacao import paginar, fatiar_pagina
+from core.estatisticas import informar_atualizacao
+from core.cache import cache, tag
+from core.dml import atualizar, incrementar_em_lote, inserir
+from core.concorrencia import bloqueante
+from core.escrita_adiada import buffer_do_ambiente
+from core.integridade import traduzir_violacoes
+from core.inclusao import Incluidas, Inclusoes, Relacao
+from models.matricula import ChaveMatricula, IncrementoFaltas, Matricula, MatriculaPublic, ResultadoFaltas
+from models.aluno import Aluno, AlunoBase
+from models.disciplina import Disciplina, DisciplinaBase
+from models.estatisticas import EstatisticaDisciplina
 
 Matricula.model_rebuild(_types_namespace={
     "Aluno": Aluno,
     "Disciplina": Disciplina
 })
 
-router = APIRouter(
+router = RoteadorSessao(
     prefix="/matriculas",
     tags=["Matrículas"],
 )
 
+_UNICAS = {"id_aluno, disciplina_id": "Aluno já matriculado nesta disciplina."}
+_ESTRANGEIRAS = {"id_aluno": "Aluno não encontrado.", "disciplina_id": "Disciplina não encontrada."}
+# Incrementos por chamada de POST /matriculas/faltas
+LIMITE_FALTAS_EM_LOTE = 10_000
+
+INCLUSOES = Inclusoes(
+    Matricula, "matricula", MatriculaPublic,
+    aluno=Relacao(joinedload(Matricula.aluno), AlunoBase, "aluno"),
+    disciplina=Relacao(joinedload(Matricula.disciplina), DisciplinaBase, "disciplina"),
+)
+
 
 @router.post("/", response_model=Matricula, status_code=status.HTTP_201_CREATED)
 def create_matricula(matricula: Matricula, session: Session = Depends(get_session)):
-    if not session.get(Aluno, matricula.id_aluno):
-        raise HTTPException(status_code=404, detail="Aluno não encontrado.")
-
-    if not session.get(Disciplina, matricula.disciplina_id):
-        raise HTTPException(status_code=404, detail="Disciplina não encontrada.")
+    # Aluno e disciplina existentes e matrícula única: pela PK e pelas FKs
+    with traduzir_violacoes(session, Matricula.__table__, unicas=_UNICAS, estrangeiras=_ESTRANGEIRAS,
+                            valores=matricula.model_dump()):
+        matricula = inserir(session, matricula)
+        session.commit()
+    cache.invalidar(tag("aluno", matricula.id_aluno), tag("disciplina", matricula.disciplina_id))
+    return matricula
 
-    matricula_existente = session.get(Matricula, (matricula.id_aluno, matricula.disciplina_id))
-    if matricula_existente:
-        raise HTTPException(status_code=400, detail="Aluno já matriculado nesta disciplina.")
 
-    session.add(matricula)
+def _aplicar_faltas(session: Session, incrementos: dict[tuple[int, int], int]) -> set[tuple[int, int]]:
+    # numero_faltas = numero_faltas + delta no banco: sem ler antes, sem perder incrementos concorrentes
+    alteradas = set(incrementar_em_lote(session, Matricula, ("id_aluno", "disciplina_id"), "numero_faltas",
+                                        incrementos))
     session.commit()
-    session.refresh(matricula)
-    return matricula
+    cache.invalidar(*{tag("aluno", id_aluno) for id_aluno, _ in alteradas},
+                    *{tag("disciplina", disciplina_id) for _, disciplina_id in alteradas})
+    return alteradas
 
 
-@router.get("/", response_model=list[Matricula])
+def _descarregar_faltas(incrementos: dict[tuple[int, int], int]) -> int:
+    # Thread do buffer: sessão própria, fora de qualquer requisição
+    with Session(engine) as session:
+        return len(_aplicar_faltas(session, incrementos))
+
+
+# Escrita adiada opcional (FALTAS_ESCRITA_ADIADA=1); None = cada chamada grava na hora
+BUFFER_FALTAS = buffer_do_ambiente("faltas", "FALTAS", _descarregar_faltas)
+
+
+@router.post("/faltas", response_model=ResultadoFaltas)
+def registrar_faltas(
+        response: Response,
+        incrementos: list[IncrementoFaltas] = Body(..., max_length=LIMITE_FALTAS_EM_LOTE),
+        session: Session = Depends(get_session)
+):
+    """
+    Soma `delta` ao numero_faltas de cada matrícula, atomicamente no banco (em vez de
+    ler, somar e gravar pelo PATCH). Deltas da mesma matrícula são somados antes.
+    Com a escrita adiada ligada responde 202 e a gravação acontece na próxima descarga.
+    """
+    somas: dict[tuple[int, int], int] = {}
+    for incremento in incrementos:
+        chave = (incremento.id_aluno, incremento.disciplina_id)
+        somas[chave] = somas.get(chave, 0) + incremento.delta
+    somas = {chave: delta for chave, delta in somas.items() if delta}
+
+    if BUFFER_FALTAS is not None:
+        response.status_code = status.HTTP_202_ACCEPTED
+        return ResultadoFaltas(recebidos=len(incrementos), enfileirados=bloqueante(BUFFER_FALTAS.adicionar, somas.items()))
+
+    alteradas = _aplicar_faltas(session, somas) if somas else set()
+    return ResultadoFaltas(
+        recebidos=len(incrementos),
+        aplicados=len(alteradas),
+        nao_matriculados=[ChaveMatricula(id_aluno=id_aluno, disciplina_id=disciplina_id)
+                          for id_aluno, disciplina_id in somas if (id_aluno, disciplina_id) not in alteradas],
+    )
+
+
+@router.get("/", response_model=list[INCLUSOES.completo])
 def list_matriculas(
+        request: Request,
+        response: Response,
         offset: int = 0,
-        limit: int = Query(default=10, le=100),
+        limit: int = Query(default=10, ge=1, le=100),
+        cursor: str | None = Query(None, description="Cursor opaco retornado em X-Next-Cursor"),
+        count: ModoContagem | None = Query(None, description=DESCRICAO_CONTAGEM),
         semestre: str | None = Query(None, description="Filtrar por semestre (ex: 25.1)"),
         nota_minima: float | None = Query(None, description="Filtrar por nota maior ou igual a X"),
         id_aluno: int | None = Query(None, description="Ver histórico de um aluno"),
         disciplina_id: int | None = Query(None, description="Ver info de uma disciplina"),
+        incluir: Incluidas = Depends(INCLUSOES.dependencia),
         session: Session = Depends(get_session)
 ):
-    statement = select(Matricula).options(
-        joinedload(Matricula.aluno),
-        joinedload(Matricula.disciplina)
-    )
+    statement = select(Matricula).options(*INCLUSOES.opcoes(incluir))
 
     if semestre:
         statement = statement.where(Matricula.semestre == semestre)
@@ -63,9 +130,13 @@ def list_matriculas(
     if disciplina_id:
         statement = statement.where(Matricula.disciplina_id == disciplina_id)
 
-    statement = statement.order_by(Matricula.semestre.desc())
+    chave = [Matricula.semestre, Matricula.id_aluno, Matricula.disciplina_id]
+    informar_total(session, response, statement, Matricula, count)
+    statement = paginar(statement, chave, offset=offset, limit=limit, cursor=cursor, descendente=True)
 
-    return session.exec(statement.offset(offset).limit(limit)).unique().all()
+    resultados = session.exec(statement).unique().all()
+    pagina = fatiar_pagina(resultados, chave, limit, response)
+    return INCLUSOES.responder_pagina(session, request, response, pagina, incluir)
 
 
 @router.patch("/{id_aluno}/{disciplina_id}", response_model=Matricula)
@@ -76,19 +147,19 @@ def update_matricula(
         numero_faltas: int | None = Body(default=None),
         session: Session = Depends(get_session)
 ):
-    db_matricula = session.get(Matricula, (id_aluno, disciplina_id))
-    if not db_matricula:
-        raise HTTPException(status_code=404, detail="Matrícula não encontrada.")
-
+    valores = {}
     if nota_final is not None:
-        db_matricula.nota_final = nota_final
+        valores["nota_final"] = nota_final
 
     if numero_faltas is not None:
-        db_matricula.numero_faltas = numero_faltas
+        valores["numero_faltas"] = numero_faltas
 
-    session.add(db_matricula)
+    db_matricula = atualizar(session, Matricula, (id_aluno, disciplina_id), valores)
     session.commit()
-    session.refresh(db_matricula)
+    if not db_matricula:
+        raise HTTPException(status_code=404, detail="Matrícula não encontrada.")
+
+    cache.invalidar(tag("aluno", id_aluno), tag("disciplina", disciplina_id))
     return db_matricula
 
 
@@ -100,29 +171,35 @@ def delete_matricula(id_aluno: int, disciplina_id: int, session: Session = Depen
 
     session.delete(db_matricula)
     session.commit()
+    cache.invalidar(tag("aluno", id_aluno), tag("disciplina", disciplina_id))
     return {"ok": True}
 
 
 @router.get("/stats/media-notas", response_model=list[dict])
-def stats_media_notas_por_disciplina(session: Session = Depends(get_session)):
+def stats_media_notas_por_disciplina(response: Response, session: Session = Depends(get_session)):
+    """
+    Média das notas por disciplina, lida da tabela-resumo mantida pelos triggers.
+    """
     statement = (
         select(
             Disciplina.nome,
-            func.avg(Matricula.nota_final).label("media_notas"),
-            func.count(Matricula.id_aluno).label("qtd_alunos")
+            EstatisticaDisciplina.soma_notas,
+            EstatisticaDisciplina.total_avaliados,
+            EstatisticaDisciplina.atualizado_em
         )
-        .join(Matricula, isouter=False)
-        .where(Matricula.nota_final != None)
-        .group_by(Disciplina.id)
+        .join(EstatisticaDisciplina, EstatisticaDisciplina.disciplina_id == Disciplina.id)
+        .where(EstatisticaDisciplina.total_avaliados > 0)
+        .order_by(Disciplina.id)
     )
 
     resultados = session.exec(statement).all()
+    informar_atualizacao(response, (row.atualizado_em for row in resultados))
 
     return [
         {
             "disciplina": row.nome,
-            "media_notas": round(row.media_notas, 2) if row.media_notas else 0.0,
-            "qtd_alunos_avaliados": row.qtd_alunos
+            "media_notas": round(row.soma_notas / row.total_avaliados, 2),
+            "qtd_alunos_avaliados": row.total_avaliados
         }
         for row in resultados
-    ]
\ No newline at end of file
+    ]
@@ -1,103 +1,162 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, status
-from sqlmodel import Session, select, col
+from fastapi import HTTPException, Body, Depends, Query, Request, Response, status
+from sqlmodel import Session, select
 from sqlalchemy.orm import joinedload, selectinload
 
 from database import get_session
-from models.professor import Professor, ProfessorBase
-from models.departamento import Departamento
-from models.disciplina import Disciplina
+from core.roteador import RoteadorSessao
+from core.contagem import DESCRICAO_CONTAGEM, ModoContagem, informar_total
+from core.paginacao import paginar, fatiar_pagina, validar_cursor_relevancia
+from core.busca import filtrar_por_nome
+from core.cache import cache, tag
+from core.dml import atualizar, inserir, upsert
+from core.integridade import traduzir_violacoes
+from core.inclusao import Colecao, Incluidas, Inclusoes, Relacao
+from models.professor import Professor, ProfessorBase, ProfessorPublic
+from models.departamento import Departamento, DepartamentoBase
+from models.disciplina import Disciplina, DisciplinaBase
+from models.comum import ResultadoUpsert
 
 Professor.model_rebuild(_types_namespace={
     "Departamento": Departamento,
     "Disciplina": Disciplina
 })
 
-router = APIRouter(
+router = RoteadorSessao(
     prefix="/professores",
     tags=["Professores"],
 )
 
+# Linhas por chamada de PUT /professores/por-email (uma única instrução INSERT)
+LIMITE_UPSERT = 1_000
+_UNICAS = {"email": "Email já cadastrado."}
+_ESTRANGEIRAS = {"id_departamento": "Departamento não encontrado."}
 
-@router.post("/", response_model=Professor, status_code=status.HTTP_201_CREATED)
-def create_professor(professor: Professor, session: Session = Depends(get_session)):
-    if professor.id_departamento:
-        if not session.get(Departamento, professor.id_departamento):
-            raise HTTPException(status_code=404, detail="Departamento não encontrado.")
+INCLUSOES = Inclusoes(
+    Professor, "professor", ProfessorPublic,
+    departamento=Relacao(joinedload(Professor.departamento), DepartamentoBase, "departamento"),
+    disciplinas_ministradas=Relacao(Colecao(Disciplina, Disciplina.id_professor, [Disciplina.nome, Disciplina.id]),
+                                    list[DisciplinaBase], "disciplina"),
+)
 
-    if session.exec(select(Professor).where(Professor.email == professor.email)).first():
-        raise HTTPException(status_code=400, detail="Email já cadastrado.")
 
+@router.post("/", response_model=Professor, status_code=status.HTTP_201_CREATED)
+def create_professor(professor: Professor, session: Session = Depends(get_session)):
     professor.id = None
 
-    session.add(professor)
-    session.commit()
-    session.refresh(professor)
+    # Departamento existente e email único: garantidos pelas constraints
+    with traduzir_violacoes(session, Professor.__table__, unicas=_UNICAS, estrangeiras=_ESTRANGEIRAS):
+        professor = inserir(session, professor)
+        session.commit()
+    # Muda a coleção (e o total) de professores embutida no departamento
+    cache.invalidar(tag("departamento", professor.id_departamento))
     return professor
 
 
-@router.get("/", response_model=list[Professor])
+def _tags_gravado(linha) -> list[str]:
+    # Se mudou de departamento, os dois perdem/ganham o professor na coleção (e no total)
+    departamentos = {linha.id_departamento, linha.anterior_id_departamento} - {None}
+    return [tag("professor", linha.id), *(tag("departamento", id_) for id_ in departamentos)]
+
+
+@router.put("/por-email", response_model=ResultadoUpsert)
+def upsert_professores(
+        professores: list[ProfessorPublic] = Body(..., max_length=LIMITE_UPSERT),
+        session: Session = Depends(get_session)
+):
+    """
+    Cria ou atualiza vários professores pelo email com um único INSERT ... ON CONFLICT (email) DO UPDATE.
+    Idempotente: reenviar a mesma carga não altera nada.
+    """
+    linhas = [professor.model_dump(exclude={"id"}) for professor in professores]
+    with traduzir_violacoes(session, Professor.__table__, estrangeiras=_ESTRANGEIRAS):
+        gravados = upsert(session, Professor, linhas, "email", anteriores=["id_departamento"])
+        session.commit()
+    cache.invalidar(*(t for linha in gravados for t in _tags_gravado(linha)))
+    return ResultadoUpsert(recebidos=len(professores), gravados=len(gravados))
+
+
+@router.put("/por-email/{email}", response_model=ProfessorPublic)
+def upsert_professor(email: str, professor: ProfessorPublic, session: Session = Depends(get_session)):
+    """
+    Cria ou atualiza o professor deste email (o email do caminho prevalece sobre o do corpo).
+    """
+    with traduzir_violacoes(session, Professor.__table__, estrangeiras=_ESTRANGEIRAS):
+        gravados = upsert(session, Professor, [{**professor.model_dump(exclude={"id"}), "email": email}], "email",
+                          anteriores=["id_departamento"])
+        session.commit()
+    if not gravados:
+        return session.exec(select(Professor).where(Professor.email == email)).one()
+    cache.invalidar(*_tags_gravado(gravados[0]))
+    return gravados[0]._mapping
+
+
+@router.get("/", response_model=list[INCLUSOES.completo])
 def list_professores(
+        request: Request,
+        response: Response,
         offset: int = 0,
-        limit: int = Query(default=10, le=100),
-        nome: str | None = Query(None, description="Filtrar por nome parcial"),
+        limit: int = Query(default=10, ge=1, le=100),
+        cursor: str | None = Query(None, description="Cursor opaco retornado em X-Next-Cursor"),
+        count: ModoContagem | None = Query(None, description=DESCRICAO_CONTAGEM),
+        nome: str | None = Query(None, description="Filtrar por nome parcial (ignora acentos e caixa)"),
+        ordenar_por_relevancia: bool = Query(False, description="Com `nome`, ordena pelos mais parecidos (só offset)"),
         id_departamento: int | None = Query(None, description="Filtrar por departamento"),
+        incluir: Incluidas = Depends(INCLUSOES.dependencia),
         session: Session = Depends(get_session)
 ):
-    statement = select(Professor).options(
-        joinedload(Professor.departamento),
-        selectinload(Professor.disciplinas_ministradas)
-    )
+    statement = select(Professor).options(*INCLUSOES.opcoes(incluir))
 
+    relevancia = bool(nome) and ordenar_por_relevancia
+    validar_cursor_relevancia(cursor, relevancia)
     if nome:
-        statement = statement.where(col(Professor.nome).contains(nome))
+        statement = filtrar_por_nome(statement, Professor.nome, nome, session, ordenar_por_relevancia)
 
     if id_departamento:
         statement = statement.where(Professor.id_departamento == id_departamento)
 
-    statement = statement.order_by(Professor.nome)
-
-    return session.exec(statement.offset(offset).limit(limit)).unique().all()
+    chave = [Professor.nome, Professor.id]
+    informar_total(session, response, statement, Professor, count)
+    statement = paginar(statement, chave, offset=offset, limit=limit, cursor=cursor)
 
+    resultados = session.exec(statement).unique().all()
+    pagina = fatiar_pagina(resultados, chave, limit, response, emitir_cursor=not relevancia)
+    return INCLUSOES.responder_pagina(session, request, response, pagina, incluir)
 
-@router.get("/{professor_id}", response_model=Professor)
-def get_professor(professor_id: int, session: Session = Depends(get_session)):
-    statement = (
-        select(Professor)
-        .where(Professor.id == professor_id)
-        .options(
-            joinedload(Professor.departamento),
-            selectinload(Professor.disciplinas_ministradas)
-        )
-    )
-    professor = session.exec(statement).unique().first()
 
-    if not professor:
-        raise HTTPException(status_code=404, detail="Professor não encontrado")
-    return professor
+@router.get("/{professor_id}", response_model=INCLUSOES.completo)
+def get_professor(
+        professor_id: int,
+        request: Request,
+        incluir: Incluidas = Depends(INCLUSOES.dependencia),
+        session: Session = Depends(get_session)
+):
+    """
+    Professor por id; departamento e disciplinas só com `include`.
+    """
+    return INCLUSOES.ler_por_id(session, request, professor_id, incluir, "Professor não encontrado")
 
 
 @router.put("/{professor_id}", response_model=Professor)
 def update_professor(professor_id: int, prof_data: ProfessorBase, session: Session = Depends(get_session)):
-    db_prof = session.get(Professor, professor_id)
+    with traduzir_violacoes(session, Professor.__table__, unicas=_UNICAS):
+        db_prof = atualizar(session, Professor, professor_id, prof_data.model_dump(exclude_unset=True))
+        session.commit()
     if not db_prof:
         raise HTTPException(status_code=404, detail="Professor não encontrado")
 
-    dados = prof_data.model_dump(exclude_unset=True)
-    for key, value in dados.items():
-        setattr(db_prof, key, value)
-
-    session.add(db_prof)
-    session.commit()
-    session.refresh(db_prof)
+    cache.invalidar(tag("professor", professor_id))
     return db_prof
 
 
 @router.delete("/{professor_id}")
 def delete_professor(professor_id: int, session: Session = Depends(get_session)):
-    prof = session.get(Professor, professor_id)
+    # O delete desvincula o professor destes relacionamentos
+    prof = session.get(Professor, professor_id, options=[selectinload(Professor.disciplinas_ministradas)])
     if not prof:
         raise HTTPException(status_code=404, detail="Professor não encontrado")
 
+    id_departamento = prof.id_departamento
     session.delete(prof)
     session.commit()
+    cache.invalidar(tag("professor", professor_id), tag("departamento", id_departamento))
     return {"ok": True}
\ No newline at end of file
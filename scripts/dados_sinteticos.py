@@ -0,0 +1,150 @@
+"""
+Gera uma massa de dados sintética e determinística (mesma semente, mesmos dados)
+para verificação de planos de consulta e benchmarks.
+
+Uso: python -m scripts.dados_sinteticos --alunos 100000
+"""
+import argparse
+import random
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select
+
+from core import particoes
+from models import Aluno, CarteiraEstudantil, Departamento, Disciplina, Matricula, Professor
+
+PRIMEIROS_NOMES = [
+    "Ana", "João", "Maria", "José", "Antônio", "Francisca", "Luís", "Márcia", "Sérgio", "Conceição",
+    "Paulo", "Letícia", "Júlio", "Cecília", "André", "Beatriz", "Caio", "Débora", "Éder", "Fábio",
+]
+SOBRENOMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima",
+    "Gomes", "Araújo", "Ribeiro", "Conceição", "Simões", "Gonçalves", "Magalhães", "Brandão",
+]
+ASSUNTOS = [
+    "Cálculo", "Álgebra Linear", "Banco de Dados", "Estruturas de Dados", "Física", "Química",
+    "Programação", "Redes", "Sistemas Operacionais", "Estatística", "Compiladores", "Inteligência Artificial",
+]
+SEMESTRES = ["22.1", "22.2", "23.1", "23.2", "24.1", "24.2", "25.1", "25.2"]
+
+TAMANHO_LOTE = 5_000
+
+
+def _proximo_id(connection, modelo) -> int:
+    return (connection.execute(select(func.max(modelo.id))).scalar() or 0) + 1
+
+
+def _inserir_em_lotes(connection, modelo, linhas) -> int:
+    total, lote = 0, []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= TAMANHO_LOTE:
+            connection.execute(insert(modelo), lote)
+            total += len(lote)
+            lote = []
+    if lote:
+        connection.execute(insert(modelo), lote)
+        total += len(lote)
+    return total
+
+
+def _nome(rng: random.Random) -> str:
+    return f"{rng.choice(PRIMEIROS_NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+
+
+def popular(connection, alunos: int = 10_000, matriculas_por_aluno: int = 5, semente: int = 42) -> dict[str, int]:
+    """
+    Insere departamentos, professores, disciplinas, alunos, carteiras e matrículas
+    proporcionais a `alunos`, sem commit (quem chama decide entre commit e rollback).
+    """
+    rng = random.Random(semente)
+    contagem: dict[str, int] = {}
+
+    qtd_departamentos = max(5, alunos // 2_000)
+    qtd_professores = max(10, alunos // 50)
+    qtd_disciplinas = max(20, alunos // 20)
+
+    inicio_dep = _proximo_id(connection, Departamento)
+    departamentos = range(inicio_dep, inicio_dep + qtd_departamentos)
+    contagem["departamento"] = _inserir_em_lotes(connection, Departamento, (
+        {"id": i, "nome": f"Departamento {i}", "codigo_departamento": f"D{i:04d}"}
+        for i in departamentos
+    ))
+
+    inicio_prof = _proximo_id(connection, Professor)
+    professores = range(inicio_prof, inicio_prof + qtd_professores)
+    contagem["professor"] = _inserir_em_lotes(connection, Professor, (
+        {"id": i, "nome": _nome(rng), "email": f"professor{i}@universidade.br",
+         "id_departamento": rng.choice(departamentos)}
+        for i in professores
+    ))
+
+    inicio_disc = _proximo_id(connection, Disciplina)
+    disciplinas = range(inicio_disc, inicio_disc + qtd_disciplinas)
+    contagem["disciplina"] = _inserir_em_lotes(connection, Disciplina, (
+        {"id": i, "nome": f"{rng.choice(ASSUNTOS)} {i}", "carga_horaria": rng.choice([32, 48, 64, 96]),
+         "id_professor": rng.choice(professores), "departamento_disciplina_cod": f"D{rng.choice(departamentos):04d}"}
+        for i in disciplinas
+    ))
+
+    inicio_aluno = _proximo_id(connection, Aluno)
+    ids_alunos = range(inicio_aluno, inicio_aluno + alunos)
+    nascimento_base = date(1990, 1, 1)
+    contagem["aluno"] = _inserir_em_lotes(connection, Aluno, (
+        {"id": i, "nome": _nome(rng), "cpf": f"{i:011d}",
+         "data_nascimento": nascimento_base + timedelta(days=rng.randrange(0, 15 * 365)),
+         "numero_matricula": 20_000_000 + i, "email": f"aluno{i}@universidade.br"}
+        for i in ids_alunos
+    ))
+
+    agora = datetime.now(timezone.utc)
+    inicio_cart = _proximo_id(connection, CarteiraEstudantil)
+    contagem["carteiraestudantil"] = _inserir_em_lotes(connection, CarteiraEstudantil, (
+        {"id": inicio_cart + n, "id_aluno": i, "numero_de_registro": f"R{inicio_cart + n:09d}",
+         "validade": agora + timedelta(days=rng.randrange(-365, 3 * 365)),
+         "data_criacao": agora - timedelta(seconds=rng.randrange(0, 4 * 365 * 86_400)),
+         "status_carteira": rng.random() > 0.1}
+        for n, i in enumerate(i for i in ids_alunos if rng.random() < 0.9)
+    ))
+
+    def matriculas():
+        for i in ids_alunos:
+            quantidade = max(1, min(qtd_disciplinas, int(rng.gauss(matriculas_por_aluno, 2))))
+            for disciplina_id in rng.sample(disciplinas, quantidade):
+                semestre = rng.choice(SEMESTRES)
+                nota = None if semestre == SEMESTRES[-1] and rng.random() < 0.7 else round(rng.uniform(0, 10), 1)
+                yield {"id_aluno": i, "disciplina_id": disciplina_id, "semestre": semestre,
+                       "nota_final": nota, "numero_faltas": rng.randrange(0, 20)}
+
+    # Com matricula particionada (Postgres), cada semestre precisa da sua partição
+    for semestre in SEMESTRES:
+        particoes.criar_particao(connection, semestre)
+    contagem["matricula"] = _inserir_em_lotes(connection, Matricula, matriculas())
+
+    # Os ids foram gerados aqui; as sequences do Postgres precisam acompanhar
+    if connection.dialect.name == "postgresql":
+        for tabela in ("departamento", "professor", "disciplina", "aluno", "carteiraestudantil"):
+            connection.exec_driver_sql(
+                f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), (SELECT max(id) FROM {tabela}))"
+            )
+
+    return contagem
+
+
+def main() -> None:
+    from database import engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alunos", type=int, default=10_000)
+    parser.add_argument("--matriculas-por-aluno", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        contagem = popular(connection, args.alunos, args.matriculas_por_aluno, args.semente)
+    for tabela, total in contagem.items():
+        print(f"{tabela}: {total} linhas")
+
+
+if __name__ == "__main__":
+    main()
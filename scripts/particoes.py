@@ -0,0 +1,71 @@
+"""
+Manutenção das partições de matricula (Postgres, ver core/particoes.py).
+
+  listar                      partições e linhas de cada uma (e da padrão)
+  criar [--adiante N]         cria a partição do semestre atual e das N seguintes
+  criar --semestre 26.1 ...   cria as partições dos semestres informados
+  desanexar 22.1 [--arquivar] tira o semestre da tabela (e o move para o esquema `arquivo`)
+
+Rode o `criar` com antecedência (ex.: num cron mensal): assim a partição padrão fica
+vazia e criar a próxima partição não precisa varrê-la. Depois do `desanexar`, as
+respostas em cache que incluíam o semestre só somem com o TTL ou um restart da API.
+
+Uso: python -m scripts.particoes criar --adiante 2
+"""
+import argparse
+import sys
+from datetime import date
+
+from core import particoes
+
+
+def _semestre(valor: str) -> str:
+    try:
+        particoes.nome_particao(valor)
+    except ValueError as erro:
+        raise argparse.ArgumentTypeError(str(erro))
+    return valor
+
+
+def main() -> int:
+    from database import engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("listar")
+    criar = comandos.add_parser("criar")
+    criar.add_argument("--adiante", type=int, default=1, help="Semestres seguintes ao atual")
+    criar.add_argument("--semestre", nargs="+", type=_semestre, help="Semestres específicos (AA.1 ou AA.2)")
+    desanexar = comandos.add_parser("desanexar")
+    desanexar.add_argument("semestre", type=_semestre)
+    desanexar.add_argument("--arquivar", action="store_true",
+                           help=f"Move a tabela para o esquema {particoes.ESQUEMA_ARQUIVO}")
+    desanexar.add_argument("--lock-timeout-ms", type=int, default=2_000)
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        if not particoes.particionada(connection):
+            print("matricula não é particionada (requer Postgres com a migration aplicada).", file=sys.stderr)
+            return 2
+
+        if args.comando == "listar":
+            for semestre, nome in {**particoes.particoes(connection), "padrão": particoes.PADRAO}.items():
+                linhas = connection.exec_driver_sql(f"SELECT count(*) FROM {nome}").scalar()
+                print(f"{semestre:<7} {nome:<20} {linhas:>10} linhas")
+
+        elif args.comando == "criar":
+            semestres = args.semestre or particoes.semestres_a_frente(date.today(), args.adiante)
+            for semestre in semestres:
+                criada = particoes.criar_particao(connection, semestre)
+                print(f"{semestre}: {'criada' if criada else 'já existia'}")
+
+        else:
+            linhas = particoes.desanexar_particao(connection, args.semestre, arquivar=args.arquivar,
+                                                  lock_timeout_ms=args.lock_timeout_ms)
+            destino = f" e arquivado em {particoes.ESQUEMA_ARQUIVO}" if args.arquivar else ""
+            print(f"{args.semestre}: {linhas} linhas desanexadas{destino}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
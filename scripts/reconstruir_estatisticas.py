@@ -0,0 +1,34 @@
+"""
+Recalcula do zero as tabelas-resumo de /stats (estatisticadisciplina e
+estatisticadepartamento) e os contadores de linhas (contagemtabela) e recria os
+triggers que os mantêm. Use quando houver suspeita de divergência (ex.: escrita feita
+com os triggers desabilitados ou TRUNCATE).
+
+Uso: python -m scripts.reconstruir_estatisticas
+"""
+import argparse
+
+from core import contagem, estatisticas
+
+
+def main() -> None:
+    from database import engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sem-triggers", action="store_true", help="Só recalcula, sem recriar os triggers")
+    args = parser.parse_args()
+
+    with engine.begin() as connection:
+        if not args.sem_triggers:
+            estatisticas.criar_triggers(connection)
+            contagem.criar_triggers(connection)
+        resumos = estatisticas.reconstruir(connection)
+        contadores = contagem.reconstruir(connection)
+    for tabela, total in resumos.items():
+        print(f"{tabela}: {total} linhas")
+    for tabela, total in contadores.items():
+        print(f"contagem {tabela}: {total}")
+
+
+if __name__ == "__main__":
+    main()
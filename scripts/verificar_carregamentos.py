@@ -0,0 +1,249 @@
+"""
+Regressão de N+1: com LAZY_LOAD=proibir (core/carregamento.py) e o cache desligado,
+chama todas as rotas da API sobre uma massa pequena: escritas, listagens e detalhes
+sem e com cada `include`, sub-rotas, estatísticas e exportações. Falha se alguma
+chamada disparar um lazy load, responder com status inesperado ou se alguma rota da
+API não tiver chamada aqui (rota nova entra na lista abaixo). Também conta as
+instruções SQL de cada chamada: um POST/PUT/PATCH deve ser uma só (INSERT/UPDATE ...
+RETURNING, sem o SELECT de um refresh), salvo o limite declarado na chamada.
+
+Uso: python -m scripts.verificar_carregamentos [--url sqlite:///verificar.db]
+Sem --url usa um SQLite temporário; um banco informado deve estar vazio (é populado) e,
+no Postgres, já ter as extensões e a f_unaccent da migration de busca por nome.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from core.inclusao import SUFIXO_TOTAL
+
+# Instruções SQL por chamada de escrita (POST/PUT/PATCH), se a chamada não declara outro limite
+INSTRUCOES_POR_ESCRITA = 1
+
+
+def _valores_include(inclusoes) -> list[str | None]:
+    # Sem include, cada relação (e o só-total das coleções) e todas juntas
+    valores = [None, *inclusoes.relacoes, *(nome + SUFIXO_TOTAL for nome in sorted(inclusoes.colecoes))]
+    if len(inclusoes.relacoes) > 1:
+        valores.append(",".join(inclusoes.relacoes))
+    return valores
+
+
+class Verificacao:
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self.chamadas: set[tuple[str, str]] = set()
+        self.falhas = 0
+        # Instruções SQL desde o início da chamada atual (listener de before_cursor_execute)
+        self.instrucoes = 0
+
+    def contar(self, *args) -> None:
+        self.instrucoes += 1
+
+    def chamar(self, metodo: str, rota: str, esperado: int = 200, caminho: dict | None = None,
+               instrucoes: int | None = None, **kwargs):
+        """
+        Chama `rota` (o path da rota, com {parametros} preenchidos por `caminho`) e
+        confere o status e, nas escritas, as instruções SQL (no máximo `instrucoes`,
+        padrão INSTRUCOES_POR_ESCRITA); devolve a resposta ou None se a chamada falhou.
+        """
+        self.chamadas.add((metodo, rota))
+        url = rota.format(**(caminho or {}))
+        descricao = f"{metodo} {url}" + (f"?{kwargs['params']}" if kwargs.get("params") else "")
+        if instrucoes is None and metodo in ("POST", "PUT", "PATCH"):
+            instrucoes = INSTRUCOES_POR_ESCRITA
+        self.instrucoes = 0
+        try:
+            resposta = self.cliente.request(metodo, url, **kwargs)
+        except Exception as erro:
+            self.falhas += 1
+            print(f"FALHA {descricao}: {type(erro).__name__}: {erro}")
+            return None
+        if resposta.status_code != esperado:
+            self.falhas += 1
+            print(f"FALHA {descricao}: status {resposta.status_code} (esperado {esperado}): {resposta.text[:200]}")
+            return None
+        if instrucoes is not None and self.instrucoes > instrucoes:
+            self.falhas += 1
+            print(f"FALHA {descricao}: {self.instrucoes} instruções SQL (máximo {instrucoes})")
+            return None
+        print(f"ok    {descricao}")
+        return resposta
+
+    def com_includes(self, rota: str, inclusoes, caminho: dict | None = None, **params) -> None:
+        for include in _valores_include(inclusoes):
+            self.chamar("GET", rota, caminho=caminho,
+                        params={**params, **({"include": include} if include else {})})
+
+
+def exercitar(v: Verificacao) -> None:
+    from routes import alunos, carteiras, departamentos, disciplinas, matriculas, professores
+
+    # Escritas que montam a massa
+    dep = v.chamar("POST", "/departamentos/", 201, json={"nome": "Computação", "codigo_departamento": "DC"}).json()
+    dep_vazio = v.chamar("POST", "/departamentos/", 201, json={"nome": "Letras", "codigo_departamento": "DL"}).json()
+    v.chamar("PUT", "/departamentos/por-codigo", json=[{"nome": "Física", "codigo_departamento": "DF"}])
+    v.chamar("PUT", "/departamentos/por-codigo/{codigo_departamento}", caminho={"codigo_departamento": "DF"},
+             json={"nome": "Física Aplicada", "codigo_departamento": "DF"})
+
+    prof = v.chamar("POST", "/professores/", 201,
+                    json={"nome": "Ana", "email": "ana@x.br", "id_departamento": dep["id"]}).json()
+    prof_sem_turma = v.chamar("POST", "/professores/", 201,
+                              json={"nome": "Bruno", "email": "bruno@x.br", "id_departamento": dep["id"]}).json()
+    v.chamar("PUT", "/professores/por-email",
+             json=[{"nome": "Carla", "email": "carla@x.br", "id_departamento": dep["id"]}])
+    v.chamar("PUT", "/professores/por-email/{email}", caminho={"email": "carla@x.br"},
+             json={"nome": "Carla S.", "email": "carla@x.br", "id_departamento": dep["id"]})
+
+    disciplina = {"carga_horaria": 64, "id_professor": prof["id"], "departamento_disciplina_cod": "DC"}
+    bd = v.chamar("POST", "/disciplinas/", 201, json={"nome": "Banco de Dados", **disciplina}).json()
+    ed = v.chamar("POST", "/disciplinas/", 201, json={"nome": "Estruturas de Dados", **disciplina}).json()
+
+    ids = []
+    for i in range(3):
+        aluno = {"nome": f"Aluno {i}", "cpf": f"{i:011d}", "data_nascimento": f"200{i}-01-01",
+                 "numero_matricula": i, "email": f"a{i}@x.br"}
+        ids.append(v.chamar("POST", "/alunos/", 201, json=aluno).json()["id"])
+    v.chamar("PUT", "/alunos/por-cpf", json=[{"nome": "Aluno 3", "cpf": "00000000003", "data_nascimento": "2003-01-01",
+                                              "numero_matricula": 3, "email": "a3@x.br"}])
+    v.chamar("PUT", "/alunos/por-cpf/{cpf}", caminho={"cpf": "00000000003"},
+             json={"nome": "Aluno 3b", "cpf": "00000000003", "data_nascimento": "2003-01-01",
+                   "numero_matricula": 3, "email": "a3@x.br"})
+    v.chamar("POST", "/alunos/bulk", headers={"Content-Type": "application/x-ndjson"},
+             content='{"nome": "Aluno 4", "cpf": "00000000004", "data_nascimento": "2004-01-01", '
+                     '"numero_matricula": 4, "email": "a4@x.br"}\n')
+
+    carteira = v.chamar("POST", "/carteiras/", 201, params={"id_aluno": ids[0]},
+                        json={"validade": "2030-01-01T00:00:00Z", "numero_de_registro": "R0"}).json()
+    v.chamar("PUT", "/carteiras/por-registro",
+             json=[{"validade": "2030-01-01T00:00:00Z", "numero_de_registro": "R1", "id_aluno": ids[1]}])
+    v.chamar("PUT", "/carteiras/por-registro/{numero_de_registro}", caminho={"numero_de_registro": "R2"},
+             json={"validade": "2030-01-01T00:00:00Z", "numero_de_registro": "R2", "id_aluno": ids[2]})
+
+    v.chamar("POST", "/matriculas/", 201,
+             json={"id_aluno": ids[0], "disciplina_id": bd["id"], "semestre": "25.1", "nota_final": 7})
+    # Uma consulta classifica os alunos (a unicidade particionada não tem ON CONFLICT) e um INSERT
+    v.chamar("POST", "/disciplinas/{disciplina_id}/matriculas/bulk", caminho={"disciplina_id": bd["id"]},
+             instrucoes=2, json={"ids_alunos": ids[1:], "semestre": "25.1"})
+    v.chamar("POST", "/matriculas/", 201, json={"id_aluno": ids[1], "disciplina_id": ed["id"], "semestre": "25.2"})
+    v.chamar("PATCH", "/disciplinas/{disciplina_id}/matriculas", caminho={"disciplina_id": bd["id"]},
+             json=[{"id_aluno": ids[1], "nota_final": 8.5}, {"id_aluno": ids[2], "numero_faltas": 2}])
+    v.chamar("POST", "/matriculas/faltas", json=[{"id_aluno": ids[0], "disciplina_id": bd["id"], "delta": 1}])
+    v.chamar("PATCH", "/matriculas/{id_aluno}/{disciplina_id}", caminho={"id_aluno": ids[0], "disciplina_id": bd["id"]},
+             json={"nota_final": 9})
+
+    # Leituras, com cada combinação de include
+    v.com_includes("/alunos/", alunos.INCLUSOES)
+    v.com_includes("/alunos/", alunos.INCLUSOES, ordenar_por_nome="true", count="exact")
+    v.com_includes("/alunos/{aluno_id}", alunos.INCLUSOES, caminho={"aluno_id": ids[0]})
+    v.chamar("GET", "/alunos/", params={"nome": "aluno", "ordenar_por_relevancia": "true"})
+    v.chamar("GET", "/alunos/stats/contagem")
+    v.chamar("GET", "/alunos/by-disciplina/{disciplina_id}", caminho={"disciplina_id": bd["id"]},
+             params={"count": "exact"})
+    v.chamar("GET", "/alunos/{aluno_id}/historico", caminho={"aluno_id": ids[1]})
+
+    v.com_includes("/carteiras/", carteiras.INCLUSOES)
+    v.com_includes("/carteiras/{carteira_id}", carteiras.INCLUSOES, caminho={"carteira_id": carteira["id"]})
+    v.chamar("GET", "/carteiras/busca/por-aluno", params={"nome_aluno": "aluno"})
+
+    v.com_includes("/professores/", professores.INCLUSOES)
+    v.com_includes("/professores/{professor_id}", professores.INCLUSOES, caminho={"professor_id": prof["id"]})
+
+    v.com_includes("/disciplinas/", disciplinas.INCLUSOES)
+    v.com_includes("/disciplinas/{disciplina_id}", disciplinas.INCLUSOES, caminho={"disciplina_id": bd["id"]})
+    v.chamar("GET", "/disciplinas/{disciplina_id}/alunos", caminho={"disciplina_id": bd["id"]})
+    v.chamar("GET", "/disciplinas/stats/alunos-por-disciplina")
+
+    v.com_includes("/matriculas/", matriculas.INCLUSOES)
+    v.com_includes("/matriculas/", matriculas.INCLUSOES, semestre="25.1", count="estimate")
+    v.chamar("GET", "/matriculas/stats/media-notas")
+
+    v.com_includes("/departamentos/", departamentos.INCLUSOES)
+    v.com_includes("/departamentos/{departamento_id}", departamentos.INCLUSOES, caminho={"departamento_id": dep["id"]})
+    v.chamar("GET", "/departamentos/{departamento_id}/professores", caminho={"departamento_id": dep["id"]})
+    v.chamar("GET", "/departamentos/stats/professores")
+
+    # Página vazia ou negativa é recusada na validação (com limit=0 a página fatiada ficava
+    # vazia e o cursor da última linha quebrava a resposta)
+    paginadas = [
+        ("/alunos/", None), ("/alunos/by-disciplina/{disciplina_id}", {"disciplina_id": bd["id"]}),
+        ("/carteiras/", None), ("/professores/", None), ("/matriculas/", None), ("/disciplinas/", None),
+        ("/disciplinas/{disciplina_id}/alunos", {"disciplina_id": bd["id"]}), ("/departamentos/", None),
+        ("/departamentos/{departamento_id}/professores", {"departamento_id": dep["id"]}),
+    ]
+    for rota, caminho in paginadas:
+        for limit in (0, -1):
+            v.chamar("GET", rota, 422, caminho=caminho, params={"limit": limit})
+
+    for exportacao in ("alunos", "carteiras", "matriculas"):
+        v.chamar("GET", f"/export/{exportacao}", params={"formato": "csv"})
+    for interna in ("pool", "replica", "lazy-load", "cache", "escrita-adiada"):
+        v.chamar("GET", f"/_internal/{interna}")
+
+    # Alterações e remoções (com os relacionamentos que o ORM percorre em cascata)
+    v.chamar("PUT", "/alunos/{aluno_id}", caminho={"aluno_id": ids[2]},
+             json={"nome": "Aluno 2b", "cpf": "00000000002", "data_nascimento": "2002-01-01",
+                   "numero_matricula": 2, "email": "a2@x.br"})
+    v.chamar("PATCH", "/carteiras/{carteira_id}", caminho={"carteira_id": carteira["id"]},
+             params={"status_novo": "false"})
+    v.chamar("PUT", "/professores/{professor_id}", caminho={"professor_id": prof_sem_turma["id"]},
+             json={"nome": "Bruno B.", "email": "bruno@x.br", "id_departamento": dep["id"]})
+    v.chamar("PUT", "/disciplinas/{disciplina_id}", caminho={"disciplina_id": ed["id"]},
+             json={"nome": "Estruturas de Dados II", **disciplina})
+    v.chamar("PATCH", "/departamentos/{departamento_id}", caminho={"departamento_id": dep_vazio["id"]},
+             json={"nome": "Letras Clássicas"})
+
+    v.chamar("DELETE", "/matriculas/{id_aluno}/{disciplina_id}", caminho={"id_aluno": ids[0], "disciplina_id": bd["id"]})
+    v.chamar("DELETE", "/carteiras/{carteira_id}", caminho={"carteira_id": carteira["id"]})
+    v.chamar("DELETE", "/alunos/{aluno_id}", caminho={"aluno_id": ids[1]})
+    v.chamar("DELETE", "/disciplinas/{disciplina_id}", caminho={"disciplina_id": ed["id"]})
+    v.chamar("DELETE", "/professores/{professor_id}", caminho={"professor_id": prof_sem_turma["id"]})
+    v.chamar("DELETE", "/departamentos/{departamento_id}", caminho={"departamento_id": dep_vazio["id"]})
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Banco vazio a usar (padrão: SQLite temporário)")
+    args = parser.parse_args()
+
+    # Antes de importar database: o modo e o banco são lidos na importação
+    diretorio = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = args.url or f"sqlite:///{diretorio.name}/verificar.db"
+    os.environ["LAZY_LOAD"] = "proibir"
+    # Um acerto de cache esconderia o lazy load da segunda chamada
+    os.environ["CACHE_BACKEND"] = "desligado"
+    os.environ.pop("DATABASE_REPLICA_URL", None)
+
+    from fastapi.routing import APIRoute
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from sqlmodel import SQLModel
+
+    import database
+    from routes.main import app
+
+    SQLModel.metadata.create_all(database.engine)
+    with TestClient(app) as cliente:
+        verificacao = Verificacao(cliente)
+        # Em Engine: vale também para o engine síncrono por baixo do assíncrono
+        event.listen(Engine, "before_cursor_execute", verificacao.contar)
+        exercitar(verificacao)
+        event.remove(Engine, "before_cursor_execute", verificacao.contar)
+
+    rotas = {(metodo, rota.path) for rota in app.routes if isinstance(rota, APIRoute)
+             for metodo in rota.methods if rota.include_in_schema or rota.path.startswith("/_internal")}
+    sem_chamada = sorted(rotas - verificacao.chamadas)
+    for metodo, rota in sem_chamada:
+        print(f"FALHA {metodo} {rota}: rota sem chamada em scripts/verificar_carregamentos.py")
+
+    database.engine.dispose()
+    diretorio.cleanup()
+    print(f"\n{verificacao.falhas} chamada(s) com lazy load, status ou instruções inesperados; "
+          f"{len(sem_chamada)} rota(s) sem chamada.")
+    return 1 if verificacao.falhas or sem_chamada else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+"""
+Regressão de planos de consulta: popula uma massa sintética (dentro de uma transação
+que é desfeita no final), chama as rotas de leitura da API nessa mesma transação,
+captura o SQL que cada chamada emite (before_cursor_execute) e roda EXPLAIN nele.
+Falha se aparecer um Seq Scan numa tabela grande ou se um filtro que depende de um
+índice (ex.: data de nascimento) não o usar. Com matricula particionada, também falha
+se uma consulta filtrada por semestre ler outra partição além da do semestre.
+
+Uso: python -m scripts.verificar_planos [--alunos 100000] [--url postgresql://...]
+Sem --url usa um SQLite temporário (o plano vem do EXPLAIN QUERY PLAN; o partition
+pruning só existe no Postgres). No Postgres, o banco deve ter as extensões e a
+f_unaccent da migration de busca por nome. Sai com 1 se alguma chamada falhar.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+
+from core import particoes
+from core.paginacao import HEADER_PROXIMO_CURSOR
+from scripts.dados_sinteticos import SEMESTRES, popular
+
+# Tabelas com pelo menos este número de linhas não podem ser lidas por Seq Scan
+LIMIAR_TABELA_GRANDE = 50_000
+
+
+def chamadas(ids: dict[str, int], proximo_cursor) -> list[tuple[str, str, dict, bool]]:
+    """
+    (nome, url, parâmetros, permite_seq_scan) das chamadas de leitura de cada rota. Todas
+    as consultas emitidas pela chamada (página, total, coleções do `include`) são verificadas.
+    `proximo_cursor(url, parametros)` devolve o X-Next-Cursor da primeira página.
+    As exportações ficam de fora: transmitem com uma conexão própria, que não enxerga a massa.
+    """
+    aluno, disciplina, professor, departamento = ids["aluno"], ids["disciplina"], ids["professor"], ids["departamento"]
+    por_nome = {"ordenar_por_nome": "true"}
+
+    return [
+        ("alunos.read_aluno", f"/alunos/{aluno}", {"include": "carteira,disciplinas"}, False),
+        # Sem filtros, o total vem do contador (contagemtabela), não de um count(*)
+        ("alunos.read_alunos", "/alunos/", {"count": "exact"}, False),
+        ("alunos.read_alunos?ordenar_por_nome&cursor", "/alunos/",
+         {**por_nome, "cursor": proximo_cursor("/alunos/", por_nome)}, False),
+        ("alunos.read_alunos?include=disciplinas", "/alunos/", {"include": "disciplinas"}, False),
+        ("alunos.read_alunos?nome", "/alunos/", {"nome": "silva"}, False),
+        ("alunos.read_alunos?nome&ordenar_por_relevancia", "/alunos/",
+         {"nome": "silva", "ordenar_por_relevancia": "true"}, False),
+        ("alunos.get_alunos_por_disciplina", f"/alunos/by-disciplina/{disciplina}", {"count": "exact"}, False),
+        ("alunos.historico_aluno", f"/alunos/{aluno}/historico", {}, False),
+        # Lidas das tabelas-resumo mantidas por triggers: nenhuma varre matricula ou aluno
+        ("alunos.count_alunos", "/alunos/stats/contagem", {}, False),
+        ("matriculas.stats_media_notas_por_disciplina", "/matriculas/stats/media-notas", {}, False),
+        ("disciplinas.stats_alunos_por_disciplina", "/disciplinas/stats/alunos-por-disciplina", {}, False),
+        ("departamentos.stats_professores_por_departamento", "/departamentos/stats/professores", {}, False),
+        ("matriculas.list_matriculas", "/matriculas/", {"include": "aluno,disciplina"}, False),
+        ("matriculas.list_matriculas?id_aluno", "/matriculas/", {"id_aluno": aluno}, False),
+        ("matriculas.list_matriculas?disciplina_id", "/matriculas/", {"disciplina_id": disciplina}, False),
+        ("carteiras.list_carteiras", "/carteiras/", {"include": "aluno"}, False),
+        ("carteiras.get_carteira", f"/carteiras/{ids['carteiraestudantil']}", {"include": "aluno"}, False),
+        ("carteiras.get_carteira_by_aluno_name", "/carteiras/busca/por-aluno", {"nome_aluno": "silva"}, False),
+        ("professores.list_professores?id_departamento", "/professores/",
+         {"id_departamento": departamento, "include": "departamento,disciplinas_ministradas"}, False),
+        ("professores.get_professor", f"/professores/{professor}", {"include": "disciplinas_ministradas"}, False),
+        ("disciplinas.list_disciplinas", "/disciplinas/", {"include": "professor_disciplina,departamento"}, False),
+        ("disciplinas.list_disciplinas?cod_departamento", "/disciplinas/",
+         {"cod_departamento": f"D{departamento:04d}"}, False),
+        # Traz os alunos de uma página de disciplinas (~100 por disciplina): com esse volume
+        # o planner pode preferir hash join sobre aluno, o que é legítimo
+        ("disciplinas.list_disciplinas?include=alunos", "/disciplinas/", {"include": "alunos"}, True),
+        ("disciplinas.get_disciplina", f"/disciplinas/{disciplina}", {"include": "alunos:total"}, False),
+        ("disciplinas.list_alunos_da_disciplina", f"/disciplinas/{disciplina}/alunos", {}, False),
+        ("departamentos.list_departamentos", "/departamentos/",
+         {"include": "professores_departamento,disciplinas_departamento"}, False),
+        ("departamentos.list_professores_do_departamento", f"/departamentos/{departamento}/professores", {}, False),
+    ]
+
+
+def chamadas_por_semestre(semestre: str, proximo_cursor) -> list[tuple[str, str, dict]]:
+    """
+    (nome, url, parâmetros) das chamadas filtradas por semestre.
+    """
+    filtro = {"semestre": semestre}
+    return [
+        ("matriculas.list_matriculas?semestre", "/matriculas/", filtro),
+        ("matriculas.list_matriculas?semestre&nota_minima", "/matriculas/", {**filtro, "nota_minima": 9.5}),
+        ("matriculas.list_matriculas?semestre&cursor", "/matriculas/",
+         {**filtro, "cursor": proximo_cursor("/matriculas/", filtro)}),
+        ("matriculas.list_matriculas?semestre&count", "/matriculas/", {**filtro, "count": "exact"}),
+    ]
+
+
+def chamadas_com_indice() -> list[tuple[str, str, dict, str]]:
+    """
+    (nome, url, parâmetros, índice) das chamadas em que alguma consulta precisa usar um índice específico.
+    """
+    # Numa página ordenada por id o planner pode preferir a PK com filtro (mesmo numa
+    # semana, com muitos alunos); o índice é exigido no count, sem ORDER BY nem LIMIT
+    return [
+        ("alunos.read_alunos?ano_nascimento&count", "/alunos/", {"ano_nascimento": 1995, "count": "exact"},
+         "ix_aluno_data_nascimento"),
+        ("alunos.read_alunos?nascido_entre&count (uma semana)", "/alunos/",
+         {"nascido_entre": "1995-01-01,1995-01-07", "count": "exact"}, "ix_aluno_data_nascimento"),
+    ]
+
+
+class Captura:
+    """
+    Listener de before_cursor_execute: guarda as consultas (SELECT/WITH) emitidas
+    enquanto `ativa`, com os parâmetros, para o EXPLAIN.
+    """
+    def __init__(self):
+        self.ativa = False
+        self.consultas: list[tuple[str, object]] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if self.ativa and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            self.consultas.append((statement, parameters))
+
+    def chamar(self, cliente, url: str, parametros: dict) -> list[tuple[str, object]]:
+        """
+        Chama a rota e devolve as consultas emitidas; levanta RuntimeError se a chamada falhar.
+        """
+        self.consultas, self.ativa = [], True
+        try:
+            resposta = cliente.get(url, params=parametros)
+        finally:
+            self.ativa = False
+        if resposta.status_code != 200:
+            raise RuntimeError(f"status {resposta.status_code}: {resposta.text[:200]}")
+        return self.consultas
+
+
+# Linha do EXPLAIN QUERY PLAN do SQLite que lê uma tabela: "SCAN aluno", "SEARCH aluno_1
+# USING INDEX ix_aluno_data_nascimento (...)", "SCAN aluno USING COVERING INDEX ...",
+# "SEARCH aluno USING AUTOMATIC COVERING INDEX (...)"
+_LEITURA_SQLITE = re.compile(r"^(SCAN|SEARCH) (\w+)(?: USING (AUTOMATIC )?(?:COVERING )?INDEX (\w+)?)?")
+_ALIAS = re.compile(r"\b(\w+) AS (\w+)\b")
+
+
+def _explicar_sqlite(connection, sql: str, parametros) -> dict:
+    # Cada leitura de tabela do EXPLAIN QUERY PLAN vira um nó no formato do JSON do
+    # Postgres (Node Type, Relation Name, Index Name), filho de um nó raiz
+    aliases = {alias: tabela for tabela, alias in _ALIAS.findall(sql)}
+    linhas = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parametros).all()
+    # SCAN lê a tabela (ou o índice) inteira e um índice AUTOMATIC é montado lendo a tabela
+    # toda: os dois contam como Seq Scan. A exceção é o SCAN do laço externo com LIMIT e sem
+    # B-tree temporária para o ORDER BY, que segue a ordem e para no LIMIT (Index Scan + Limit)
+    para_no_limit = " LIMIT " in sql.upper() and not any("FOR ORDER BY" in linha[-1] for linha in linhas)
+    nos = []
+    for _, pai, _, detalhe in linhas:
+        leitura = _LEITURA_SQLITE.match(detalhe)
+        if not leitura:
+            continue
+        operacao, tabela, automatico, indice = leitura.groups()
+        le_tudo = bool(automatico) or (operacao == "SCAN" and not (para_no_limit and pai == 0 and not nos))
+        no = {"Node Type": "Seq Scan" if le_tudo else "Index Scan", "Relation Name": aliases.get(tabela, tabela)}
+        if indice:
+            no["Index Name"] = indice
+        nos.append(no)
+    return {"Node Type": "Result", "Plans": nos}
+
+
+def explicar(connection, sql: str, parametros) -> dict:
+    if connection.dialect.name == "sqlite":
+        return _explicar_sqlite(connection, sql, parametros)
+    plano = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", parametros).scalar()
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return plano[0]["Plan"]
+
+
+def varreduras_sequenciais(no: dict):
+    if no.get("Node Type") == "Seq Scan":
+        yield no["Relation Name"]
+    for filho in no.get("Plans", []):
+        yield from varreduras_sequenciais(filho)
+
+
+def indices_usados(no: dict):
+    if "Index Name" in no:
+        yield no["Index Name"]
+    for filho in no.get("Plans", []):
+        yield from indices_usados(filho)
+
+
+def relacoes_lidas(no: dict):
+    # Tabelas (partições) lidas por qualquer tipo de scan
+    if "Relation Name" in no:
+        yield no["Relation Name"]
+    for filho in no.get("Plans", []):
+        yield from relacoes_lidas(filho)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alunos", type=int, default=100_000)
+    parser.add_argument("--url", help="Banco a usar (padrão: SQLite temporário)")
+    args = parser.parse_args()
+
+    # Antes de importar database: as rotas rodam síncronas, no banco principal e sem cache
+    # (um acerto de cache não emitiria a consulta)
+    diretorio = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = args.url or f"sqlite:///{diretorio.name}/planos.db"
+    os.environ["DATABASE_ASYNC"] = "0"
+    os.environ["CACHE_BACKEND"] = "desligado"
+    os.environ.pop("DATABASE_REPLICA_URL", None)
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from sqlmodel import Session, SQLModel
+
+    from database import engine, get_session
+    from routes.main import app
+
+    if engine.dialect.name not in ("postgresql", "sqlite"):
+        print(f"verificar_planos não sabe ler os planos de {engine.dialect.name}.", file=sys.stderr)
+        return 2
+    postgres = engine.dialect.name == "postgresql"
+    SQLModel.metadata.create_all(engine)
+
+    falhas = 0
+    with engine.connect() as connection:
+        transacao = connection.begin()
+
+        def sessao():
+            # Cada requisição num SAVEPOINT da transação que tem a massa (e que é desfeita no final)
+            with Session(bind=connection, join_transaction_mode="create_savepoint") as session:
+                yield session
+
+        app.dependency_overrides[get_session] = sessao
+        captura = Captura()
+        event.listen(connection, "before_cursor_execute", captura)
+        cliente = TestClient(app)
+
+        def proximo_cursor(url: str, parametros: dict) -> str:
+            return cliente.get(url, params=parametros).headers[HEADER_PROXIMO_CURSOR]
+
+        def verificar(nome: str, url: str, parametros: dict, conferir) -> None:
+            # `conferir(planos)` devolve o problema encontrado ou None
+            nonlocal falhas
+            try:
+                planos = [explicar(connection, sql, p) for sql, p in captura.chamar(cliente, url, parametros)]
+                problema = conferir(planos) if planos else "nenhuma consulta capturada"
+            except Exception as erro:
+                problema = f"{type(erro).__name__}: {erro}"
+            if problema:
+                falhas += 1
+                print(f"FALHA {nome}: {problema}")
+            else:
+                print(f"ok    {nome} ({len(planos)} consulta(s))")
+
+        try:
+            ids = {
+                tabela: connection.exec_driver_sql(f"SELECT coalesce(max(id), 0) + 1 FROM {tabela}").scalar()
+                for tabela in ("aluno", "disciplina", "professor", "departamento", "carteiraestudantil")
+            }
+            contagem = popular(connection, alunos=args.alunos)
+            connection.exec_driver_sql("ANALYZE")
+
+            grandes = {
+                tabela for tabela, total in contagem.items()
+                if connection.exec_driver_sql(f"SELECT count(*) FROM {tabela}").scalar() >= LIMIAR_TABELA_GRANDE
+            }
+
+            # Partição -> tabela: um Seq Scan numa partição conta como na tabela, exceto nas
+            # vazias (semestres futuros, padrão), que o planner sempre lê assim e de graça
+            pais = dict(connection.exec_driver_sql(
+                "SELECT c.relname, p.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE c.relkind IN ('r', 'p')"
+            ).all()) if postgres else {}
+            vazias = {
+                particao for particao in pais
+                if connection.exec_driver_sql(f"SELECT NOT EXISTS (SELECT 1 FROM {particao})").scalar()
+            }
+
+            def seq_scan(permite_seq_scan: bool):
+                def conferir(planos):
+                    varridas = {
+                        pais.get(t, t) for plano in planos for t in varreduras_sequenciais(plano) if t not in vazias
+                    }
+                    varridas = sorted(varridas & grandes)
+                    if varridas and not permite_seq_scan:
+                        return f"Seq Scan em {', '.join(varridas)}"
+                return conferir
+
+            def usa(indice: str):
+                def conferir(planos):
+                    if indice not in {i for plano in planos for i in indices_usados(plano)}:
+                        return f"não usa {indice}"
+                return conferir
+
+            def so_particao(esperada: str):
+                def conferir(planos):
+                    for plano in planos:
+                        lidas = sorted({t for t in relacoes_lidas(plano) if pais.get(t) == "matricula"})
+                        if lidas and lidas != [esperada]:
+                            return f"sem partition pruning, lê {', '.join(lidas)}"
+                    if not any(pais.get(t) == "matricula" for plano in planos for t in relacoes_lidas(plano)):
+                        return f"nenhuma consulta lê {esperada}"
+                return conferir
+
+            for nome, url, parametros, permite_seq_scan in chamadas(ids, proximo_cursor):
+                verificar(nome, url, parametros, seq_scan(permite_seq_scan))
+
+            for nome, url, parametros, indice in chamadas_com_indice():
+                verificar(nome, url, parametros, usa(indice))
+
+            if particoes.particionada(connection):
+                semestre = SEMESTRES[-2]
+                esperada = particoes.nome_particao(semestre)
+                for nome, url, parametros in chamadas_por_semestre(semestre, proximo_cursor):
+                    verificar(nome, url, parametros, so_particao(esperada))
+            elif postgres:
+                falhas += 1
+                print("FALHA matricula não é particionada: sem como conferir o partition pruning")
+            else:
+                print("--    partition pruning: só no Postgres, não conferido")
+        finally:
+            event.remove(connection, "before_cursor_execute", captura)
+            app.dependency_overrides.pop(get_session, None)
+            transacao.rollback()
+
+    engine.dispose()
+    diretorio.cleanup()
+    print(f"\n{falhas} chamada(s) com Seq Scan em tabela grande, sem o índice esperado, sem partition pruning "
+          f"ou com erro.")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())